@@ -0,0 +1,204 @@
+"""
+answer_cache.py
+---------------
+Cache de respostas para perguntas repetidas.
+
+Chave:
+- token da BD (KBVersion.token): BD recriada (seed) ou trocada recomeça as versões
+  do zero; sem o token, a cache (ficheiro em instance/) servia respostas da BD anterior
+- + multiconjunto de lemas da pergunta (normalize(), ordenado)
+- + versão da base de conhecimento (KBVersion)
+
+Assim, "O que é feedback?" e "o que é o feedback" partilham a entrada,
+e qualquer criação/edição/eliminação de QA muda a versão: respostas antigas
+nunca são servidas depois de uma alteração do admin.
+
+Backends (ANSWER_CACHE = memory | sqlite | none):
+- memory: LRU + TTL dentro do processo (cada worker tem a sua)
+- sqlite: ficheiro partilhado entre os workers da mesma máquina (TTL + limite de entradas)
+- none: sem cache
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def cache_key(terms: list[str], db_token: str | None = None) -> str:
+    """
+    Multiconjunto de lemas: a ordem das palavras não conta, as repetições sim.
+    Prefixado pelo token da BD (as versões de BD diferentes não se comparam).
+    """
+    return f"{db_token or ''}\x1e" + "\x1f".join(sorted(terms))
+
+
+class NullAnswerCache:
+    """Sem cache (ANSWER_CACHE=none)."""
+    name = "none"
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, kb_version: int) -> dict | None:
+        self.misses += 1
+        return None
+
+    def put(self, key: str, kb_version: int, result: dict) -> None:
+        pass
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"backend": self.name, "hits": self.hits, "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0}
+
+
+class MemoryAnswerCache(NullAnswerCache):
+    """
+    LRU + TTL em memória (thread-safe).
+    """
+    name = "memory"
+
+    def __init__(self, maxsize: int = 2048, ttl: float = 3600.0):
+        super().__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[tuple[str, int], tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, kb_version: int) -> dict | None:
+        with self._lock:
+            entry = self._data.get((key, kb_version))
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[(key, kb_version)]
+                self.misses += 1
+                return None
+            self._data.move_to_end((key, kb_version))
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, kb_version: int, result: dict) -> None:
+        with self._lock:
+            self._data[(key, kb_version)] = (time.monotonic() + self.ttl, result)
+            self._data.move_to_end((key, kb_version))
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["size"] = len(self._data)
+        return stats
+
+
+class SQLiteAnswerCache(NullAnswerCache):
+    """
+    Cache partilhada entre workers (mesma máquina) num ficheiro SQLite.
+    - TTL por entrada (expires_at)
+    - limpeza periódica: entradas expiradas, de versões antigas e,
+      acima de maxsize, as menos usadas recentemente
+    """
+    name = "sqlite"
+
+    # Limpeza a cada N escritas (não em todas)
+    prune_every = 200
+
+    def __init__(self, path: str, maxsize: int = 20000, ttl: float = 3600.0):
+        super().__init__()
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._pid = None
+        self._conn = None
+        self._writes = 0
+        self._connection()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Uma ligação por processo (ver PersistentNormalizeCache em nlp_utils.py)
+        if self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=2, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=OFF")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS answer_cache ("
+                "key TEXT NOT NULL, kb_version INTEGER NOT NULL, payload TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, last_used REAL NOT NULL, "
+                "PRIMARY KEY (key, kb_version))"
+            )
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, key: str, kb_version: int) -> dict | None:
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connection()
+                row = conn.execute(
+                    "SELECT payload, last_used FROM answer_cache "
+                    "WHERE key = ? AND kb_version = ? AND expires_at > ?",
+                    (key, kb_version, now),
+                ).fetchone()
+                # last_used só é actualizado de minuto a minuto (menos escritas)
+                if row is not None and now - row[1] > 60:
+                    conn.execute(
+                        "UPDATE answer_cache SET last_used = ? WHERE key = ? AND kb_version = ?",
+                        (now, key, kb_version),
+                    )
+            except sqlite3.OperationalError:
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, kb_version: int, result: dict) -> None:
+        now = time.time()
+        payload = json.dumps(result, ensure_ascii=False)
+        with self._lock:
+            try:
+                conn = self._connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO answer_cache (key, kb_version, payload, expires_at, last_used) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, kb_version, payload, now + self.ttl, now),
+                )
+                self._writes += 1
+                if self._writes % self.prune_every == 0:
+                    self._prune(conn, kb_version, now)
+            except sqlite3.OperationalError:
+                # BD ocupada por outro worker: fica sem cache desta vez
+                pass
+
+    def _prune(self, conn: sqlite3.Connection, kb_version: int, now: float) -> None:
+        conn.execute("DELETE FROM answer_cache WHERE expires_at <= ? OR kb_version < ?", (now, kb_version))
+        conn.execute(
+            "DELETE FROM answer_cache WHERE rowid IN ("
+            "SELECT rowid FROM answer_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.maxsize,),
+        )
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["path"] = self.path
+        return stats
+
+
+def make_answer_cache(backend: str, path: str | None = None, maxsize: int = 2048, ttl: float = 3600.0):
+    """
+    Cria a cache configurada (ANSWER_CACHE = memory | sqlite | none).
+    """
+    backend = (backend or "none").lower()
+    if backend == "memory":
+        return MemoryAnswerCache(maxsize=maxsize, ttl=ttl)
+    if backend == "sqlite":
+        if not path:
+            raise ValueError("ANSWER_CACHE=sqlite precisa de ANSWER_CACHE_PATH")
+        return SQLiteAnswerCache(path, maxsize=maxsize, ttl=ttl)
+    if backend == "none":
+        return NullAnswerCache()
+    raise ValueError(f"Backend de cache desconhecido: {backend}")
@@ -7,52 +7,418 @@ Funcionalidades:
 - Registo/Login/Logout (WTForms + Flask-Login + Werkzeug)
 - Chat (pergunta -> similaridade -> resposta)
 - Sugestões
-- Histórico do utilizador
+- Histórico do utilizador (mensagens antigas lidas do arquivo comprimido)
 - Alterar palavra-passe (mostra nova password no ecrã)
-- Área Admin: CRUD de Perguntas/Respostas (QA)
+- Área Admin: CRUD de Perguntas/Respostas (QA) + importação/exportação em massa
+  + relatório de perguntas quase duplicadas
+- Cache HTTP: estáticos com hash no URL (+ .gz/.br), ETag na landing e nas sugestões
 
 Notas para defesa:
-- Sem LLM: matching por similaridade (TF-IDF leve)
+- Sem LLM: matching por similaridade (TF-IDF leve, índice em memória)
 - spaCy para normalização em Português
 - SQLite embutido para portabilidade (instance/app.db)
 """
 
+import io
+import json
 import os
-from flask import Flask, render_template, redirect, url_for, flash
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import (
+    Flask, Response, abort, render_template, redirect, url_for, flash, stream_with_context, request, jsonify, g,
+    session,
+)
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
-
-from models import db, User, QAItem, ChatMessage
-from forms import RegisterForm, LoginForm, ChatForm, ChangePasswordForm, QAForm
-from nlp_utils import match_question
+from sqlalchemy.engine import make_url
+
+from models import db, User, QAItem, ChatMessage, ChatArchive, KBVersion, ensure_indexes, install_sqlite_pragmas
+from forms import RegisterForm, LoginForm, ChatForm, ChangePasswordForm, QAForm, QAImportForm
+from kb_io import FORMATS, detect_format, import_qa, export_qa
+from kb_index import KBIndex, MATCH_THRESHOLD
+from kb_snapshot import load_snapshot, write_snapshot
+from kb_dedup import DEFAULT_THRESHOLD, DuplicateIndex
+from nlp_utils import cache_stats, configure_cache, configure_nlp, normalize
+from answer_cache import cache_key, make_answer_cache
+from write_behind import WriteBehindQueue
+from index_rebuild import IndexRebuilder
+from auth import PasswordHasher, UserCache
+from chat_archive import VACUUM_MODES, archive_chats, pending_count, read_month
+from http_cache import PageCache, StaticAssets, VersionedCache, compress_static, file_digest, not_modified, revalidated
+from metrics import Metrics, install_db_timing, server_timing_header
+
+
+def database_uri(instance_path: str) -> str:
+    """
+    URI da BD a partir do ambiente:
+    - DATABASE_URL (postgres://... como no Render/Heroku passa a postgresql://)
+    - senão SQLite em DATABASE_PATH ou instance/app.db
+    Para testar localmente: DATABASE_URL=sqlite:////tmp/cpe.db ou um Postgres local.
+    """
+    url = os.environ.get("DATABASE_URL", "").strip()
+    if url:
+        if url.startswith("postgres://"):
+            url = "postgresql://" + url[len("postgres://"):]
+        return url
+    db_path = os.environ.get("DATABASE_PATH") or os.path.join(instance_path, "app.db")
+    return f"sqlite:///{db_path}"
 
 
 def create_app() -> Flask:
     app = Flask(__name__, instance_relative_config=True)
 
-    # Chave para CSRF + sessão (fixa, para não quebrar sessão/CSRF)
-    app.config["SECRET_KEY"] = "cpe_ia_secret_key_2026_fix"
-
-    # ✅ Caminho ABSOLUTO para a BD dentro do instance/
+    # Chave para CSRF + sessão: SECRET_KEY do ambiente (a mesma em todos os nós/workers)
+    # Sem SECRET_KEY, usa a chave fixa de desenvolvimento (está no repositório: quem a lê
+    # pode forjar sessões). Com DATABASE_URL (deploy partilhado) a app recusa arrancar sem ela.
+    secret_key = os.environ.get("SECRET_KEY")
+    if not secret_key:
+        if os.environ.get("DATABASE_URL", "").strip():
+            raise RuntimeError("DATABASE_URL definido sem SECRET_KEY: define SECRET_KEY (igual em todos os nós)")
+        app.logger.warning("SECRET_KEY não definido: a usar a chave de desenvolvimento (não usar em produção)")
+    app.config["SECRET_KEY"] = secret_key or "cpe_ia_secret_key_2026_fix"
+
+    # BD: DATABASE_URL (ex.: Postgres partilhado por vários nós) ou, sem ela,
+    # SQLite local com caminho ABSOLUTO dentro do instance/ (ou DATABASE_PATH)
     # Isto elimina 100% dos problemas do seed criar num sítio e o app ler noutro.
     os.makedirs(app.instance_path, exist_ok=True)
-    db_path = os.path.join(app.instance_path, "app.db")
-    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_path}"
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_uri(app.instance_path)
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    is_sqlite = make_url(app.config["SQLALCHEMY_DATABASE_URI"]).get_backend_name() == "sqlite"
+
+    # Perfil da BD: production (pool + WAL/busy timeout no SQLite) | default (definições do SQLite/SQLAlchemy)
+    # WAL: leitores não bloqueiam o escritor (nem vice-versa) entre workers do gunicorn
+    # synchronous=NORMAL: em WAL, sem fsync a cada commit (só nos checkpoints); seguro contra corrupção
+    # busy_timeout: espera pelo lock em vez de falhar logo com "database is locked"
+    # pool_pre_ping/pool_recycle: ligações cortadas pelo servidor (Postgres) são substituídas
+    app.config["DB_PROFILE"] = os.environ.get("DB_PROFILE", "production")
+    app.config["SQLITE_PRAGMAS"] = {}
+    if app.config["DB_PROFILE"] == "production":
+        engine_options = {
+            "pool_size": int(os.environ.get("DB_POOL_SIZE", "5")),
+            "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", "10")),
+            "pool_timeout": float(os.environ.get("DB_POOL_TIMEOUT", "30")),
+            "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", "1800")),
+            "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "1") == "1",
+        }
+        if is_sqlite:
+            busy_timeout_ms = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+            app.config["SQLITE_PRAGMAS"] = {
+                # BD novas: espaço libertado (ex.: archive-chats) devolvido com incremental_vacuum;
+                # tem de vir antes do WAL e não altera BD já existentes (ver chat_archive.py)
+                "auto_vacuum": "INCREMENTAL",
+                "journal_mode": "WAL",
+                "synchronous": os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+                "busy_timeout": busy_timeout_ms,
+                "mmap_size": int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+                # negativo = KiB (aqui 64 MiB por ligação)
+                "cache_size": int(os.environ.get("SQLITE_CACHE_SIZE", "-65536")),
+            }
+            engine_options["connect_args"] = {"timeout": busy_timeout_ms / 1000}
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options
+    elif app.config["DB_PROFILE"] != "default":
+        raise ValueError(f"DB_PROFILE desconhecido: {app.config['DB_PROFILE']}")
+
+    # Backend de scoring do índice: auto | python | numpy (ver kb_index.py)
+    app.config["KB_INDEX_BACKEND"] = os.environ.get("KB_INDEX_BACKEND", "auto")
+    # Correcção de termos desconhecidos (erros de escrita/acentos) por trigramas (ver kb_fuzzy.py)
+    app.config["KB_FUZZY"] = os.environ.get("KB_FUZZY", "1") == "1"
+
+    # Paginação do chat/histórico (mensagens por página)
+    app.config["CHAT_PAGE_SIZE"] = int(os.environ.get("CHAT_PAGE_SIZE", "30"))
+    app.config["HISTORY_PAGE_SIZE"] = int(os.environ.get("HISTORY_PAGE_SIZE", "200"))
+
+    # Cache de respostas (memory | sqlite | none), chave = lemas + versão da base de conhecimento
+    app.config["ANSWER_CACHE"] = os.environ.get("ANSWER_CACHE", "sqlite")
+    app.config["ANSWER_CACHE_PATH"] = os.environ.get(
+        "ANSWER_CACHE_PATH", os.path.join(app.instance_path, "answer_cache.db")
+    )
+    app.config["ANSWER_CACHE_SIZE"] = int(os.environ.get("ANSWER_CACHE_SIZE", "10000"))
+    app.config["ANSWER_CACHE_TTL"] = float(os.environ.get("ANSWER_CACHE_TTL", "3600"))
+
+    # Gravação das mensagens do chat em lote (group commit), desligada por omissão
+    # CHAT_WRITE_BEHIND_SYNC=1: o pedido espera pelo commit do seu lote (sem perda de mensagens)
+    app.config["CHAT_WRITE_BEHIND"] = os.environ.get("CHAT_WRITE_BEHIND", "0") == "1"
+    app.config["CHAT_WRITE_BEHIND_SYNC"] = os.environ.get("CHAT_WRITE_BEHIND_SYNC", "1") == "1"
+    app.config["CHAT_WRITE_BEHIND_BATCH"] = int(os.environ.get("CHAT_WRITE_BEHIND_BATCH", "200"))
+    app.config["CHAT_WRITE_BEHIND_WAIT_MS"] = float(os.environ.get("CHAT_WRITE_BEHIND_WAIT_MS", "5"))
+    app.config["CHAT_WRITE_BEHIND_TIMEOUT"] = float(os.environ.get("CHAT_WRITE_BEHIND_TIMEOUT", "10"))
+
+    # Métricas: /metrics (texto Prometheus) e cabeçalho Server-Timing
+    # /metrics só está ligado por omissão com METRICS_TOKEN (sem token, qualquer pessoa o leria);
+    # METRICS_ENABLED=1 sem token só atrás de uma rede privada
+    app.config["METRICS_TOKEN"] = os.environ.get("METRICS_TOKEN", "")
+    app.config["METRICS_ENABLED"] = os.environ.get(
+        "METRICS_ENABLED", "1" if app.config["METRICS_TOKEN"] else "0"
+    ) == "1"
+    app.config["SERVER_TIMING"] = os.environ.get("SERVER_TIMING", "0") == "1"
+
+    # Snapshot binário do índice (carregado com mmap no arranque dos workers); "" desliga
+    app.config["KB_SNAPSHOT_PATH"] = os.environ.get(
+        "KB_SNAPSHOT_PATH", os.path.join(app.instance_path, "kb_index.snapshot")
+    )
+
+    # Reconstrução do índice depois de alterações: em segundo plano (por omissão) ou no próprio pedido
+    # Pedidos dentro da janela KB_REBUILD_DEBOUNCE_MS são agrupados numa só reconstrução
+    app.config["KB_REBUILD_BACKGROUND"] = os.environ.get("KB_REBUILD_BACKGROUND", "1") == "1"
+    app.config["KB_REBUILD_DEBOUNCE_MS"] = float(os.environ.get("KB_REBUILD_DEBOUNCE_MS", "250"))
+
+    # Perguntas quase duplicadas (Jaccard entre lemas, ver kb_dedup.py): aviso no admin e relatório
+    app.config["DEDUP_THRESHOLD"] = float(os.environ.get("DEDUP_THRESHOLD", str(DEFAULT_THRESHOLD)))
+
+    # Autenticação: cache de utilizadores por worker (USER_CACHE_SIZE=0 desliga) e custo do hash
+    # PASSWORD_HASH_METHOD no formato do Werkzeug (ex.: "scrypt:16384:8:1", "pbkdf2:sha256:600000");
+    # hashes antigos são refeitos no login seguinte (ver auth.py e benchmarks/login.py)
+    app.config["USER_CACHE_SIZE"] = int(os.environ.get("USER_CACHE_SIZE", "1024"))
+    app.config["USER_CACHE_TTL"] = float(os.environ.get("USER_CACHE_TTL", "60"))
+    app.config["PASSWORD_HASH_METHOD"] = os.environ.get("PASSWORD_HASH_METHOD", "scrypt")
+    app.config["PASSWORD_SALT_LENGTH"] = int(os.environ.get("PASSWORD_SALT_LENGTH", "16"))
+
+    # Cache HTTP (ver http_cache.py): páginas iguais para todos renderizadas uma vez por worker
+    # HTTP_PAGE_CACHE=0 (ou modo debug) renderiza sempre
+    app.config["HTTP_PAGE_CACHE"] = os.environ.get("HTTP_PAGE_CACHE", "1") == "1"
+    app.config["SUGGESTIONS_COUNT"] = int(os.environ.get("SUGGESTIONS_COUNT", "8"))
+
+    # Retenção do histórico (flask --app app archive-chats): mensagens com mais de
+    # CHAT_RETENTION_DAYS dias passam para o arquivo comprimido, em lotes de CHAT_ARCHIVE_BATCH
+    app.config["CHAT_RETENTION_DAYS"] = int(os.environ.get("CHAT_RETENTION_DAYS", "180"))
+    app.config["CHAT_ARCHIVE_BATCH"] = int(os.environ.get("CHAT_ARCHIVE_BATCH", "500"))
+    app.config["CHAT_ARCHIVE_PAUSE_MS"] = float(os.environ.get("CHAT_ARCHIVE_PAUSE_MS", "50"))
+
+    # Importação em massa: linhas por transacção
+    app.config["QA_IMPORT_CHUNK_SIZE"] = int(os.environ.get("QA_IMPORT_CHUNK_SIZE", "500"))
 
     db.init_app(app)
 
+    # Estáticos: ?v=<hash> nos URLs, cache longa e variantes .br/.gz pré-comprimidas
+    StaticAssets(app)
+
     # Login manager
     login_manager = LoginManager()
     login_manager.login_view = "login"
     login_manager.init_app(app)
 
+    user_cache = UserCache(maxsize=app.config["USER_CACHE_SIZE"], ttl=app.config["USER_CACHE_TTL"])
+    user_cache.install(app, User)
+    passwords = PasswordHasher(app.config["PASSWORD_HASH_METHOD"], app.config["PASSWORD_SALT_LENGTH"])
+
     @login_manager.user_loader
     def load_user(user_id: str):
-        return db.session.get(User, int(user_id))
+        """
+        current_user de cada pedido: da cache do worker (sem ida à BD) ou,
+        se não estiver lá, da tabela users.
+        """
+        cached = user_cache.get(int(user_id))
+        if cached is not None:
+            return cached
+        user = db.session.get(User, int(user_id))
+        return user_cache.put(user) if user is not None else None
+
+    # Pipeline spaCy (carregado só no primeiro uso): modelo e componentes excluídos
+    # SPACY_EXCLUDE="" carrega o pipeline completo
+    app.config["SPACY_MODEL"] = os.environ.get("SPACY_MODEL", "pt_core_news_sm")
+    app.config["SPACY_EXCLUDE"] = os.environ.get("SPACY_EXCLUDE", "parser,ner")
+    configure_nlp(
+        app.config["SPACY_MODEL"],
+        [c.strip() for c in app.config["SPACY_EXCLUDE"].split(",") if c.strip()],
+    )
+
+    # Cache de normalize() (LRU em memória + SQLite partilhada entre workers)
+    # NLP_CACHE_SIZE=0 desliga a cache em memória; NLP_CACHE_PATH="" desliga a persistente
+    # NLP_CACHE_PERSISTENT_SIZE: máximo de textos na persistente (as entradas mais antigas saem)
+    app.config["NLP_CACHE_SIZE"] = int(os.environ.get("NLP_CACHE_SIZE", "4096"))
+    app.config["NLP_CACHE_PATH"] = os.environ.get(
+        "NLP_CACHE_PATH", os.path.join(app.instance_path, "nlp_cache.db")
+    )
+    app.config["NLP_CACHE_PERSISTENT_SIZE"] = int(os.environ.get("NLP_CACHE_PERSISTENT_SIZE", "100000"))
+    configure_cache(app.config["NLP_CACHE_SIZE"], app.config["NLP_CACHE_PATH"],
+                    app.config["NLP_CACHE_PERSISTENT_SIZE"])
+
+    # Índice TF-IDF da base de conhecimento (construído no arranque; depois
+    # substituído por inteiro quando a base muda, ver rebuild_kb_index)
+    kb_index = KBIndex(backend=app.config["KB_INDEX_BACKEND"], fuzzy=app.config["KB_FUZZY"])
+    app.extensions["kb_index"] = kb_index
+
+    answer_cache = make_answer_cache(
+        app.config["ANSWER_CACHE"],
+        path=app.config["ANSWER_CACHE_PATH"],
+        maxsize=app.config["ANSWER_CACHE_SIZE"],
+        ttl=app.config["ANSWER_CACHE_TTL"],
+    )
+    app.extensions["answer_cache"] = answer_cache
+
+    write_queue = None
+    if app.config["CHAT_WRITE_BEHIND"]:
+        write_queue = WriteBehindQueue(
+            app, db, ChatMessage,
+            max_batch=app.config["CHAT_WRITE_BEHIND_BATCH"],
+            max_wait=app.config["CHAT_WRITE_BEHIND_WAIT_MS"] / 1000,
+        )
+    app.extensions["chat_write_queue"] = write_queue
+
+    # Métricas do processo: tempos por etapa + contadores lidos no /metrics
+    metrics = Metrics()
+    app.extensions["metrics"] = metrics
+    metrics.register("kb_items", "gauge", "Perguntas no índice", lambda: len(kb_index))
+    metrics.register(
+        "kb_version", "gauge", "Versão da base de conhecimento do índice",
+        lambda: -1 if kb_index.stamp is None else kb_index.stamp,
+    )
+    metrics.register("answer_cache_hits_total", "counter", "Respostas servidas da cache",
+                     lambda: answer_cache.hits)
+    metrics.register("answer_cache_misses_total", "counter", "Respostas calculadas (fora da cache)",
+                     lambda: answer_cache.misses)
+    metrics.register("nlp_cache_hits_total", "counter", "normalize() servido da cache em memória",
+                     lambda: cache_stats()["memory"]["hits"])
+    metrics.register("nlp_cache_misses_total", "counter", "normalize() fora da cache em memória",
+                     lambda: cache_stats()["memory"]["misses"])
+    metrics.register("user_cache_hits_total", "counter", "current_user servido da cache do worker",
+                     lambda: user_cache.hits)
+    metrics.register("user_cache_misses_total", "counter", "current_user lido da BD",
+                     lambda: user_cache.misses)
+    if write_queue is not None:
+        metrics.register("chat_write_batches_total", "counter", "Commits em lote da fila de escrita",
+                         lambda: write_queue.batches)
+
+    def build_kb_index(version: int) -> KBIndex:
+        """
+        Índice novo (separado do que está a responder) na versão `version`.
+        Primeiro tenta o snapshot em disco (se for desta versão); senão reconstrói
+        (os lemas vêm da cache persistente, por isso o spaCy quase não corre) e grava-o.
+        """
+        fresh = KBIndex(backend=app.config["KB_INDEX_BACKEND"], fuzzy=app.config["KB_FUZZY"])
+        snapshot_path = app.config["KB_SNAPSHOT_PATH"]
+        loaded = False
+        if snapshot_path:
+            with metrics.timer("index_load"):
+                loaded = load_snapshot(fresh, snapshot_path, version, KBVersion.identity())
+        if not loaded:
+            t0 = time.perf_counter()
+            with metrics.timer("index_build"):
+                fresh.build(db.session.query(QAItem.id, QAItem.question).all())
+                fresh.refresh()
+            metrics.set_gauge("index_build_seconds", time.perf_counter() - t0)
+            fresh.stamp = version
+            save_kb_snapshot(fresh)
+        # Trigramas do vocabulário também fora dos pedidos
+        with metrics.timer("index_fuzzy"):
+            fresh.corrector()
+        return fresh
+
+    def rebuild_kb_index(version: int | None = None) -> None:
+        """
+        Actualiza o índice só se a versão da base de conhecimento mudou
+        (ex.: edição feita noutro worker). Verificação barata: uma linha por chave primária.
+        O índice novo é construído à parte e publicado com kb_index.adopt():
+        as consultas nunca esperam pela construção.
+        A versão é relida aqui: pedidos antigos ou repetidos não reconstroem de novo.
+        O índice de duplicados acompanha-o (também fora dos pedidos de gravação do admin).
+        """
+        current = KBVersion.current()
+        if version is not None:
+            current = max(current, version)
+        if kb_index.stamp is None or kb_index.stamp < current:
+            kb_index.adopt(build_kb_index(current))
+        if qa_dedup.stamp is None or qa_dedup.stamp < current:
+            sync_qa_dedup()
+
+    def save_kb_snapshot(index: KBIndex) -> None:
+        """
+        Grava o snapshot do índice (se estiver sincronizado com a BD).
+        Falhar a gravação não impede de responder: fica só sem snapshot.
+        """
+        snapshot_path = app.config["KB_SNAPSHOT_PATH"]
+        if not snapshot_path or index.stamp is None:
+            return
+        try:
+            write_snapshot(index, snapshot_path, index.stamp, KBVersion.identity())
+        except OSError:
+            app.logger.warning("Não foi possível gravar o snapshot do índice em %s", snapshot_path)
+
+    index_rebuilder = IndexRebuilder(
+        app, rebuild_kb_index,
+        debounce=app.config["KB_REBUILD_DEBOUNCE_MS"] / 1000,
+        background=app.config["KB_REBUILD_BACKGROUND"],
+    )
+    app.extensions["kb_index_rebuilder"] = index_rebuilder
+    metrics.register("index_rebuilds_total", "counter", "Reconstruções do índice concluídas",
+                     lambda: index_rebuilder.builds)
+    metrics.register("index_rebuild_coalesced_total", "counter",
+                     "Pedidos de reconstrução agrupados com outros", lambda: index_rebuilder.coalesced)
+
+    # Índice MinHash/LSH de quase duplicados: (re)construído com o índice de pesquisa
+    # (arranque e IndexRebuilder), nunca no pedido que grava um item
+    qa_dedup = DuplicateIndex(threshold=app.config["DEDUP_THRESHOLD"])
+    app.extensions["qa_dedup"] = qa_dedup
+
+    def sync_qa_dedup() -> DuplicateIndex:
+        """
+        Índice de duplicados na versão actual da base (reconstruído se mudou noutro lado).
+        A versão é lida antes dos itens: se mudar entretanto, fica marcado como atrasado.
+        """
+        version = KBVersion.current()
+        if qa_dedup.stamp != version:
+            qa_dedup.build(db.session.query(QAItem.id, QAItem.question).all())
+            qa_dedup.stamp = version
+        return qa_dedup
+
+    def warn_duplicates(qa: QAItem, version: int) -> None:
+        """
+        Depois de gravar qa (versão `version` da base): avisa se já há perguntas quase iguais.
+        Se o índice de duplicados estava na versão anterior, basta actualizar este item
+        (só os candidatos LSH são comparados). Se está mais atrasado (ex.: alteração noutro
+        worker ainda por reconstruir), não há aviso: a reconstrução fica para o IndexRebuilder.
+        """
+        if qa_dedup.stamp != version - 1:
+            return
+        terms = normalize(qa.question)
+        qa_dedup.add(qa.id, terms)
+        qa_dedup.stamp = version
+        similar = qa_dedup.similar(terms, exclude=qa.id)[:3]
+        if not similar:
+            return
+        questions = dict(
+            db.session.query(QAItem.id, QAItem.question).filter(QAItem.id.in_([i for i, _ in similar]))
+        )
+        for qa_id, score in similar:
+            if qa_id in questions:
+                flash(f"Possível duplicado do item #{qa_id}: “{questions[qa_id]}” "
+                      f"(semelhança {score:.2f}).", "warning")
+
+    # Sugestões do chat: só mudam com a base de conhecimento (uma consulta por versão, não por página)
+    suggestions = VersionedCache(lambda: [
+        question for (question,) in db.session.query(QAItem.question)
+        .order_by(QAItem.id.desc()).limit(app.config["SUGGESTIONS_COUNT"])
+    ])
+    metrics.register("suggestions_cache_hits_total", "counter", "Sugestões servidas da cache",
+                     lambda: suggestions.hits)
+    # O ETag do fragmento também muda com o template (deploy novo com a mesma versão da base)
+    suggestions_template = file_digest(os.path.join(app.root_path, app.template_folder, "_suggestions.html"))
+
+    pages = PageCache()
 
     with app.app_context():
+        install_sqlite_pragmas(db.engine, app.config["SQLITE_PRAGMAS"])
+        install_db_timing(db.engine, metrics)
         db.create_all()
+        ensure_indexes()
+        KBVersion.ensure()
+        rebuild_kb_index()
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_time(response):
+        started = g.pop("request_started", None)
+        if started is not None and request.endpoint != "metrics_endpoint":
+            metrics.observe("request", time.perf_counter() - started)
+            if app.config["SERVER_TIMING"]:
+                header = server_timing_header()
+                if header:
+                    response.headers["Server-Timing"] = header
+        return response
 
     # -------------------------
     # Rotas públicas
@@ -61,7 +427,12 @@ def create_app() -> Flask:
     def landing():
         if current_user.is_authenticated:
             return redirect(url_for("index"))
-        return render_template("landing.html")
+        # Igual para todos os visitantes: renderizada uma vez por worker, com ETag
+        # (visita repetida = 304 sem corpo). Mensagens flash pendentes ou debug: render normal
+        if "_flashes" in session or app.debug or not app.config["HTTP_PAGE_CACHE"]:
+            return render_template("landing.html")
+        body, etag = pages.get("landing", lambda: render_template("landing.html"))
+        return not_modified(etag) or revalidated(body, etag)
 
     @app.route("/register", methods=["GET", "POST"])
     def register():
@@ -77,7 +448,7 @@ def create_app() -> Flask:
             user = User(
                 full_name=form.full_name.data.strip(),
                 email=email,
-                password_hash=generate_password_hash(form.password.data),
+                password_hash=passwords.hash(form.password.data),
                 is_admin=False,
             )
             db.session.add(user)
@@ -96,11 +467,17 @@ def create_app() -> Flask:
             email = form.email.data.lower().strip()
             user = User.query.filter_by(email=email).first()
 
-            if not user or not check_password_hash(user.password_hash, form.password.data):
+            if not user or not passwords.verify(user.password_hash, form.password.data):
                 flash("Credenciais inválidas.", "danger")
                 return redirect(url_for("login"))
 
-            login_user(user, remember=form.remember.data)
+            # Hash com outro método/custo (ex.: PASSWORD_HASH_METHOD mudou): refaz agora,
+            # que a palavra-passe está disponível
+            if passwords.needs_rehash(user.password_hash):
+                user.password_hash = passwords.hash(form.password.data)
+                db.session.commit()
+
+            login_user(user_cache.put(user), remember=form.remember.data)
             return redirect(url_for("index"))
 
         # Se validate_on_submit falhar, vamos continuar a mostrar a página
@@ -117,70 +494,235 @@ def create_app() -> Flask:
     # -------------------------
     # Chat / Histórico / Conta
     # -------------------------
+    def ask_question(user_q: str) -> dict:
+        """
+        Procura a resposta e regista pergunta + resposta numa só transacção.
+        Usado pelo formulário (/chat) e pela API JSON (/api/chat).
+        Retorna: answer, score, qa_id (None se não houve correspondência) e
+        alternatives (top-k: qa_id, question, score).
+        """
+        # Hora de chegada da pergunta (a mensagem só é gravada no fim)
+        asked_at = datetime.utcnow()
+
+        # Normalização e matching fora de qualquer escrita: o lock de escrita
+        # do SQLite só é pedido no commit final
+        # Pergunta repetida (mesmos lemas, mesma versão da base): não há scoring
+        metrics.inc("chat_questions_total")
+        with metrics.timer("normalize"):
+            terms = normalize(user_q)
+        # Base alterada (aqui ou noutro worker): pede um índice novo em segundo plano
+        # e responde já com o actual. A cache usa a versão da BD; enquanto o índice
+        # está atrasado, não se lê nem se grava nela (match_answer lê as respostas da BD
+        # e ignora itens eliminados: nunca sai uma resposta anterior à edição do admin)
+        # O token da BD entra na chave: outra BD (ex.: recriada pelo seed) na mesma versão
+        # não lê as respostas desta
+        version, db_token = KBVersion.state()
+        index_current = kb_index.stamp is not None and kb_index.stamp >= version
+        if not index_current:
+            index_rebuilder.request(version)
+        key = cache_key(terms, db_token)
+        result = None
+        if index_current:
+            with metrics.timer("answer_cache"):
+                result = answer_cache.get(key, version)
+        if result is None:
+            with metrics.timer("match"):
+                result = match_answer(terms)
+            if index_current:
+                answer_cache.put(key, version, result)
+
+        with metrics.timer("save"):
+            save_exchange(user_q, result["answer"], asked_at)
+        return result
+
+    def save_exchange(user_q: str, answer: str, asked_at: datetime) -> None:
+        """
+        Grava pergunta e resposta com um único commit
+        (ou em lote com outros pedidos, se CHAT_WRITE_BEHIND=1).
+        """
+        rows = [
+            {"user_id": current_user.id, "role": "user", "content": user_q, "created_at": asked_at},
+            {"user_id": current_user.id, "role": "assistant", "content": answer, "created_at": datetime.utcnow()},
+        ]
+        if write_queue is None:
+            db.session.add_all([ChatMessage(**row) for row in rows])
+            db.session.commit()
+            return
+
+        ticket = write_queue.submit(rows)
+        if app.config["CHAT_WRITE_BEHIND_SYNC"]:
+            ticket.wait(timeout=app.config["CHAT_WRITE_BEHIND_TIMEOUT"])
+
+    def match_answer(terms: list[str]) -> dict:
+        """
+        Procura a resposta no índice (sem cache).
+        """
+        ranked = kb_index.query_terms(terms, top_k=3) if len(kb_index) else []
+        items = {qa.id: qa for qa in QAItem.query.filter(QAItem.id.in_([i for i, _ in ranked]))} if ranked else {}
+        # Índice ainda da versão anterior: ignora itens entretanto eliminados
+        ranked = [(qa_id, score) for qa_id, score in ranked if qa_id in items]
+        best_id, best_score = ranked[0] if ranked else (None, 0.0)
+
+        if len(kb_index) == 0:
+            answer = (
+                "Ainda não tenho base de conhecimento carregada. "
+                "Pede ao admin para adicionar Perguntas/Respostas."
+            )
+            best_id = None
+        elif best_score < MATCH_THRESHOLD:
+            answer = (
+                "Não encontrei uma correspondência forte para isso. "
+                "Tenta reformular a pergunta (mais concreta) ou escolhe uma sugestão."
+            )
+            best_id = None
+        else:
+            answer = items[best_id].answer
+
+        return {
+            "answer": answer,
+            "score": best_score,
+            "qa_id": best_id,
+            "alternatives": [
+                {"qa_id": qa_id, "question": items[qa_id].question, "score": score}
+                for qa_id, score in ranked
+            ],
+        }
+
     @app.route("/chat", methods=["GET", "POST"])
     @login_required
     def index():
         form = ChatForm()
 
-        messages = (
-            ChatMessage.query
-            .filter_by(user_id=current_user.id)
-            .order_by(ChatMessage.created_at.asc())
-            .all()
-        )
-
-        qa_items = QAItem.query.order_by(QAItem.id.desc()).limit(8).all()
-        suggestion_questions = [q.question for q in qa_items]
-
         if form.validate_on_submit():
-            user_q = form.question.data.strip()
+            ask_question(form.question.data.strip())
+            return redirect(url_for("index"))
 
-            db.session.add(ChatMessage(user_id=current_user.id, role="user", content=user_q))
-            db.session.commit()
+        # Só a janela mais recente; as anteriores chegam por /chat/messages
+        messages, older_cursor = ChatMessage.page(current_user.id, limit=app.config["CHAT_PAGE_SIZE"])
 
-            all_qa = QAItem.query.all()
-            stored_questions = [x.question for x in all_qa]
-
-            if not all_qa:
-                answer = (
-                    "Ainda não tenho base de conhecimento carregada. "
-                    "Pede ao admin para adicionar Perguntas/Respostas."
-                )
-            else:
-                ranked = match_question(user_q, stored_questions, top_k=3)
-                best_idx, best_score = ranked[0]
-
-                if best_score < 0.12:
-                    answer = (
-                        "Não encontrei uma correspondência forte para isso. "
-                        "Tenta reformular a pergunta (mais concreta) ou escolhe uma sugestão."
-                    )
-                else:
-                    answer = all_qa[best_idx].answer
-
-            db.session.add(ChatMessage(user_id=current_user.id, role="assistant", content=answer))
-            db.session.commit()
+        with metrics.timer("render"):
+            return render_template(
+                "index.html",
+                form=form,
+                messages=messages,
+                older_cursor=older_cursor,
+                suggestions=suggestions.get(KBVersion.current())
+            )
 
-            return redirect(url_for("index"))
+    @app.route("/chat/suggestions")
+    @login_required
+    def chat_suggestions():
+        """
+        Fragmento HTML das sugestões (o chat actualiza-o ao voltar ao separador).
+        ETag = versão da base + template: sem alterações do admin, a resposta é 304.
+        """
+        version = KBVersion.current()
+        etag = f"kb{version}-{suggestions_template}"
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+        response = revalidated(render_template("_suggestions.html", suggestions=suggestions.get(version)), etag)
+        response.cache_control.private = True
+        return response
+
+    @app.route("/metrics")
+    def metrics_endpoint():
+        """
+        Métricas deste worker em texto Prometheus (404 se desligado, ver METRICS_ENABLED).
+        Com METRICS_TOKEN definido, exige "Authorization: Bearer <token>".
+        """
+        if not app.config["METRICS_ENABLED"]:
+            abort(404)
+        token = app.config["METRICS_TOKEN"]
+        if token and request.headers.get("Authorization", "") != f"Bearer {token}":
+            abort(401)
+        return Response(metrics.render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+    @app.route("/api/chat", methods=["POST"])
+    @login_required
+    def api_chat():
+        """
+        Versão JSON do /chat (sem redirect nem re-render da página).
+        Corpo: {"question": "...", "csrf_token": "..."}.
+        Corpo JSON que não é um objecto com textos (ex.: lista, "question": 123): 400.
+        """
+        if request.is_json:
+            payload = request.get_json(silent=True)
+            if not isinstance(payload, dict) or not all(
+                isinstance(payload.get(key, ""), str) for key in ("question", "csrf_token")
+            ):
+                return jsonify(errors={"question": ["Pedido inválido: esperado {\"question\": \"texto\"}."]}), 400
+        form = ChatForm()
+        if not form.validate_on_submit():
+            return jsonify(errors=form.errors), 400
+        return jsonify(ask_question(form.question.data.strip()))
 
-        return render_template(
-            "index.html",
-            form=form,
-            messages=messages,
-            suggestions=suggestion_questions
+    @app.route("/chat/messages")
+    @login_required
+    def chat_messages():
+        """
+        Página de mensagens anteriores ao cursor `before` (JSON),
+        pedida pelo chat ao fazer scroll para cima.
+        """
+        try:
+            messages, older_cursor = ChatMessage.page(
+                current_user.id, before=request.args.get("before"), limit=app.config["CHAT_PAGE_SIZE"]
+            )
+        except ValueError:
+            abort(400)
+
+        return jsonify(
+            messages=[
+                {"id": m.id, "role": m.role, "content": m.content, "created_at": m.created_at.isoformat()}
+                for m in messages
+            ],
+            older_cursor=older_cursor,
         )
 
     @app.route("/history")
     @login_required
     def history():
-        messages = (
-            ChatMessage.query
-            .filter_by(user_id=current_user.id)
-            .order_by(ChatMessage.created_at.desc())
-            .limit(200)
-            .all()
+        """
+        Mensagens em chat_messages (páginas por cursor) e, depois da última,
+        as arquivadas: uma página por mês (?archive=AAAA-MM), lida só quando pedida.
+        """
+        month = request.args.get("archive")
+        if month:
+            months = ChatArchive.months(current_user.id)
+            if month not in months:
+                abort(404)
+            messages = read_month(current_user.id, month)
+            older = months.index(month) + 1
+            messages.reverse()  # mais recentes primeiro
+            return render_template(
+                "history.html",
+                messages=messages,
+                archive_month=month,
+                older_archive=months[older] if older < len(months) else None,
+                is_first_page=False,
+            )
+
+        try:
+            messages, older_cursor = ChatMessage.page(
+                current_user.id, before=request.args.get("before"), limit=app.config["HISTORY_PAGE_SIZE"]
+            )
+        except ValueError:
+            abort(400)
+
+        # Fim das mensagens vivas: a seguir vem o mês arquivado mais recente (se houver)
+        older_archive = None
+        if older_cursor is None:
+            months = ChatArchive.months(current_user.id)
+            older_archive = months[0] if months else None
+
+        messages.reverse()  # mais recentes primeiro
+        return render_template(
+            "history.html",
+            messages=messages,
+            older_cursor=older_cursor,
+            older_archive=older_archive,
+            is_first_page=not request.args.get("before"),
         )
-        return render_template("history.html", messages=messages)
 
     @app.route("/change-password", methods=["GET", "POST"])
     @login_required
@@ -189,12 +731,14 @@ def create_app() -> Flask:
         shown_new_password = None
 
         if form.validate_on_submit():
-            if not check_password_hash(current_user.password_hash, form.current_password.data):
+            # current_user é uma cópia em cache (sem hash): lê e altera o registo da BD
+            user = db.session.get(User, current_user.id)
+            if not passwords.verify(user.password_hash, form.current_password.data):
                 flash("A palavra-passe actual está errada.", "danger")
                 return redirect(url_for("change_password"))
 
             new_pw = form.new_password.data
-            current_user.password_hash = generate_password_hash(new_pw)
+            user.password_hash = passwords.hash(new_pw)
             db.session.commit()
 
             shown_new_password = new_pw
@@ -222,12 +766,58 @@ def create_app() -> Flask:
         if form.validate_on_submit():
             qa = QAItem(question=form.question.data.strip(), answer=form.answer.data.strip())
             db.session.add(qa)
+            version = KBVersion.bump()
             db.session.commit()
+            index_rebuilder.request(version)
             flash("Pergunta/Resposta adicionada.", "success")
+            warn_duplicates(qa, version)
             return redirect(url_for("admin_qa"))
 
         items = QAItem.query.order_by(QAItem.updated_at.desc()).all()
-        return render_template("admin_qa.html", form=form, items=items)
+        return render_template("admin_qa.html", form=form, import_form=QAImportForm(), items=items)
+
+    @app.route("/admin/qa/import", methods=["POST"])
+    @login_required
+    def admin_qa_import():
+        if not admin_required():
+            return redirect(url_for("index"))
+
+        form = QAImportForm()
+        if not form.validate_on_submit():
+            for err in form.file.errors:
+                flash(err, "danger")
+            return redirect(url_for("admin_qa"))
+
+        upload = form.file.data
+        fmt = detect_format(upload.filename)
+        # Streaming: o ficheiro é lido linha a linha, sem o carregar todo
+        stream = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", newline="")
+        try:
+            report = import_qa(stream, fmt, chunk_size=app.config["QA_IMPORT_CHUNK_SIZE"])
+        finally:
+            # Uma única reconstrução do índice, no fim (em segundo plano),
+            # também se a importação falhar a meio (os lotes anteriores já estão gravados)
+            index_rebuilder.request(KBVersion.current())
+
+        flash(f"Importação concluída: {report.summary()}.", "success" if report.inserted else "info")
+        for err in report.errors[:5]:
+            flash(err, "warning")
+        return redirect(url_for("admin_qa"))
+
+    @app.route("/admin/qa/export.<fmt>")
+    @login_required
+    def admin_qa_export(fmt: str):
+        if not admin_required():
+            return redirect(url_for("index"))
+        if fmt not in FORMATS:
+            abort(404)
+
+        mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+        return Response(
+            stream_with_context(export_qa(fmt)),
+            content_type=f"{mimetype}; charset=utf-8",
+            headers={"Content-Disposition": f"attachment; filename=qa_items.{fmt}"},
+        )
 
     @app.route("/admin/qa/<int:qa_id>/delete", methods=["POST"])
     @login_required
@@ -237,7 +827,12 @@ def create_app() -> Flask:
 
         qa = QAItem.query.get_or_404(qa_id)
         db.session.delete(qa)
+        version = KBVersion.bump()
         db.session.commit()
+        index_rebuilder.request(version)
+        if qa_dedup.stamp == version - 1:
+            qa_dedup.remove(qa_id)
+            qa_dedup.stamp = version
         flash("Item eliminado.", "info")
         return redirect(url_for("admin_qa"))
 
@@ -253,17 +848,158 @@ def create_app() -> Flask:
         if form.validate_on_submit():
             qa.question = form.question.data.strip()
             qa.answer = form.answer.data.strip()
+            version = KBVersion.bump()
             db.session.commit()
+            index_rebuilder.request(version)
             flash("Item actualizado.", "success")
+            warn_duplicates(qa, version)
             return redirect(url_for("admin_qa"))
 
         return render_template(
             "admin_qa.html",
             form=form,
+            import_form=QAImportForm(),
             items=QAItem.query.order_by(QAItem.updated_at.desc()).all(),
             editing_id=qa_id
         )
 
+    @app.route("/admin/qa/duplicates")
+    @login_required
+    def admin_qa_duplicates():
+        """
+        Relatório de grupos de perguntas quase duplicadas em toda a base.
+        ?threshold=0.8 muda o limiar de semelhança (Jaccard entre lemas).
+        """
+        if not admin_required():
+            return redirect(url_for("index"))
+
+        threshold = request.args.get("threshold", type=float) or app.config["DEDUP_THRESHOLD"]
+        threshold = min(1.0, max(0.05, threshold))
+        dedup = sync_qa_dedup()
+        clusters = dedup.clusters(threshold)
+
+        ids = [qa_id for group in clusters for qa_id in group]
+        items = {qa.id: qa for qa in QAItem.query.filter(QAItem.id.in_(ids))} if ids else {}
+        groups = [[items[qa_id] for qa_id in group if qa_id in items] for group in clusters]
+        return render_template(
+            "admin_duplicates.html",
+            groups=[g for g in groups if len(g) > 1],
+            threshold=threshold,
+            total=len(dedup),
+        )
+
+    @app.route("/admin/index/status")
+    @login_required
+    def admin_index_status():
+        """
+        Estado do índice deste worker (JSON): versão servida vs. versão da BD,
+        tamanho, duração da última reconstrução e pedidos pendentes/agrupados.
+        """
+        if not current_user.is_admin:
+            abort(403)
+        db_version = KBVersion.current()
+        snap = metrics.snapshot()
+        return jsonify(
+            pid=os.getpid(),
+            backend=kb_index.backend,
+            items=len(kb_index),
+            index_version=kb_index.stamp,
+            db_version=db_version,
+            stale=kb_index.stamp != db_version,
+            index_build_seconds=snap["gauges"].get("index_build_seconds"),
+            index_load=snap["timings"].get("index_load"),
+            rebuild=index_rebuilder.status(),
+        )
+
+    # -------------------------
+    # CLI (flask --app app ...)
+    # -------------------------
+    @app.cli.command("import-qa")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--format", "fmt", type=click.Choice(FORMATS), default=None,
+                  help="Formato do ficheiro (por omissão, pela extensão).")
+    @click.option("--chunk-size", type=int, default=None, help="Linhas por transacção.")
+    def import_qa_command(path: str, fmt: str | None, chunk_size: int | None):
+        """Importa Perguntas/Respostas de um ficheiro CSV/JSONL."""
+        fmt = fmt or detect_format(path)
+        try:
+            with open(path, encoding="utf-8-sig", newline="") as f:
+                report = import_qa(f, fmt, chunk_size=chunk_size or app.config["QA_IMPORT_CHUNK_SIZE"])
+        finally:
+            # Reconstrói uma vez: os lemas novos ficam na cache persistente
+            # e os workers em execução só têm de detectar a mudança
+            rebuild_kb_index()
+        for err in report.errors:
+            click.echo(f"  {err}", err=True)
+        click.echo(f"Importação concluída: {report.summary()}.")
+
+    @app.cli.command("find-duplicates")
+    @click.option("--threshold", type=float, default=None,
+                  help="Semelhança mínima (Jaccard entre lemas, 0-1).")
+    @click.option("--format", "fmt", type=click.Choice(["text", "jsonl"]), default="text")
+    def find_duplicates_command(threshold: float | None, fmt: str):
+        """Agrupa perguntas quase duplicadas (MinHash + LSH) em toda a base."""
+        dedup = sync_qa_dedup()
+        clusters = dedup.clusters(threshold)
+        questions = dict(db.session.query(QAItem.id, QAItem.question))
+        for n, group in enumerate(clusters, start=1):
+            if fmt == "jsonl":
+                click.echo(json.dumps(
+                    {"group": n, "items": [{"id": i, "question": questions.get(i)} for i in group]},
+                    ensure_ascii=False,
+                ))
+                continue
+            click.echo(f"Grupo {n} ({len(group)} itens):")
+            for qa_id in group:
+                click.echo(f"  #{qa_id} {questions.get(qa_id, '')}")
+        click.echo(f"{len(clusters)} grupos, {sum(len(g) for g in clusters)} itens "
+                   f"(de {len(dedup)}).", err=fmt == "jsonl")
+
+    @app.cli.command("compress-static")
+    @click.option("--min-size", type=int, default=512, help="Ficheiros mais pequenos (bytes) não são comprimidos.")
+    def compress_static_command(min_size: int):
+        """Cria as variantes .gz (e .br, com o pacote brotli) dos ficheiros estáticos (para o build)."""
+        for entry in compress_static(app.static_folder, min_size):
+            sizes = ", ".join(f"{enc} {entry[enc]}" for enc in ("br", "gzip") if enc in entry) or "não comprimido"
+            click.echo(f"  {entry['file']}: {entry['size']} bytes -> {sizes}")
+
+    @app.cli.command("archive-chats")
+    @click.option("--days", type=int, default=None, help="Arquiva mensagens com mais de N dias.")
+    @click.option("--batch-size", type=int, default=None, help="Mensagens por transacção.")
+    @click.option("--pause-ms", type=float, default=None, help="Pausa entre lotes (liberta o lock de escrita).")
+    @click.option("--vacuum", "vacuum_mode", type=click.Choice(VACUUM_MODES), default="none",
+                  help="Devolver o espaço ao disco no fim (SQLite).")
+    @click.option("--dry-run", is_flag=True, help="Só conta as mensagens a arquivar.")
+    def archive_chats_command(days: int | None, batch_size: int | None, pause_ms: float | None,
+                              vacuum_mode: str, dry_run: bool):
+        """Move as mensagens antigas do chat para o arquivo comprimido (gzip JSONL por utilizador e mês)."""
+        days = app.config["CHAT_RETENTION_DAYS"] if days is None else days
+        if dry_run:
+            cutoff = datetime.utcnow() - timedelta(days=days)
+            click.echo(f"{pending_count(cutoff)} mensagens com mais de {days} dias.")
+            return
+        try:
+            report = archive_chats(
+                days,
+                batch_size=batch_size or app.config["CHAT_ARCHIVE_BATCH"],
+                pause=(app.config["CHAT_ARCHIVE_PAUSE_MS"] if pause_ms is None else pause_ms) / 1000,
+                vacuum_mode=vacuum_mode,
+            )
+        except ValueError as exc:
+            raise click.ClickException(str(exc))
+        click.echo(f"Arquivo concluído: {report.summary()}.")
+
+    @app.cli.command("export-qa")
+    @click.argument("path", type=click.Path(dir_okay=False, allow_dash=True), default="-")
+    @click.option("--format", "fmt", type=click.Choice(FORMATS), default=None,
+                  help="Formato do ficheiro (por omissão, pela extensão; jsonl para stdout).")
+    def export_qa_command(path: str, fmt: str | None):
+        """Exporta Perguntas/Respostas para CSV/JSONL (ou stdout)."""
+        fmt = fmt or ("jsonl" if path == "-" else detect_format(path))
+        with click.open_file(path, "w", encoding="utf-8", lazy=False) as out:
+            for chunk in export_qa(fmt):
+                out.write(chunk)
+
     return app
 
 
@@ -0,0 +1,133 @@
+"""
+auth.py
+-------
+Autenticação mais barata, por pedido e no login.
+
+1. UserCache: cache por worker do user_loader do Flask-Login
+   - antes: cada pedido autenticado fazia db.session.get(User, id) só para ter current_user
+   - agora: cópia imutável (CachedUser: id, nome, email, is_admin) em memória,
+     LRU + TTL (USER_CACHE_SIZE / USER_CACHE_TTL)
+   - invalidação: alterações a User feitas pelo ORM neste processo (palavra-passe,
+     is_admin, nome; eventos do SQLAlchemy); nos outros workers, no fim do TTL
+   - a cópia não tem password_hash: quem altera o utilizador lê-o da BD
+
+2. PasswordHasher: método e parâmetros do hash configuráveis (PASSWORD_HASH_METHOD)
+   - formato do Werkzeug: "scrypt" (= "scrypt:32768:8:1", a omissão do Werkzeug),
+     "scrypt:16384:8:1", "pbkdf2:sha256:600000", ...
+   - rehash transparente no login: se o hash guardado tem outro método ou outros
+     parâmetros, é recalculado com a palavra-passe acabada de verificar
+   - medir o custo de cada opção com: python -m benchmarks.login
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+from flask_login import UserMixin
+from sqlalchemy import event
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class CachedUser(UserMixin):
+    """
+    Cópia só de leitura de um User (o que os pedidos usam de current_user).
+    """
+
+    def __init__(self, id: int, full_name: str, email: str, is_admin: bool):
+        self.id = id
+        self.full_name = full_name
+        self.email = email
+        self.is_admin = is_admin
+
+    @classmethod
+    def from_user(cls, user) -> "CachedUser":
+        return cls(user.id, user.full_name, user.email, bool(user.is_admin))
+
+
+class UserCache:
+    """
+    LRU + TTL de CachedUser por id (thread-safe). maxsize=0 desliga.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[int, tuple[float, CachedUser]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> CachedUser | None:
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[user_id]
+                self.misses += 1
+                return None
+            self._data.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, user) -> CachedUser:
+        cached = CachedUser.from_user(user)
+        if self.maxsize <= 0:
+            return cached
+        with self._lock:
+            self._data[cached.id] = (time.monotonic() + self.ttl, cached)
+            self._data.move_to_end(cached.id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return cached
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._data.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def install(self, app, model) -> None:
+        """
+        Passa a ser a cache de app (app.extensions["user_cache"]) e invalida a entrada
+        quando o ORM grava uma alteração/eliminação do utilizador.
+        (UPDATE em massa via query.update() não passa por estes eventos.)
+        Os listeners são registados uma só vez por modelo: várias apps no mesmo
+        processo (benchmarks) não os acumulam nem prendem caches antigas.
+        """
+        app.extensions["user_cache"] = self
+        for identifier in ("after_update", "after_delete"):
+            if not event.contains(model, identifier, _invalidate_cached_user):
+                event.listen(model, identifier, _invalidate_cached_user)
+
+
+def _invalidate_cached_user(_mapper, _connection, target) -> None:
+    """Listener do ORM: invalida o utilizador na cache da app que está a gravar."""
+    if has_app_context():
+        cache = current_app.extensions.get("user_cache")
+        if cache is not None:
+            cache.invalidate(target.id)
+
+
+class PasswordHasher:
+    """
+    generate/check_password_hash do Werkzeug com método e salt configuráveis.
+    """
+
+    def __init__(self, method: str = "scrypt", salt_length: int = 16):
+        self.salt_length = salt_length
+        # Forma canónica (com todos os parâmetros), igual ao prefixo dos hashes gerados;
+        # gerar um hash aqui também valida o método logo no arranque
+        self.method = generate_password_hash("", method, salt_length).split("$", 1)[0]
+
+    def hash(self, password: str) -> str:
+        return generate_password_hash(password, self.method, self.salt_length)
+
+    def verify(self, stored_hash: str, password: str) -> bool:
+        return check_password_hash(stored_hash, password)
+
+    def needs_rehash(self, stored_hash: str) -> bool:
+        """O hash guardado foi gerado com outro método/parâmetros?"""
+        return stored_hash.split("$", 1)[0] != self.method
@@ -0,0 +1,26 @@
+"""
+benchmarks
+----------
+Scripts de medição (desempenho e verificação) do motor de matching.
+
+Cada script corre a partir da raiz do projecto, por exemplo:
+  python -m benchmarks.backends
+"""
+
+import os
+
+# Nenhum benchmark grava em instance/: sem cache de lemas, de respostas nem snapshot do índice
+INSTANCE_FREE_ENV = {
+    "NLP_CACHE_PATH": "",
+    "ANSWER_CACHE": "none",
+    "KB_SNAPSHOT_PATH": "",
+}
+
+
+def isolate_instance() -> None:
+    """
+    Aplica INSTANCE_FREE_ENV (só às variáveis que não vêm já do ambiente).
+    Chamar antes de importar a app e o nlp_utils.
+    """
+    for key, value in INSTANCE_FREE_ENV.items():
+        os.environ.setdefault(key, value)
@@ -0,0 +1,105 @@
+"""
+benchmarks/backends.py
+----------------------
+Compara os backends de scoring do KBIndex (python vs numpy):
+- verifica que devolvem o mesmo ranking (ids e scores)
+- mede a latência por pergunta e o débito em lote (query_many)
+
+Corpus: perguntas sintéticas geradas a partir do SEED_QA (seed.py).
+
+Executa:
+  python -m benchmarks.backends --items 5000 --queries 500
+"""
+
+import argparse
+import random
+import time
+
+from kb_index import KBIndex, np
+from nlp_utils import normalize
+from seed import SEED_QA
+
+
+def make_corpus(n_items: int, rng: random.Random) -> list[str]:
+    """
+    Perguntas sintéticas: mistura de palavras das perguntas do SEED_QA.
+    """
+    words = [w for q, _ in SEED_QA for w in q.rstrip("?.").split()]
+    corpus = [q for q, _ in SEED_QA]
+    while len(corpus) < n_items:
+        corpus.append(" ".join(rng.sample(words, rng.randint(3, 9))) + "?")
+    return corpus[:n_items]
+
+
+def same_ranking(a: list[tuple[int, float]], b: list[tuple[int, float]], top_k: int, tol: float = 1e-9) -> bool:
+    """
+    Mesmo ranking nas primeiras top_k posições: mesmos scores (a menos de tol)
+    e mesmos ids, excepto entre itens empatados (a ordem entre empatados,
+    que podem diferir no último bit, é irrelevante).
+    As listas devem ter top_k + 1 elementos, para se ver empates na fronteira.
+    """
+    if len(a) != len(b):
+        return False
+    for i, ((id_a, s_a), (id_b, s_b)) in enumerate(zip(a, b)):
+        if abs(s_a - s_b) > tol:
+            return False
+        if i < top_k and id_a != id_b:
+            tied = sum(1 for _, s in a if abs(s - s_a) <= tol)
+            if tied < 2:
+                return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if np is None:
+        raise SystemExit("NumPy não está instalado: só existe o backend python.")
+
+    rng = random.Random(args.seed)
+    corpus = make_corpus(args.items, rng)
+    queries = [rng.choice(corpus) if i % 2 else " ".join(rng.sample(corpus, 2)) for i in range(args.queries)]
+
+    indexes = {}
+    for name in ("python", "numpy"):
+        kb = KBIndex(backend=name)
+        t0 = time.perf_counter()
+        kb.build(enumerate(corpus, start=1))
+        kb.query("aquecimento")  # força o _refresh
+        indexes[name] = kb
+        print(f"[{name}] build: {time.perf_counter() - t0:.2f}s ({len(kb)} itens)")
+
+    # normalização fora da medição: só interessa o scoring
+    query_terms = [normalize(q) for q in queries]
+
+    results = {}
+    for name, kb in indexes.items():
+        t0 = time.perf_counter()
+        results[name] = [kb.query_terms(terms, top_k=args.top_k + 1) for terms in query_terms]
+        per_query = (time.perf_counter() - t0) / len(queries)
+
+        t0 = time.perf_counter()
+        batch = kb.query_many(queries, top_k=args.top_k + 1)
+        batch_qps = len(queries) / (time.perf_counter() - t0)
+
+        assert all(same_ranking(x, y, args.top_k) for x, y in zip(batch, results[name])), f"{name}: lote != individual"
+        print(f"[{name}] {per_query * 1000:.3f} ms/pergunta | lote (inclui normalize): {batch_qps:.0f} perguntas/s")
+
+    mismatches = [
+        (q, a, b) for q, a, b in zip(queries, results["python"], results["numpy"])
+        if not same_ranking(a, b, args.top_k)
+    ]
+    print(f"Rankings diferentes: {len(mismatches)} / {len(queries)}")
+    for q, a, b in mismatches[:5]:
+        print(f"  {q!r}\n    python: {a}\n    numpy:  {b}")
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
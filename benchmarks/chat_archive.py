@@ -0,0 +1,155 @@
+"""
+benchmarks/chat_archive.py
+--------------------------
+Retenção do histórico (chat_archive.py) numa BD SQLite temporária com muitas mensagens.
+
+Mede:
+- tamanho do ficheiro da BD antes e depois de archive-chats (+ incremental_vacuum)
+- tempo total e tempo por lote (= quanto tempo o lock de escrita fica preso), por --batch-size
+- ChatMessage.page() (primeira página do chat) antes e depois
+- leitura de um mês arquivado (read_month, o que o /history faz a pedido)
+
+Executa (a partir da raiz do projecto):
+  python -m benchmarks.chat_archive
+  python -m benchmarks.chat_archive --users 500 --days 365 --batch-sizes 200 1000 5000
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks import isolate_instance
+
+isolate_instance()  # antes de importar a app
+
+from benchmarks.suite import summarize
+from seed import SEED_QA
+
+
+def fill(db, ChatMessage, User, users: int, days: int, per_day: float, seed: int) -> int:
+    """Histórico sintético: perguntas/respostas do SEED_QA espalhadas por `days` dias."""
+    from sqlalchemy import insert
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    db.session.execute(insert(User), [
+        {"full_name": f"Aluno {i}", "email": f"aluno{i}@uni.ao", "password_hash": "x", "is_admin": False}
+        for i in range(users)
+    ])
+    total = 0
+    for user_id in range(1, users + 1):
+        rows = []
+        for _ in range(int(days * per_day)):
+            question, answer = rng.choice(SEED_QA)
+            asked = now - timedelta(days=rng.uniform(0, days))
+            rows.append({"user_id": user_id, "role": "user", "content": question, "created_at": asked})
+            rows.append({"user_id": user_id, "role": "assistant", "content": answer,
+                         "created_at": asked + timedelta(seconds=1)})
+        db.session.execute(insert(ChatMessage), rows)
+        total += len(rows)
+    db.session.commit()
+    return total
+
+
+def page_latency(ChatMessage, users: int, reps: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    latencies = []
+    for _ in range(reps):
+        user_id = rng.randint(1, users)
+        t0 = time.perf_counter()
+        ChatMessage.page(user_id, limit=30)
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies)
+
+
+def run(batch_size: int, args) -> dict:
+    tmp = tempfile.mkdtemp(prefix="bench_archive_")
+    db_path = os.path.join(tmp, "app.db")
+    try:
+        os.environ["DATABASE_PATH"] = db_path
+        from app import create_app
+        import chat_archive
+        from models import db, ChatArchive, ChatMessage, User
+
+        app = create_app()
+        with app.app_context():
+            messages = fill(db, ChatMessage, User, args.users, args.days, args.per_day, args.seed)
+            db.session.execute(db.text("PRAGMA wal_checkpoint(TRUNCATE)"))
+            entry = {"batch_size": batch_size, "messages": messages, "db_bytes_before": os.path.getsize(db_path)}
+            entry["page_before"] = page_latency(ChatMessage, args.users, args.reps, args.seed)
+
+            # Tempo de cada lote (transacção com o lock de escrita)
+            batch_times = []
+            original = chat_archive._archive_batch
+
+            def timed_batch(*a, **kw):
+                t0 = time.perf_counter()
+                try:
+                    return original(*a, **kw)
+                finally:
+                    batch_times.append(time.perf_counter() - t0)
+
+            chat_archive._archive_batch = timed_batch
+            try:
+                t0 = time.perf_counter()
+                report = chat_archive.archive_chats(args.retention, batch_size=batch_size, vacuum_mode="incremental")
+                entry["archive_s"] = time.perf_counter() - t0
+            finally:
+                chat_archive._archive_batch = original
+
+            db.session.execute(db.text("PRAGMA wal_checkpoint(TRUNCATE)"))
+            entry["db_bytes_after"] = os.path.getsize(db_path)
+            entry["archived"] = report.archived
+            entry["compression"] = report.raw_bytes / report.compressed_bytes if report.compressed_bytes else 0.0
+            entry["batch"] = summarize(batch_times)
+            entry["page_after"] = page_latency(ChatMessage, args.users, args.reps, args.seed)
+
+            user_id = random.Random(args.seed).randint(1, args.users)
+            months = ChatArchive.months(user_id)
+            latencies = []
+            for month in months:
+                t0 = time.perf_counter()
+                chat_archive.read_month(user_id, month)
+                latencies.append(time.perf_counter() - t0)
+            entry["read_month"] = summarize(latencies) if latencies else None
+            db.engine.dispose()
+        return entry
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365, help="idade da mensagem mais antiga")
+    parser.add_argument("--per-day", type=float, default=1.0, help="perguntas por utilizador por dia")
+    parser.add_argument("--retention", type=int, default=90, help="dias mantidos em chat_messages")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[500, 5000])
+    parser.add_argument("--reps", type=int, default=300, help="consultas page() por medição")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="ficheiro JSON com os resultados")
+    args = parser.parse_args()
+
+    results = []
+    for batch_size in args.batch_sizes:
+        e = run(batch_size, args)
+        results.append(e)
+        read = f"{e['read_month']['p50_ms']:.2f} ms" if e["read_month"] else "-"
+        print(f"lote {batch_size:>5}: {e['archived']}/{e['messages']} arquivadas em {e['archive_s']:.2f}s "
+              f"(gzip x{e['compression']:.1f}) | lote p50 {e['batch']['p50_ms']:.1f} ms, "
+              f"p99 {e['batch']['p99_ms']:.1f} ms | BD {e['db_bytes_before'] / 2**20:.1f} -> "
+              f"{e['db_bytes_after'] / 2**20:.1f} MiB | page() p50 {e['page_before']['p50_ms']:.3f} -> "
+              f"{e['page_after']['p50_ms']:.3f} ms | mês arquivado p50 {read}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
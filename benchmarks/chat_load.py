@@ -0,0 +1,168 @@
+"""
+benchmarks/chat_load.py
+-----------------------
+Teste de carga do POST /chat com vários processos a partilhar a mesma BD SQLite
+(como os workers do gunicorn), para cada perfil de BD (DB_PROFILE em app.py):
+- default: journal de rollback, sem busy timeout -> "database is locked"
+- production: WAL + synchronous=NORMAL + busy_timeout + mmap/cache + pool
+
+Cada processo cria a sua app (como um worker), entra com um utilizador próprio
+e dispara pedidos em várias threads. Mede pedidos/s, latência e erros.
+A BD é copiada para uma pasta temporária: instance/app.db não é alterada
+(nem se grava o snapshot do índice em instance/).
+As perguntas são reformulações das da base (benchmarks/corpus.py) e a cache de
+respostas está desligada: cada pedido passa pelo matching, como uma pergunta nova.
+
+Executa (a partir da raiz do projecto, com a BD já criada):
+  python -m benchmarks.chat_load --workers 4 --threads 4 --requests 50
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+DB_SOURCE = os.path.join("instance", "app.db")
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def worker(profile: str, db_path: str, threads: int, requests: int, seed: int, startup, barrier, results) -> None:
+    from benchmarks import INSTANCE_FREE_ENV
+
+    os.environ.update(DB_PROFILE=profile, DATABASE_PATH=db_path, **INSTANCE_FREE_ENV)
+    from werkzeug.security import generate_password_hash
+
+    from app import create_app
+    from benchmarks.corpus import paraphrase
+    from models import db, User, QAItem
+
+    # Arranque um processo de cada vez (create_all/KBVersion.ensure em paralelo
+    # dariam "database is locked" no perfil default antes de a medição começar)
+    try:
+        with startup:
+            app = create_app()
+            app.config["WTF_CSRF_ENABLED"] = False
+
+            with app.app_context():
+                questions = [q for (q,) in db.session.query(QAItem.question)]
+                email = f"bench-{os.getpid()}@load.test"
+                user = User(full_name="Bench", email=email, password_hash=generate_password_hash("x"))
+                db.session.add(user)
+                db.session.commit()
+                user_id = user.id
+    except Exception as exc:
+        barrier.abort()
+        results.put({"error": repr(exc)})
+        raise
+
+    rng = random.Random(seed)
+    latencies: list[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def run() -> None:
+        nonlocal errors
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = str(user_id)
+            session["_fresh"] = True
+        local_rng = random.Random(rng.random())
+        for _ in range(requests):
+            question = paraphrase(local_rng.choice(questions), local_rng) if questions else "o que é feedback"
+            t0 = time.perf_counter()
+            try:
+                response = client.post("/chat", data={"question": question})
+                ok = response.status_code == 302
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - t0
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors += 1
+
+    pool = [threading.Thread(target=run) for _ in range(threads)]
+    try:
+        barrier.wait()
+    except threading.BrokenBarrierError:
+        results.put({"error": "outro processo falhou no arranque"})
+        return
+    start = time.time()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    results.put({"start": start, "end": time.time(),
+                 "latencies": latencies, "errors": errors})
+
+
+def measure(profile: str, workers: int, threads: int, requests: int, seed: int) -> dict:
+    tmp = tempfile.mkdtemp(prefix="chat_load_")
+    try:
+        db_path = os.path.join(tmp, "app.db")
+        shutil.copy(DB_SOURCE, db_path)
+
+        ctx = mp.get_context("spawn")
+        startup = ctx.Lock()
+        barrier = ctx.Barrier(workers)
+        results = ctx.Queue()
+        procs = [
+            ctx.Process(target=worker, args=(profile, db_path, threads, requests, seed + i, startup, barrier, results))
+            for i in range(workers)
+        ]
+        for p in procs:
+            p.start()
+        parts = [results.get() for _ in procs]
+        for p in procs:
+            p.join()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    failed = [p["error"] for p in parts if "error" in p]
+    if failed:
+        raise SystemExit(f"{profile}: {failed[0]}")
+
+    latencies = [x for part in parts for x in part["latencies"]]
+    wall = max(p["end"] for p in parts) - min(p["start"] for p in parts)
+    return {
+        "ok": len(latencies),
+        "errors": sum(p["errors"] for p in parts),
+        "rps": len(latencies) / wall if wall else 0.0,
+        "p50": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p95": percentile(latencies, 0.95) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4, help="processos (como workers do gunicorn)")
+    parser.add_argument("--threads", type=int, default=4, help="threads por processo")
+    parser.add_argument("--requests", type=int, default=50, help="pedidos por thread")
+    parser.add_argument("--profiles", nargs="+", default=["default", "production"])
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if not os.path.exists(DB_SOURCE):
+        raise SystemExit(f"{DB_SOURCE} não existe (corre primeiro: python seed.py)")
+
+    print(f"{args.workers} processos x {args.threads} threads x {args.requests} pedidos")
+    print(f"{'perfil':<12} {'ok':>6} {'erros':>6} {'pedidos/s':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for profile in args.profiles:
+        r = measure(profile, args.workers, args.threads, args.requests, args.seed)
+        print(f"{profile:<12} {r['ok']:>6} {r['errors']:>6} {r['rps']:>10.1f} {r['p50']:>8.1f} {r['p95']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+benchmarks/corpus.py
+--------------------
+Corpora sintéticos em Português a partir do SEED_QA (seed.py):
+- paraphrase(): reformula uma pergunta (introduções, sinónimos, ordem, palavras a mais/menos)
+- make_qa_corpus(): base de conhecimento de 100 a 100k pares pergunta/resposta
+
+Determinístico: o mesmo seed gera sempre o mesmo corpus (resultados comparáveis entre execuções).
+"""
+
+import random
+
+from seed import SEED_QA
+
+# Formas de começar uma pergunta (o resto da pergunta vem depois, em minúsculas)
+INTROS = [
+    "", "", "",
+    "Podes explicar",
+    "Gostaria de saber",
+    "Diz-me",
+    "Explica-me",
+    "Preciso de saber",
+    "Qual é a ideia de",
+    "Tenho uma dúvida:",
+]
+
+# Sinónimos simples (palavra -> alternativas)
+SYNONYMS = {
+    "comunicação": ["comunicacao", "comunicar"],
+    "empresarial": ["organizacional", "na empresa"],
+    "pessoal": ["individual"],
+    "importante": ["relevante", "essencial"],
+    "eficaz": ["eficiente", "boa"],
+    "barreiras": ["obstáculos", "dificuldades"],
+    "feedback": ["retorno", "resposta"],
+    "reunião": ["encontro", "reuniao"],
+    "exemplo": ["caso"],
+    "tipos": ["formas", "categorias"],
+    "como": ["de que forma"],
+    "porque": ["por que razão"],
+    "melhorar": ["aperfeiçoar"],
+}
+
+# Contextos para multiplicar a base (perguntas distintas sobre o mesmo tema)
+CONTEXTS = [
+    "no trabalho", "na universidade", "em equipa", "com clientes", "numa entrevista",
+    "por email", "em público", "numa apresentação", "com o chefe", "em conflitos",
+    "à distância", "nas redes sociais", "em reuniões", "numa negociação", "com colegas",
+    "em situações de crise", "no atendimento", "numa empresa pequena", "numa multinacional",
+    "em projectos", "na liderança", "na formação", "em eventos", "com fornecedores",
+]
+
+
+def paraphrase(question: str, rng: random.Random, noise: float = 0.3) -> str:
+    """
+    Reformulação plausível de uma pergunta (para consultas e novas entradas).
+    noise: probabilidade de cada transformação.
+    """
+    words = question.rstrip("?.! ").split()
+    if not words:
+        return question
+
+    # Sinónimos
+    words = [
+        rng.choice(SYNONYMS[w.lower()]) if w.lower() in SYNONYMS and rng.random() < noise else w
+        for w in words
+    ]
+
+    # Retira uma palavra (pergunta incompleta)
+    if len(words) > 4 and rng.random() < noise:
+        del words[rng.randrange(1, len(words))]
+
+    # Troca duas palavras vizinhas
+    if len(words) > 3 and rng.random() < noise / 2:
+        i = rng.randrange(1, len(words) - 1)
+        words[i], words[i + 1] = words[i + 1], words[i]
+
+    text = " ".join(words)
+    intro = rng.choice(INTROS)
+    if intro:
+        text = f"{intro} {text[0].lower()}{text[1:]}"
+    if rng.random() < noise / 2:
+        text = text.lower()
+    return text + ("?" if rng.random() < 0.8 else "")
+
+
+def make_qa_corpus(n_items: int, seed: int = 42) -> list[tuple[str, str]]:
+    """
+    n_items pares (pergunta, resposta): o SEED_QA original seguido de variantes
+    (pergunta reformulada + contexto), todas com perguntas distintas.
+    """
+    rng = random.Random(seed)
+    corpus = list(SEED_QA[:n_items])
+    seen = {q.lower() for q, _ in corpus}
+    attempts = 0
+    while len(corpus) < n_items:
+        attempts += 1
+        question, answer = SEED_QA[rng.randrange(len(SEED_QA))]
+        context = rng.choice(CONTEXTS)
+        variant = paraphrase(question, rng, noise=0.5).rstrip("?")
+        if attempts > n_items * 3:
+            # Combinações esgotadas: numera para garantir perguntas distintas
+            context = f"{context} ({len(corpus)})"
+        text = f"{variant} {context}?"
+        if text.lower() in seen:
+            continue
+        seen.add(text.lower())
+        corpus.append((text, f"{answer} (Contexto: {context}.)"))
+    return corpus
@@ -0,0 +1,109 @@
+"""
+benchmarks/dedup.py
+-------------------
+Quase duplicados com MinHash + LSH (kb_dedup.py) vs. comparação de todos os pares.
+
+Corpus: make_qa_corpus (benchmarks/corpus.py) + uma fracção de duplicados
+injectados (reformulações leves de perguntas já existentes).
+
+Mede, por tamanho:
+- construção do índice LSH (lemas já em cache: mede-se só o MinHash)
+- clusters() em toda a base e similar() por pergunta (latência)
+- força bruta: Jaccard exacto em todos os pares (O(N²); só até --brute-max-items)
+- recall: fracção dos pares acima do limiar (força bruta) que ficam no mesmo grupo LSH
+
+Executa:
+  python -m benchmarks.dedup --sizes 1000 10000 50000
+"""
+
+import argparse
+import json
+import random
+import time
+
+from benchmarks.corpus import make_qa_corpus, paraphrase
+from benchmarks.suite import summarize
+from kb_dedup import DEFAULT_THRESHOLD, DuplicateIndex, jaccard
+from nlp_utils import normalize_many
+
+
+def corpus_with_duplicates(size: int, dup_fraction: float, seed: int) -> list[tuple[int, str]]:
+    rng = random.Random(seed)
+    questions = [q for q, _ in make_qa_corpus(size, seed=seed)]
+    n_dups = int(size * dup_fraction)
+    for _ in range(n_dups):
+        questions.append(paraphrase(rng.choice(questions), rng, noise=0.15))
+    return list(enumerate(questions, start=1))
+
+
+def brute_force_pairs(items: list[tuple[int, str]], threshold: float) -> set[tuple[int, int]]:
+    sets = [(qa_id, frozenset(terms)) for (qa_id, _), terms in zip(items, normalize_many([q for _, q in items]))]
+    sets = [(qa_id, s) for qa_id, s in sets if s]
+    pairs = set()
+    for i, (a, sa) in enumerate(sets):
+        for b, sb in sets[i + 1:]:
+            if jaccard(sa, sb) >= threshold:
+                pairs.add((a, b))
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--dup-fraction", type=float, default=0.05, help="duplicados injectados (fracção do corpus)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--brute-max-items", type=int, default=5000,
+                        help="acima disto não compara todos os pares (demasiado lento)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="ficheiro JSON com os resultados")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        items = corpus_with_duplicates(size, args.dup_fraction, args.seed)
+        terms = normalize_many([q for _, q in items])  # lemas em cache
+        entry = {"items": len(items), "threshold": args.threshold}
+
+        dedup = DuplicateIndex(threshold=args.threshold)
+        t0 = time.perf_counter()
+        dedup.build(items)
+        entry["build_s"] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        clusters = dedup.clusters()
+        entry["clusters_s"] = time.perf_counter() - t0
+        entry["groups"] = len(clusters)
+        entry["grouped_items"] = sum(len(g) for g in clusters)
+
+        rng = random.Random(args.seed)
+        latencies = []
+        for _ in range(args.queries):
+            i = rng.randrange(len(items))
+            t0 = time.perf_counter()
+            dedup.similar(terms[i], exclude=items[i][0])
+            latencies.append(time.perf_counter() - t0)
+        entry["similar"] = summarize(latencies)
+
+        line = (f"{len(items):>7} itens | build {entry['build_s']:.2f}s | clusters {entry['clusters_s']:.2f}s "
+                f"({entry['groups']} grupos) | similar p50 {entry['similar']['p50_ms']:.3f} ms")
+
+        if len(items) <= args.brute_max_items:
+            t0 = time.perf_counter()
+            pairs = brute_force_pairs(items, args.threshold)
+            entry["brute_force_s"] = time.perf_counter() - t0
+            group_of = {qa_id: n for n, group in enumerate(clusters) for qa_id in group}
+            found = sum(1 for a, b in pairs if a in group_of and group_of.get(a) == group_of.get(b))
+            entry["pairs"] = len(pairs)
+            entry["recall"] = found / len(pairs) if pairs else 1.0
+            line += f" | força bruta {entry['brute_force_s']:.2f}s, recall {entry['recall']:.3f}"
+        print(line)
+        results.append(entry)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+benchmarks/http_cache.py
+------------------------
+Bytes e trabalho no servidor por página vista, com a cache HTTP (http_cache.py).
+
+1. estáticos (static/): bytes transferidos sem compressão, com gzip e com brotli
+   (se o pacote estiver instalado); numa visita repetida, com ?v=<hash> e
+   "immutable", o browser não faz pedido nenhum (0 bytes)
+2. landing page: primeira visita (200) vs. revalidação com If-None-Match (304)
+3. sugestões do chat (/chat/suggestions): 200 vs. 304, e consultas SQL por pedido
+4. página do chat (/chat): consultas SQL por pedido (sugestões vêm da cache por versão)
+
+Cliente de teste do Flask e BD temporária (com o SEED_QA).
+
+Executa (a partir da raiz do projecto):
+  python -m benchmarks.http_cache
+  python -m benchmarks.http_cache --requests 2000 --output http_cache.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks import isolate_instance
+
+isolate_instance()  # antes de importar a app
+
+from benchmarks.suite import summarize
+from http_cache import COMPRESSIBLE, brotli, compress_bytes
+
+PASSWORD = "aluno12345"
+
+
+def static_sizes(folder: str) -> dict:
+    sizes = {}
+    for name in sorted(os.listdir(folder)):
+        if os.path.splitext(name)[1] not in COMPRESSIBLE:
+            continue
+        with open(os.path.join(folder, name), "rb") as f:
+            data = f.read()
+        sizes[name] = {"identity": len(data), **{enc: len(body) for enc, body in compress_bytes(data).items()}}
+    return sizes
+
+
+def measure(client, path: str, requests: int, headers: dict | None = None) -> dict:
+    """Latência, estado e bytes do corpo de `requests` pedidos GET iguais."""
+    latencies, status, body = [], None, 0
+    for _ in range(requests):
+        t0 = time.perf_counter()
+        response = client.get(path, headers=headers or {})
+        latencies.append(time.perf_counter() - t0)
+        status, body = response.status_code, len(response.data)
+    return {"status": status, "bytes": body, "latency": summarize(latencies)}
+
+
+def queries_per_request(app, client, path: str, requests: int, headers: dict | None = None) -> float:
+    metrics = app.extensions["metrics"]
+    before = metrics.snapshot()["timings"].get("db", {}).get("count", 0)
+    for _ in range(requests):
+        client.get(path, headers=headers or {})
+    return (metrics.snapshot()["timings"].get("db", {}).get("count", 0) - before) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500, help="pedidos por medição")
+    parser.add_argument("--output", help="ficheiro JSON com os resultados")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_http_")
+    try:
+        os.environ["DATABASE_PATH"] = os.path.join(tmp, "app.db")
+        from app import create_app
+        from models import db, QAItem, User, KBVersion
+        from seed import SEED_QA
+        from werkzeug.security import generate_password_hash
+
+        app = create_app()
+        app.config["WTF_CSRF_ENABLED"] = False
+        with app.app_context():
+            db.session.add_all(QAItem(question=q, answer=a) for q, a in SEED_QA)
+            db.session.add(User(full_name="Bench", email="bench@uni.ao",
+                                password_hash=generate_password_hash(PASSWORD, "pbkdf2:sha256:1000")))
+            KBVersion.bump()
+            db.session.commit()
+
+        report = {"static": static_sizes(app.static_folder)}
+        print("estáticos (bytes por primeira visita; visita repetida com ?v=: 0 bytes, sem pedido):")
+        for name, s in report["static"].items():
+            br = f", brotli {s['br']}" if "br" in s else ""
+            print(f"  {name:<10} sem compressão {s['identity']:>6}, gzip {s['gzip']:>6}{br}")
+        if brotli is None:
+            print("  (pacote brotli não instalado: só .gz)")
+
+        anon = app.test_client()
+        first = measure(anon, "/", args.requests)
+        etag = anon.get("/").headers["ETag"]
+        repeat = measure(anon, "/", args.requests, {"If-None-Match": etag})
+        report["landing"] = {"200": first, "304": repeat}
+
+        client = app.test_client()
+        client.post("/login", data={"email": "bench@uni.ao", "password": PASSWORD})
+        fragment = measure(client, "/chat/suggestions", args.requests)
+        etag = client.get("/chat/suggestions").headers["ETag"]
+        revalidate = measure(client, "/chat/suggestions", args.requests, {"If-None-Match": etag})
+        report["suggestions"] = {
+            "200": fragment,
+            "304": revalidate,
+            "queries_200": queries_per_request(app, client, "/chat/suggestions", args.requests),
+            "queries_304": queries_per_request(app, client, "/chat/suggestions", args.requests,
+                                               {"If-None-Match": etag}),
+        }
+        report["chat_page"] = {"queries": queries_per_request(app, client, "/chat", args.requests // 5 or 1)}
+
+        for label, key in (("landing", "landing"), ("/chat/suggestions", "suggestions")):
+            r = report[key]
+            print(f"{label:<18} 200: {r['200']['bytes']:>6} bytes, p50 {r['200']['latency']['p50_ms']:.3f} ms | "
+                  f"304: {r['304']['bytes']:>3} bytes, p50 {r['304']['latency']['p50_ms']:.3f} ms")
+        s = report["suggestions"]
+        print(f"consultas SQL por pedido: /chat/suggestions {s['queries_200']:.1f} (200) / "
+              f"{s['queries_304']:.1f} (304), /chat {report['chat_page']['queries']:.1f}")
+
+        with app.app_context():
+            db.engine.dispose()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
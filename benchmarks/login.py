@@ -0,0 +1,175 @@
+"""
+benchmarks/login.py
+-------------------
+Custo da autenticação, para escolher PASSWORD_HASH_METHOD e dimensionar os workers
+(ex.: início de uma aula, centenas de alunos a entrar ao mesmo tempo).
+
+1. hash: tempo de check_password_hash por método, com 1 e com --threads threads
+   (hashlib liberta o GIL durante o scrypt/pbkdf2: mede-se se escala)
+2. login ponta a ponta (cliente de teste do Flask, BD temporária): POST /login por segundo,
+   incluindo o rehash no primeiro login quando o método muda
+3. pedidos autenticados (GET /chat/messages) com e sem a cache de utilizadores
+   (USER_CACHE_SIZE): pedidos/s e consultas SQL por pedido
+
+No fim, estimativa de workers para --target logins em --window segundos.
+
+Executa (a partir da raiz do projecto):
+  python -m benchmarks.login
+  python -m benchmarks.login --methods scrypt pbkdf2:sha256:600000 --users 200 --target 300 --window 30
+"""
+
+import argparse
+import json
+import math
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import isolate_instance
+
+isolate_instance()  # antes de importar a app
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from auth import PasswordHasher
+from benchmarks.suite import summarize
+
+DEFAULT_METHODS = ["scrypt", "scrypt:16384:8:1", "pbkdf2:sha256:600000", "pbkdf2:sha256:260000"]
+PASSWORD = "aluno12345"
+
+
+def bench_hash(method: str, reps: int, threads: int) -> dict:
+    stored = generate_password_hash(PASSWORD, method)
+    latencies = []
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        check_password_hash(stored, PASSWORD)
+        latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(lambda _: check_password_hash(stored, PASSWORD), range(reps * threads)))
+    parallel_rate = reps * threads / (time.perf_counter() - t0)
+    return {"verify": summarize(latencies), "threads": threads, "parallel_per_second": parallel_rate}
+
+
+def make_app(tmp: str, **env):
+    os.environ.update(DATABASE_PATH=os.path.join(tmp, "app.db"), **env)
+    from app import create_app
+
+    app = create_app()
+    app.config["WTF_CSRF_ENABLED"] = False
+    return app
+
+
+def bench_logins(method: str, stored_method: str, users: int) -> dict:
+    """
+    users contas com hash stored_method; a app usa method (rehash se forem diferentes).
+    Primeira volta: login com rehash (se houver); segunda: só verificação.
+    """
+    tmp = tempfile.mkdtemp(prefix="bench_login_")
+    try:
+        app = make_app(tmp, PASSWORD_HASH_METHOD=method)
+        from sqlalchemy import insert
+        from models import db, User
+
+        stored = generate_password_hash(PASSWORD, stored_method)
+        with app.app_context():
+            db.session.execute(insert(User), [
+                {"full_name": f"Aluno {i}", "email": f"aluno{i}@uni.ao", "password_hash": stored, "is_admin": False}
+                for i in range(users)
+            ])
+            db.session.commit()
+
+        result = {}
+        for round_name in ("first", "second"):
+            latencies = []
+            for i in range(users):
+                client = app.test_client()
+                t0 = time.perf_counter()
+                response = client.post("/login", data={"email": f"aluno{i}@uni.ao", "password": PASSWORD})
+                latencies.append(time.perf_counter() - t0)
+                if response.status_code != 302 or "/chat" not in response.headers.get("Location", ""):
+                    raise RuntimeError(f"login falhou ({response.status_code})")
+            result[round_name] = summarize(latencies)
+        with app.app_context():
+            canonical = PasswordHasher(method).method
+            result["rehashed"] = User.query.filter(User.password_hash.startswith(canonical + "$")).count()
+            db.engine.dispose()
+        return result
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_authenticated(requests: int, cache_size: int) -> dict:
+    """GET /chat/messages autenticado: pedidos/s e consultas SQL por pedido."""
+    tmp = tempfile.mkdtemp(prefix="bench_login_")
+    try:
+        app = make_app(tmp, USER_CACHE_SIZE=str(cache_size), PASSWORD_HASH_METHOD="pbkdf2:sha256:1000")
+        from models import db, User
+
+        with app.app_context():
+            db.session.add(User(full_name="Bench", email="bench@uni.ao",
+                                password_hash=generate_password_hash(PASSWORD, "pbkdf2:sha256:1000")))
+            db.session.commit()
+
+        client = app.test_client()
+        client.post("/login", data={"email": "bench@uni.ao", "password": PASSWORD})
+        metrics = app.extensions["metrics"]
+        queries_before = metrics.snapshot()["timings"].get("db", {}).get("count", 0)
+        latencies = []
+        for _ in range(requests):
+            t0 = time.perf_counter()
+            response = client.get("/chat/messages")
+            latencies.append(time.perf_counter() - t0)
+            if response.status_code != 200:
+                raise RuntimeError(f"/chat/messages falhou ({response.status_code})")
+        queries = metrics.snapshot()["timings"]["db"]["count"] - queries_before
+        with app.app_context():
+            db.engine.dispose()
+        return {"requests": summarize(latencies), "queries_per_request": queries / requests}
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--methods", nargs="+", default=DEFAULT_METHODS, help="valores de PASSWORD_HASH_METHOD")
+    parser.add_argument("--hash-reps", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--users", type=int, default=50, help="contas no teste de login")
+    parser.add_argument("--requests", type=int, default=500, help="pedidos autenticados por medição")
+    parser.add_argument("--target", type=int, default=300, help="logins esperados na janela")
+    parser.add_argument("--window", type=float, default=60.0, help="janela (s) para os --target logins")
+    parser.add_argument("--output", help="ficheiro JSON com os resultados")
+    args = parser.parse_args()
+
+    report = {"methods": {}, "authenticated": {}}
+    print(f"{'método':<24} {'verify ms':>10} {f'/s ({args.threads} thr)':>14} "
+          f"{'login ms':>9} {'c/ rehash':>10} {'workers':>8}")
+    for method in args.methods:
+        entry = report["methods"][method] = {"hash": bench_hash(method, args.hash_reps, args.threads)}
+        # Contas com hashes do método por omissão: a primeira volta mede o rehash para `method`
+        entry["login"] = bench_logins(method, "scrypt", args.users)
+        login_s = entry["login"]["second"]["mean_ms"] / 1000
+        # Um worker (processo, 1 thread) faz 1/login_s logins por segundo
+        entry["workers_needed"] = max(1, math.ceil(args.target / args.window * login_s))
+        print(f"{method:<24} {entry['hash']['verify']['p50_ms']:>10.1f} "
+              f"{entry['hash']['parallel_per_second']:>14.0f} {entry['login']['second']['p50_ms']:>9.1f} "
+              f"{entry['login']['first']['p50_ms']:>10.1f} {entry['workers_needed']:>8}")
+
+    for label, size in (("sem cache", 0), ("com cache", 1024)):
+        r = report["authenticated"][label] = bench_authenticated(args.requests, size)
+        print(f"GET /chat/messages {label}: {r['requests']['per_second']:.0f} pedidos/s, "
+              f"{r['queries_per_request']:.1f} consultas SQL por pedido")
+
+    print(f"workers = logins por segundo ({args.target}/{args.window:g}s) x duração de um login (1 thread por worker)")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
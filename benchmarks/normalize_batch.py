@@ -0,0 +1,53 @@
+"""
+benchmarks/normalize_batch.py
+-----------------------------
+Débito (documentos/s) da normalização de um corpus grande:
+- normalize() texto a texto (uma chamada NLP(text) por documento)
+- normalize_many() com nlp.pipe, para vários n_process
+
+A cache de lemas é desligada, para medir só o spaCy.
+O ganho com n_process só aparece numa máquina com vários núcleos.
+
+Executa:
+  python -m benchmarks.normalize_batch --items 20000 --processes 1 2 4
+"""
+
+import argparse
+import os
+import random
+import time
+
+import nlp_utils
+from benchmarks.backends import make_corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    nlp_utils.configure_cache(maxsize=0)
+    # textos únicos: normalize_many não deve poupar trabalho por duplicados
+    corpus = [f"{q} ({i})" for i, q in enumerate(make_corpus(args.items, random.Random(args.seed)))]
+    nlp_utils.get_nlp()  # carregamento fora da medição
+
+    print(f"{args.items} documentos, batch_size={args.batch_size}, {os.cpu_count()} CPUs")
+
+    t0 = time.perf_counter()
+    baseline = [nlp_utils.normalize(t) for t in corpus]
+    base_rate = len(corpus) / (time.perf_counter() - t0)
+    print(f"{'normalize() em ciclo':<24} {base_rate:>10.0f} docs/s")
+
+    for n_process in args.processes:
+        t0 = time.perf_counter()
+        result = nlp_utils.normalize_many(corpus, batch_size=args.batch_size, n_process=n_process)
+        rate = len(corpus) / (time.perf_counter() - t0)
+        assert result == baseline, "normalize_many difere de normalize"
+        print(f"{f'pipe n_process={n_process}':<24} {rate:>10.0f} docs/s  (x{rate / base_rate:.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+benchmarks/quality.py
+---------------------
+Qualidade da recuperação (não só velocidade) para cada motor de matching:
+acelerar o matching (cache, índice, poda, vectorização) só é aceitável
+se as respostas escolhidas se mantiverem.
+
+Conjunto de avaliação (determinístico, a partir do SEED_QA):
+- positivas: reformulações de cada pergunta (benchmarks/corpus.py) -> pergunta esperada
+- negativas: perguntas fora do tema -> não devem passar o limiar (MATCH_THRESHOLD)
+Também pode ser lido de um ficheiro JSONL ({"question": ..., "expected": pergunta do SEED_QA ou null}),
+ex.: um conjunto revisto à mão e guardado com --save-eval.
+
+Métricas por motor:
+- top-1: a melhor correspondência é a esperada
+- MRR: média de 1/posição da esperada (0 se não aparece no top-k)
+- falha no limiar: a esperada é a primeira mas com score < MATCH_THRESHOLD
+  (o aluno recebe "não encontrei" apesar de o ranking estar certo)
+- negativas aceites: perguntas fora do tema com score >= MATCH_THRESHOLD
+- neg. max: o maior score de uma negativa (deve ficar perto do do legacy)
+- latência por pergunta (p50/p95)
+
+Motores: legacy (match_question em nlp_utils), legacy-compact (o mesmo com
+CompactVector) e KBIndex com cada backend.
+
+Executa:
+  python -m benchmarks.quality
+  python -m benchmarks.quality --output quality.json --min-top1 0.8
+"""
+
+import argparse
+import json
+import random
+import time
+
+from benchmarks.corpus import paraphrase
+from kb_index import BACKENDS, KBIndex, MATCH_THRESHOLD, np
+from nlp_utils import match_question, normalize_many
+from seed import SEED_QA
+
+NEGATIVES = [
+    "Qual é a capital de Angola?",
+    "Como se calcula a área de um círculo?",
+    "Quem ganhou o campeonato de futebol este ano?",
+    "Qual é a fórmula química da água?",
+    "Como instalo o Python no Windows?",
+    "Quantos planetas tem o sistema solar?",
+    "Qual é a receita do funge?",
+    "Que horas abre a biblioteca ao sábado?",
+    "Como converter dólares em kwanzas?",
+    "Qual é a velocidade da luz?",
+    # Longas e fora do tema, com uma única palavra da base: as palavras desconhecidas
+    # têm de pesar na norma da pergunta (senão o score sobe para perto de 1).
+    # Com o limiar actual passam também no legacy (score ~0.15-0.35): o que se vigia
+    # aqui é o neg. max, que tem de acompanhar o do legacy
+    "Quem ganhou o campeonato angolano de futebol na época passada e qual foi a comunicação?",
+    "Qual é o preço do bilhete de avião de Luanda para Lisboa em Dezembro, mensagem?",
+    "Como se prepara o molho de ginguba para o almoço de domingo com a família, feedback?",
+    "Onde posso comprar peças para a mota e pneus baratos perto do mercado, email?",
+]
+
+
+def make_eval_set(per_question: int, seed: int) -> list[dict]:
+    """
+    Reformulações de cada pergunta do SEED_QA + negativas.
+    expected = texto da pergunta original (ou None para negativas).
+    """
+    rng = random.Random(seed)
+    cases = []
+    for question, _ in SEED_QA:
+        variants = set()
+        for _ in range(per_question * 5):
+            if len(variants) >= per_question:
+                break
+            variant = paraphrase(question, rng, noise=0.35)
+            if variant.lower() != question.lower():
+                variants.add(variant)
+        cases.extend({"question": v, "expected": question} for v in sorted(variants))
+    cases.extend({"question": q, "expected": None} for q in NEGATIVES)
+    return cases
+
+
+def load_eval_set(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def legacy_engine(questions: list[str], compact: bool = False):
+    def ranked(query: str, top_k: int) -> list[tuple[int, float]]:
+        # match_question devolve índices (0..N-1); ids = índice + 1
+        return [(i + 1, score) for i, score in match_question(query, questions, top_k=top_k, compact=compact)]
+    return ranked
+
+
+def index_engine(questions: list[str], backend: str):
+    kb = KBIndex(backend=backend)
+    kb.build(enumerate(questions, start=1))
+    kb.refresh()
+    return lambda query, top_k: kb.query(query, top_k=top_k)
+
+
+def evaluate(engine, cases: list[dict], ids: dict[str, int], top_k: int) -> dict:
+    positives = negatives = 0
+    top1 = reciprocal = threshold_misses = accepted_negatives = max_negative = 0.0
+    latencies = []
+    failures = []
+
+    for case in cases:
+        t0 = time.perf_counter()
+        ranked = engine(case["question"], top_k)
+        latencies.append(time.perf_counter() - t0)
+        best_score = ranked[0][1] if ranked else 0.0
+
+        if case["expected"] is None:
+            negatives += 1
+            accepted_negatives += best_score >= MATCH_THRESHOLD
+            max_negative = max(max_negative, best_score)
+            continue
+
+        positives += 1
+        expected_id = ids[case["expected"]]
+        rank = next((i for i, (qa_id, _) in enumerate(ranked, start=1) if qa_id == expected_id), None)
+        if rank is not None:
+            reciprocal += 1 / rank
+        if rank == 1:
+            top1 += 1
+            threshold_misses += best_score < MATCH_THRESHOLD
+        elif len(failures) < 10:
+            failures.append({"question": case["question"], "expected": case["expected"], "rank": rank})
+
+    latencies.sort()
+    last = len(latencies) - 1
+    return {
+        "positives": positives,
+        "negatives": negatives,
+        "top1": top1 / positives if positives else 0.0,
+        "mrr": reciprocal / positives if positives else 0.0,
+        "threshold_miss_rate": threshold_misses / positives if positives else 0.0,
+        "negative_accept_rate": accepted_negatives / negatives if negatives else 0.0,
+        "max_negative_score": max_negative,
+        "p50_ms": latencies[int(0.50 * last)] * 1000 if latencies else 0.0,
+        "p95_ms": latencies[int(0.95 * last)] * 1000 if latencies else 0.0,
+        "failures": failures,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--per-question", type=int, default=5, help="reformulações por pergunta do SEED_QA")
+    parser.add_argument("--eval-file", help="JSONL com o conjunto de avaliação (em vez de o gerar)")
+    parser.add_argument("--save-eval", help="guarda o conjunto gerado em JSONL (para rever/fixar)")
+    parser.add_argument("--engines", nargs="+", default=["legacy", "legacy-compact", *BACKENDS],
+                        help="legacy e/ou backends do KBIndex")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--min-top1", type=float, default=None,
+                        help="falha (código 1) se algum motor ficar abaixo deste top-1")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="ficheiro JSON com os resultados")
+    args = parser.parse_args()
+
+    cases = load_eval_set(args.eval_file) if args.eval_file else make_eval_set(args.per_question, args.seed)
+    if args.save_eval:
+        with open(args.save_eval, "w", encoding="utf-8") as f:
+            for case in cases:
+                f.write(json.dumps(case, ensure_ascii=False) + "\n")
+
+    questions = [q for q, _ in SEED_QA]
+    ids = {q: i for i, q in enumerate(questions, start=1)}
+    unknown = {c["expected"] for c in cases if c["expected"] is not None} - ids.keys()
+    if unknown:
+        raise SystemExit(f"Perguntas esperadas que não estão no SEED_QA: {sorted(unknown)[:3]}")
+
+    # Lemas em cache: a latência medida é a do motor, não a do spaCy
+    normalize_many(questions + [c["question"] for c in cases])
+
+    print(f"{len(cases)} perguntas ({sum(c['expected'] is None for c in cases)} negativas), "
+          f"{len(questions)} QA, limiar {MATCH_THRESHOLD}")
+    print(f"{'motor':<15} {'top-1':>7} {'MRR':>7} {'limiar':>7} {'neg. ok':>8} {'neg. max':>9} {'p50 ms':>8} {'p95 ms':>8}")
+
+    results = {}
+    for name in args.engines:
+        if name in ("legacy", "legacy-compact"):
+            engine = legacy_engine(questions, compact=name == "legacy-compact")
+        elif name == "numpy" and np is None:
+            print(f"{name:<15} (NumPy não instalado)")
+            continue
+        else:
+            engine = index_engine(questions, name)
+        r = results[name] = evaluate(engine, cases, ids, args.top_k)
+        print(f"{name:<15} {r['top1']:>7.3f} {r['mrr']:>7.3f} {r['threshold_miss_rate']:>7.3f} "
+              f"{1 - r['negative_accept_rate']:>8.3f} {r['max_negative_score']:>9.3f} {r['p50_ms']:>8.3f} {r['p95_ms']:>8.3f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"threshold": MATCH_THRESHOLD, "cases": len(cases), "results": results},
+                      f, ensure_ascii=False, indent=2)
+
+    if args.min_top1 is not None:
+        below = [name for name, r in results.items() if r["top1"] < args.min_top1]
+        if below:
+            raise SystemExit(f"top-1 abaixo de {args.min_top1}: {', '.join(below)}")
+
+
+if __name__ == "__main__":
+    main()
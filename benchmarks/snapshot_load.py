@@ -0,0 +1,78 @@
+"""
+benchmarks/snapshot_load.py
+---------------------------
+Arranque do índice: reconstrução (KBIndex.build) vs carregamento do snapshot
+com mmap (kb_snapshot.py), para um corpus sintético de N perguntas.
+Verifica também que o índice carregado responde o mesmo que o reconstruído.
+
+Executa:
+  python -m benchmarks.snapshot_load --items 50000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import nlp_utils
+from benchmarks.backends import same_ranking
+from benchmarks.corpus import make_qa_corpus, paraphrase
+from kb_index import KBIndex
+from kb_snapshot import load_snapshot, write_snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    questions = [q for q, _ in make_qa_corpus(args.items, seed=args.seed)]
+    rng = random.Random(args.seed)
+    queries = [paraphrase(rng.choice(questions), rng) for _ in range(args.queries)]
+    nlp_utils.configure_cache(maxsize=args.items + args.queries + 10_000)
+
+    t0 = time.perf_counter()
+    built = KBIndex()
+    built.build(enumerate(questions, start=1))
+    built.refresh()
+    cold = time.perf_counter() - t0
+
+    # Segunda construção: lemas já em cache (melhor caso sem snapshot)
+    t0 = time.perf_counter()
+    warm_index = KBIndex()
+    warm_index.build(enumerate(questions, start=1))
+    warm_index.refresh()
+    warm = time.perf_counter() - t0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "kb_index.snapshot")
+        t0 = time.perf_counter()
+        write_snapshot(built, path, kb_version=1)
+        write_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        loaded = KBIndex()
+        assert load_snapshot(loaded, path, kb_version=1)
+        load_s = time.perf_counter() - t0
+        size = os.path.getsize(path)
+
+        differ = sum(
+            not same_ranking(built.query(q, top_k=4), loaded.query(q, top_k=4), top_k=3, tol=1e-9)
+            for q in queries
+        )
+
+    print(f"{len(questions)} perguntas, backend {built.backend}, snapshot {size / 2**20:.1f} MiB")
+    print(f"{'build (spaCy)':<26} {cold:>8.3f}s")
+    print(f"{'build (lemas em cache)':<26} {warm:>8.3f}s")
+    print(f"{'gravar snapshot':<26} {write_s:>8.3f}s")
+    print(f"{'carregar snapshot (mmap)':<26} {load_s:>8.3f}s  (x{warm / load_s:.0f} mais rápido)")
+    print(f"Rankings diferentes: {differ} / {len(queries)}")
+    if differ:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
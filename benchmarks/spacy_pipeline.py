@@ -0,0 +1,90 @@
+"""
+benchmarks/spacy_pipeline.py
+----------------------------
+Compara o pipeline spaCy completo com o pipeline reduzido usado por normalize():
+- tempo de arranque (import spacy + spacy.load) num processo novo
+- memória (RSS máximo) do processo
+- latência por chamada de normalize() (sem cache)
+- confirma que os lemas produzidos são iguais
+
+Executa:
+  python -m benchmarks.spacy_pipeline
+  python -m benchmarks.spacy_pipeline --configs "" "parser,ner" "parser,ner,morphologizer"
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+
+def child(exclude: str, repeat: int) -> dict:
+    """
+    Corre num processo novo: mede o carregamento e a latência de normalize().
+    """
+    import nlp_utils
+    from seed import SEED_QA
+
+    nlp_utils.configure_nlp(exclude=[c for c in exclude.split(",") if c])
+    nlp_utils.configure_cache(maxsize=0)
+
+    t0 = time.perf_counter()
+    nlp = nlp_utils.get_nlp()
+    load_s = time.perf_counter() - t0
+
+    texts = [q for q, _ in SEED_QA]
+    lemmas = [nlp_utils.normalize(t) for t in texts]  # aquecimento
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for t in texts:
+            nlp_utils.normalize(t)
+    per_call = (time.perf_counter() - t0) / (repeat * len(texts))
+
+    return {
+        "exclude": exclude,
+        "pipeline": nlp.pipe_names,
+        "load_s": load_s,
+        "normalize_ms": per_call * 1000,
+        # ru_maxrss vem em KiB no Linux
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "lemmas": lemmas,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--configs", nargs="+", default=["", "parser,ner"],
+                        help='listas de componentes a excluir ("" = pipeline completo)')
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(child(args.child, args.repeat)))
+        return
+
+    results = []
+    for exclude in args.configs:
+        t0 = time.perf_counter()
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.spacy_pipeline", "--child", exclude, "--repeat", str(args.repeat)],
+            check=True, capture_output=True, text=True,
+        )
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        result["process_s"] = time.perf_counter() - t0
+        results.append(result)
+
+    base = results[0]
+    print(f"{'exclude':<28} {'load (s)':>9} {'RSS (MB)':>9} {'normalize (ms)':>15}  pipeline")
+    for r in results:
+        print(f"{r['exclude'] or '(nenhum)':<28} {r['load_s']:>9.2f} {r['max_rss_mb']:>9.0f} "
+              f"{r['normalize_ms']:>15.3f}  {','.join(r['pipeline'])}")
+        diff = sum(1 for a, b in zip(base["lemmas"], r["lemmas"]) if a != b)
+        if diff:
+            print(f"  ! {diff} textos com lemas diferentes de '{base['exclude'] or '(nenhum)'}'")
+
+
+if __name__ == "__main__":
+    main()
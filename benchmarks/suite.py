@@ -0,0 +1,271 @@
+"""
+benchmarks/suite.py
+-------------------
+Benchmark reprodutível do motor de matching e do endpoint /chat, para
+comparar o antes/depois de uma alteração (ex.: em nlp_utils ou kb_index).
+
+Para cada tamanho de corpus sintético (benchmarks/corpus.py, 100 a 100k QA):
+1. normalize(): latência por texto e débito, sem cache (só o spaCy)
+2. build_tfidf_vectors() e KBIndex.build(): tempo e pico de memória
+   (lemas já em cache: mede-se só o TF-IDF)
+3. match_question() (versão antiga, linear) e KBIndex.query(): latência por pergunta
+4. ponta a ponta: cliente de teste do Flask, login + POST /chat, pedidos/s
+   (BD temporária; instance/app.db não é alterada)
+
+Os resultados vão para um ficheiro JSON (--output), com metadados da
+máquina e do commit, para comparar execuções.
+
+Executa (a partir da raiz do projecto):
+  python -m benchmarks.suite --sizes 100 1000 10000 --output bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from benchmarks import isolate_instance
+
+isolate_instance()  # antes de importar a app
+
+import nlp_utils
+from benchmarks.corpus import make_qa_corpus, paraphrase
+from kb_index import KBIndex
+
+
+def summarize(latencies: list[float]) -> dict:
+    """Latências em ms (p50/p95/p99/média) e débito (/s)."""
+    if not latencies:
+        return {}
+    ordered = sorted(latencies)
+    last = len(ordered) - 1
+    return {
+        "n": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": ordered[int(0.50 * last)] * 1000,
+        "p95_ms": ordered[int(0.95 * last)] * 1000,
+        "p99_ms": ordered[int(0.99 * last)] * 1000,
+        "per_second": len(ordered) / sum(ordered) if sum(ordered) else 0.0,
+    }
+
+
+def timed_with_memory(fn) -> tuple[object, float, int]:
+    """
+    (resultado, segundos, pico de memória Python em bytes).
+    O tempo é medido numa execução sem tracemalloc (que atrasa bastante).
+    """
+    t0 = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - t0
+
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def bench_normalize(questions: list[str], limit: int) -> dict:
+    texts = questions[:limit]
+    nlp_utils.configure_cache(maxsize=0)
+    try:
+        latencies = []
+        for text in texts:
+            t0 = time.perf_counter()
+            nlp_utils.normalize(text)
+            latencies.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        nlp_utils.normalize_many(texts)
+        batch_rate = len(texts) / (time.perf_counter() - t0)
+    finally:
+        nlp_utils.configure_cache(maxsize=len(questions) + 10_000)
+    return {"single": summarize(latencies), "batch_per_second": batch_rate}
+
+
+def bench_build(questions: list[str]) -> tuple[dict, KBIndex]:
+    nlp_utils.normalize_many(questions)  # lemas em cache: mede-se só o TF-IDF
+
+    _, tfidf_s, tfidf_peak = timed_with_memory(lambda: nlp_utils.build_tfidf_vectors(questions))
+
+    def build_index():
+        kb = KBIndex()
+        kb.build(enumerate(questions, start=1))
+        kb.refresh()
+        return kb
+
+    kb, index_s, index_peak = timed_with_memory(build_index)
+    return {
+        "build_tfidf_vectors": {"seconds": tfidf_s, "peak_bytes": tfidf_peak},
+        "kb_index_build": {"seconds": index_s, "peak_bytes": index_peak, "backend": kb.backend},
+    }, kb
+
+
+def bench_match(questions: list[str], queries: list[str], kb: KBIndex, legacy_max_items: int) -> dict:
+    result = {}
+    nlp_utils.normalize_many(queries)
+
+    latencies = []
+    for q in queries:
+        t0 = time.perf_counter()
+        kb.query(q, top_k=3)
+        latencies.append(time.perf_counter() - t0)
+    result["kb_index_query"] = summarize(latencies)
+
+    # A versão antiga reconstrói todos os vectores em cada pergunta: O(N) por consulta
+    if len(questions) <= legacy_max_items:
+        latencies = []
+        for q in queries[:50]:
+            t0 = time.perf_counter()
+            nlp_utils.match_question(q, questions, top_k=3)
+            latencies.append(time.perf_counter() - t0)
+        result["match_question"] = summarize(latencies)
+    else:
+        result["match_question"] = {"skipped": f"mais de {legacy_max_items} itens (--legacy-max-items)"}
+    return result
+
+
+def bench_e2e(corpus: list[tuple[str, str]], queries: list[str]) -> dict:
+    """
+    login + POST /chat pelo cliente de teste, numa BD temporária com o corpus.
+    """
+    tmp = tempfile.mkdtemp(prefix="bench_suite_")
+    try:
+        os.environ.update(
+            DATABASE_PATH=os.path.join(tmp, "app.db"),
+            ANSWER_CACHE="none",
+            CHAT_WRITE_BEHIND="0",
+            # Reconstrução do índice no próprio pedido: o POST de aquecimento deixa-o pronto
+            KB_REBUILD_BACKGROUND="0",
+        )
+        from sqlalchemy import insert
+        from werkzeug.security import generate_password_hash
+
+        from app import create_app
+        from models import db, User, QAItem, KBVersion
+
+        app = create_app()
+        app.config["WTF_CSRF_ENABLED"] = False
+        with app.app_context():
+            db.session.execute(insert(QAItem), [{"question": q, "answer": a} for q, a in corpus])
+            KBVersion.bump()
+            db.session.add(User(full_name="Bench", email="bench@uni.ao",
+                                password_hash=generate_password_hash("bench123")))
+            db.session.commit()
+
+        client = app.test_client()
+        t0 = time.perf_counter()
+        response = client.post("/login", data={"email": "bench@uni.ao", "password": "bench123"})
+        login_s = time.perf_counter() - t0
+        if response.status_code != 302:
+            raise RuntimeError(f"login falhou ({response.status_code})")
+
+        client.post("/chat", data={"question": queries[0]})  # constrói o índice
+        latencies = []
+        for q in queries:
+            t0 = time.perf_counter()
+            response = client.post("/chat", data={"question": q})
+            latencies.append(time.perf_counter() - t0)
+            if response.status_code != 302:
+                raise RuntimeError(f"/chat falhou ({response.status_code})")
+
+        t0 = time.perf_counter()
+        client.get("/chat")
+        render_s = time.perf_counter() - t0
+
+        with app.app_context():
+            db.engine.dispose()
+        return {"login_ms": login_s * 1000, "chat_post": summarize(latencies), "chat_get_ms": render_s * 1000}
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--queries", type=int, default=200, help="perguntas por medição")
+    parser.add_argument("--normalize-texts", type=int, default=2000, help="textos no benchmark de normalize()")
+    parser.add_argument("--legacy-max-items", type=int, default=5000,
+                        help="acima disto não corre match_question() (demasiado lento)")
+    parser.add_argument("--e2e-requests", type=int, default=200)
+    parser.add_argument("--skip-e2e", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args()
+
+    nlp_utils.get_nlp()  # carregamento do modelo fora das medições
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "spacy_model": nlp_utils.model_fingerprint(),
+            "args": vars(args),
+        },
+        "results": [],
+    }
+
+    corpora = {}
+    for size in args.sizes:
+        corpus = make_qa_corpus(size, seed=args.seed)
+        corpora[size] = corpus
+        questions = [q for q, _ in corpus]
+        rng = random.Random(args.seed)
+        queries = [paraphrase(rng.choice(questions), rng) for _ in range(args.queries)]
+
+        print(f"== {size} itens")
+        entry = {"items": size}
+        entry["normalize"] = bench_normalize(questions, args.normalize_texts)
+        print(f"  normalize: {entry['normalize']['single']['p50_ms']:.3f} ms (p50), "
+              f"lote {entry['normalize']['batch_per_second']:.0f} textos/s")
+
+        build, kb = bench_build(questions)
+        entry.update(build)
+        print(f"  build_tfidf_vectors: {build['build_tfidf_vectors']['seconds']:.3f}s | "
+              f"KBIndex.build: {build['kb_index_build']['seconds']:.3f}s "
+              f"({build['kb_index_build']['peak_bytes'] / 2**20:.1f} MiB)")
+
+        entry.update(bench_match(questions, queries, kb, args.legacy_max_items))
+        print(f"  KBIndex.query: {entry['kb_index_query']['p50_ms']:.3f} ms (p50)"
+              + (f" | match_question: {entry['match_question']['p50_ms']:.1f} ms (p50)"
+                 if "p50_ms" in entry["match_question"] else ""))
+        entry["max_rss_kib"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        report["results"].append(entry)
+
+    # Ponta a ponta no fim: importar a app altera a configuração das caches do nlp_utils
+    if not args.skip_e2e:
+        for entry in report["results"]:
+            corpus = corpora[entry["items"]]
+            rng = random.Random(args.seed + 1)
+            queries = [paraphrase(rng.choice(corpus)[0], rng) for _ in range(args.e2e_requests)]
+            entry["e2e"] = bench_e2e(corpus, queries)
+            print(f"== {entry['items']} itens, ponta a ponta: "
+                  f"{entry['e2e']['chat_post']['per_second']:.0f} POST /chat por segundo")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Resultados em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
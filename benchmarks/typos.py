@@ -0,0 +1,194 @@
+"""
+benchmarks/typos.py
+-------------------
+Perguntas com erros de escrita: KBIndex sem e com correcção de termos (kb_fuzzy.py).
+
+Conjunto de avaliação (determinístico, a partir do SEED_QA):
+- cada pergunta, reformulada (benchmarks/corpus.py), com 1-2 palavras estragadas:
+  acentos em falta, letra a menos/a mais/trocada, letras vizinhas trocadas,
+  dobradas simplificadas ("emissor" -> "emisor")
+- negativas (benchmarks/quality.py): não devem passar a ser aceites por causa das correcções
+
+Métricas (por motor): top-1, aceites (top-1 certo e score >= MATCH_THRESHOLD),
+negativas aceites e latência por pergunta.
+
+Latência da correcção de um termo, num vocabulário grande (termos do SEED_QA +
+pseudo-palavras até --vocab-size): índice de trigramas vs. percorrer todo o
+vocabulário com distância de edição.
+
+Executa:
+  python -m benchmarks.typos
+  python -m benchmarks.typos --vocab-size 100000 --output typos.json
+"""
+
+import argparse
+import json
+import random
+import time
+
+from benchmarks.corpus import paraphrase
+from benchmarks.quality import NEGATIVES
+from benchmarks.suite import summarize
+from kb_fuzzy import TermCorrector, edit_distance, fold, max_edits
+from kb_index import KBIndex, MATCH_THRESHOLD
+from nlp_utils import normalize_many
+from seed import SEED_QA
+
+NEIGHBOURS = {
+    "a": "sq", "e": "wr", "i": "uo", "o": "ip", "u": "yi", "s": "ad", "c": "xv",
+    "r": "et", "t": "ry", "n": "bm", "m": "n", "l": "k", "d": "sf", "p": "o",
+}
+
+
+def misspell(word: str, rng: random.Random) -> str:
+    """Um erro de escrita plausível numa palavra (>= 5 letras)."""
+    kind = rng.choice(["accents", "delete", "double", "transpose", "neighbour", "undouble"])
+    if kind == "accents" and fold(word) != word.lower():
+        return fold(word)
+    if kind == "undouble":
+        for pair in ("ss", "rr", "mm", "nn", "ll", "cc", "ee"):
+            if pair in word:
+                return word.replace(pair, pair[0], 1)
+    i = rng.randrange(1, len(word) - 1)
+    if kind == "delete":
+        return word[:i] + word[i + 1:]
+    if kind == "double":
+        return word[:i] + word[i] + word[i:]
+    if kind == "transpose":
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    options = NEIGHBOURS.get(word[i].lower())
+    if options:
+        return word[:i] + rng.choice(options) + word[i + 1:]
+    return word[:i] + word[i + 1:]
+
+
+def make_typo_set(per_question: int, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    cases = []
+    for question, _ in SEED_QA:
+        for _ in range(per_question):
+            words = paraphrase(question, rng, noise=0.2).rstrip("?").split()
+            long_words = [i for i, w in enumerate(words) if len(w) >= 5]
+            for i in rng.sample(long_words, min(len(long_words), rng.choice([1, 2]))):
+                words[i] = misspell(words[i], rng)
+            cases.append({"question": " ".join(words) + "?", "expected": question})
+    cases.extend({"question": q, "expected": None} for q in NEGATIVES)
+    return cases
+
+
+def pseudo_vocabulary(size: int, seed: int) -> list[str]:
+    """Pseudo-palavras com sílabas do Português (para um vocabulário grande)."""
+    rng = random.Random(seed)
+    syllables = ["ca", "co", "mu", "ni", "ção", "pe", "sso", "al", "em", "pre", "sa", "ri", "al", "te",
+                 "ma", "dor", "ção", "lo", "gi", "ver", "bal", "men", "to", "fe", "ed", "ba", "ck", "ra"]
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(syllables) for _ in range(rng.randint(2, 5))))
+    return sorted(words)
+
+
+def brute_force(term: str, vocabulary: list[str]) -> str | None:
+    """Referência: distância de edição contra todo o vocabulário."""
+    form = fold(term)
+    limit = max_edits(form)
+    best, best_distance = None, limit + 1
+    for known in vocabulary:
+        d = edit_distance(form, fold(known), limit)
+        if d < best_distance:
+            best, best_distance = known, d
+    return best
+
+
+def evaluate(kb: KBIndex, cases: list[dict], ids: dict[str, int]) -> dict:
+    positives = top1 = accepted = negatives = accepted_negatives = 0
+    latencies = []
+    for case in cases:
+        t0 = time.perf_counter()
+        ranked = kb.query(case["question"], top_k=3)
+        latencies.append(time.perf_counter() - t0)
+        best_id, best_score = ranked[0] if ranked else (None, 0.0)
+        if case["expected"] is None:
+            negatives += 1
+            accepted_negatives += best_score >= MATCH_THRESHOLD
+            continue
+        positives += 1
+        if best_id == ids[case["expected"]]:
+            top1 += 1
+            accepted += best_score >= MATCH_THRESHOLD
+    return {
+        "top1": top1 / positives,
+        "accepted": accepted / positives,
+        "negative_accept_rate": accepted_negatives / negatives if negatives else 0.0,
+        "query": summarize(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--per-question", type=int, default=10)
+    parser.add_argument("--vocab-size", type=int, default=50000, help="termos no teste de latência da correcção")
+    parser.add_argument("--terms", type=int, default=300, help="termos estragados no teste de latência")
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--output", help="ficheiro JSON com os resultados")
+    args = parser.parse_args()
+
+    cases = make_typo_set(args.per_question, args.seed)
+    questions = [q for q, _ in SEED_QA]
+    ids = {q: i for i, q in enumerate(questions, start=1)}
+    normalize_many(questions + [c["question"] for c in cases])  # lemas em cache
+
+    report = {"cases": len(cases), "threshold": MATCH_THRESHOLD, "engines": {}}
+    print(f"{len(cases)} perguntas com erros ({len(NEGATIVES)} negativas), limiar {MATCH_THRESHOLD}")
+    print(f"{'motor':<10} {'top-1':>7} {'aceites':>8} {'neg. aceites':>13} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, fuzzy in (("exacto", False), ("fuzzy", True)):
+        kb = KBIndex(fuzzy=fuzzy)
+        kb.build(enumerate(questions, start=1))
+        kb.corrector()
+        r = report["engines"][name] = evaluate(kb, cases, ids)
+        print(f"{name:<10} {r['top1']:>7.3f} {r['accepted']:>8.3f} {r['negative_accept_rate']:>13.3f} "
+              f"{r['query']['p50_ms']:>8.3f} {r['query']['p95_ms']:>8.3f}")
+
+    # Latência da correcção de um termo num vocabulário grande
+    known = sorted({t for terms in normalize_many(questions) for t in terms if len(fold(t)) >= 5})
+    vocabulary = sorted(set(known) | set(pseudo_vocabulary(max(0, args.vocab_size - len(known)), args.seed)))
+    rng = random.Random(args.seed)
+    typos = [(t, misspell(t, rng)) for t in (rng.choice(known) for _ in range(args.terms))]
+    typos = [(t, w) for t, w in typos if w != t]
+
+    t0 = time.perf_counter()
+    corrector = TermCorrector(enumerate(vocabulary))
+    build_s = time.perf_counter() - t0
+
+    latencies, hits = [], 0
+    for truth, typo in typos:
+        corrector._cache.clear()
+        t0 = time.perf_counter()
+        found = corrector.correct(typo)
+        latencies.append(time.perf_counter() - t0)
+        hits += any(vocabulary[i] == truth for i in found)
+
+    scan = []
+    for truth, typo in typos[:20]:
+        t0 = time.perf_counter()
+        brute_force(typo, vocabulary)
+        scan.append(time.perf_counter() - t0)
+
+    report["correction"] = {
+        "vocabulary": len(vocabulary),
+        "build_s": build_s,
+        "trigram": summarize(latencies),
+        "recall": hits / len(typos),
+        "brute_force": summarize(scan),
+    }
+    c = report["correction"]
+    print(f"correcção de termos ({c['vocabulary']} termos, índice em {build_s:.2f}s): "
+          f"trigramas p50 {c['trigram']['p50_ms']:.3f} ms / p95 {c['trigram']['p95_ms']:.3f} ms, "
+          f"acerto {c['recall']:.3f} | vocabulário inteiro p50 {c['brute_force']['p50_ms']:.1f} ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
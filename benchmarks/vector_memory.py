@@ -0,0 +1,83 @@
+"""
+benchmarks/vector_memory.py
+---------------------------
+Memória dos vetores TF-IDF: dict[str, float] (actual) vs CompactVector
+(ids internados em array('I') + pesos float32 + normas, em arrays
+partilhados; cada vetor é uma vista com __slots__).
+Mede a memória retida (tracemalloc) depois de construir os vetores de N perguntas,
+e verifica que cosine_similarity dá o mesmo melhor resultado nos dois formatos.
+
+Também mostra a memória do KBIndex (termos internados) para o mesmo corpus.
+
+Executa:
+  python -m benchmarks.vector_memory --items 50000
+"""
+
+import argparse
+import gc
+import random
+import tracemalloc
+
+import nlp_utils
+from benchmarks.corpus import make_qa_corpus
+from kb_index import KBIndex
+
+
+def retained(fn) -> tuple[object, int]:
+    """(resultado, bytes alocados pelo resultado e ainda vivos)."""
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    questions = [q for q, _ in make_qa_corpus(args.items, seed=args.seed)]
+    # Lemas em cache antes de medir: conta-se só o custo dos vetores
+    nlp_utils.configure_cache(maxsize=args.items + 10_000)
+    nlp_utils.normalize_many(questions)
+
+    (dict_vecs, _), dict_bytes = retained(lambda: nlp_utils.build_tfidf_vectors(questions))
+    (compact_vecs, _), compact_bytes = retained(lambda: nlp_utils.build_tfidf_vectors(questions, compact=True))
+    kb, kb_bytes = retained(lambda: _build_index(questions))
+
+    n = len(questions)
+    print(f"{n} perguntas")
+    print(f"{'dict[str, float]':<20} {dict_bytes / 2**20:>8.1f} MiB  {dict_bytes / n:>7.0f} B/pergunta")
+    print(f"{'CompactVector':<20} {compact_bytes / 2**20:>8.1f} MiB  {compact_bytes / n:>7.0f} B/pergunta"
+          f"  (x{dict_bytes / max(1, compact_bytes):.1f} menos)")
+    print(f"{'KBIndex (' + kb.backend + ')':<20} {kb_bytes / 2**20:>8.1f} MiB  {kb_bytes / n:>7.0f} B/pergunta")
+
+    # Mesmo melhor resultado com os dois formatos (pesos float32: scores iguais a ~1e-6)
+    rng = random.Random(args.seed)
+    sample = rng.sample(range(n), min(args.queries, n))
+    differ = 0
+    for i in sample:
+        query = dict_vecs[i]
+        query_compact = compact_vecs[i]
+        best_dict = max(range(n), key=lambda j: nlp_utils.cosine_similarity(query, dict_vecs[j]))
+        best_compact = max(range(n), key=lambda j: nlp_utils.cosine_similarity(query_compact, compact_vecs[j]))
+        if abs(nlp_utils.cosine_similarity(query, dict_vecs[best_dict])
+               - nlp_utils.cosine_similarity(query, dict_vecs[best_compact])) > 1e-5:
+            differ += 1
+    print(f"melhor resultado diferente: {differ} / {len(sample)}")
+
+
+def _build_index(questions: list[str]) -> KBIndex:
+    kb = KBIndex()
+    kb.build(enumerate(questions, start=1))
+    kb.refresh()
+    return kb
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+benchmarks/worker_memory.py
+---------------------------
+Memória por worker do gunicorn, com e sem preload (gunicorn.conf.py):
+- RSS: memória residente (conta as páginas partilhadas em cada worker)
+- PSS: memória proporcional (páginas partilhadas divididas pelos processos)
+- USS: memória privada do worker (o que se liberta se ele morrer)
+
+Com preload, o modelo spaCy e o índice ficam no master e são partilhados:
+o USS/PSS por worker deve descer. Só funciona em Linux (/proc).
+
+Executa (a partir da raiz do projecto, com a BD já criada):
+  python -m benchmarks.worker_memory --workers 4
+"""
+
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+from benchmarks import INSTANCE_FREE_ENV
+
+
+def smaps_rollup(pid: int) -> dict[str, int]:
+    """
+    Campos de /proc/<pid>/smaps_rollup, em KiB.
+    """
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                values[parts[0][:-1]] = int(parts[1])
+    return values
+
+
+def children(pid: int) -> list[int]:
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure(preload: bool, workers: int, timeout: float) -> list[dict[str, int]]:
+    env = dict(
+        os.environ,
+        GUNICORN_PRELOAD="1" if preload else "0",
+        # nada em instance/ (cache de lemas, de respostas, snapshot): cada worker
+        # sem preload tem mesmo de carregar o spaCy e construir o índice
+        **INSTANCE_FREE_ENV,
+    )
+    port = free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+         "--workers", str(workers), "--bind", f"127.0.0.1:{port}", "app:app"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.time() + timeout
+        pids = []
+        while time.time() < deadline:
+            pids = children(proc.pid)
+            if len(pids) == workers:
+                try:
+                    socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                    break
+                except OSError:
+                    pass
+            time.sleep(0.5)
+        else:
+            raise SystemExit("gunicorn não arrancou a tempo")
+        # sem preload, cada worker importa a app depois do fork: dar-lhes tempo
+        time.sleep(timeout / 4)
+        return [smaps_rollup(pid) for pid in children(proc.pid)]
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    print(f"{'modo':<10} {'RSS/worker':>12} {'PSS/worker':>12} {'USS/worker':>12} {'PSS total':>12}  (MiB)")
+    for preload in (False, True):
+        stats = measure(preload, args.workers, args.timeout)
+        n = len(stats)
+        rss = sum(s.get("Rss", 0) for s in stats) / n / 1024
+        pss = sum(s.get("Pss", 0) for s in stats) / 1024
+        uss = sum(s.get("Private_Clean", 0) + s.get("Private_Dirty", 0) for s in stats) / n / 1024
+        label = "preload" if preload else "normal"
+        print(f"{label:<10} {rss:>12.1f} {pss / n:>12.1f} {uss:>12.1f} {pss:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
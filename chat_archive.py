@@ -0,0 +1,192 @@
+"""
+chat_archive.py
+---------------
+Retenção do histórico do chat: mensagens com mais de N dias saem de chat_messages
+para chat_archives (JSONL comprimido com gzip, em blocos por utilizador e mês).
+
+Porquê: chat_messages cresce sempre (duas linhas por pergunta). Tabela e índices
+maiores tornam mais lentas as consultas do chat e as cópias de segurança da BD.
+
+Arquivo (archive_chats):
+- lotes limitados (batch_size mensagens): cada lote é uma transacção curta
+  (ler, gravar blocos, apagar, commit); o lock de escrita do SQLite fica livre
+  entre lotes (pause opcional para dar passagem aos pedidos do chat)
+- lotes pela ordem do índice composto (user_id, created_at, id): mensagens seguidas
+  do mesmo utilizador formam blocos grandes (melhor compressão)
+- blocos e DELETE no mesmo commit: uma interrupção a meio não perde nem duplica mensagens
+- VACUUM opcional (só SQLite):
+  - incremental: PRAGMA incremental_vacuum devolve ao disco as páginas libertadas
+    (precisa de auto_vacuum=INCREMENTAL; as BD novas já são criadas assim, ver app.py)
+  - full: VACUUM completo (bloqueia a BD durante a cópia); converte uma BD antiga
+    para auto_vacuum=INCREMENTAL, a partir daí basta o incremental
+
+Leitura: read_month() junta os blocos de um mês (o /history mostra-os depois
+das mensagens que ainda estão em chat_messages).
+
+Usado pelo comando (agendar, ex.: uma vez por dia):
+  flask --app app archive-chats --days 180 --vacuum incremental
+"""
+
+import gzip
+import json
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import groupby
+
+from sqlalchemy import delete, insert, select, text
+
+from models import db, ChatArchive, ChatMessage
+
+VACUUM_MODES = ("none", "incremental", "full")
+
+
+@dataclass
+class ArchiveReport:
+    archived: int = 0
+    chunks: int = 0
+    batches: int = 0
+    raw_bytes: int = 0
+    compressed_bytes: int = 0
+    freed_pages: int = 0
+
+    def summary(self) -> str:
+        ratio = self.raw_bytes / self.compressed_bytes if self.compressed_bytes else 0.0
+        return (
+            f"{self.archived} mensagens arquivadas em {self.chunks} blocos ({self.batches} lotes), "
+            f"texto {self.raw_bytes} bytes -> arquivo {self.compressed_bytes} bytes (x{ratio:.1f}), "
+            f"{self.freed_pages} páginas libertadas"
+        )
+
+
+def encode_messages(messages: list[dict]) -> bytes:
+    """JSONL (uma mensagem por linha) comprimido com gzip."""
+    lines = "".join(json.dumps(m, ensure_ascii=False, separators=(",", ":")) + "\n" for m in messages)
+    return gzip.compress(lines.encode("utf-8"), compresslevel=9)
+
+
+def decode_messages(payload: bytes) -> list[dict]:
+    """Inverso de encode_messages(); created_at volta a datetime."""
+    messages = []
+    for line in gzip.decompress(payload).decode("utf-8").splitlines():
+        record = json.loads(line)
+        record["created_at"] = datetime.fromisoformat(record["created_at"])
+        messages.append(record)
+    return messages
+
+
+def read_month(user_id: int, month: str) -> list[dict]:
+    """
+    Mensagens arquivadas do utilizador num mês ("AAAA-MM"), por ordem cronológica.
+    Cada mensagem: id, role, content, created_at.
+    """
+    payloads = db.session.execute(
+        select(ChatArchive.payload)
+        .where(ChatArchive.user_id == user_id, ChatArchive.month == month)
+        .order_by(ChatArchive.first_at, ChatArchive.id)
+    ).scalars()
+    messages = [m for payload in payloads for m in decode_messages(payload)]
+    messages.sort(key=lambda m: (m["created_at"], m["id"]))
+    return messages
+
+
+def pending_count(cutoff: datetime) -> int:
+    """Mensagens que seriam arquivadas com este limite (para --dry-run)."""
+    return db.session.execute(
+        select(db.func.count(ChatMessage.id)).where(ChatMessage.created_at < cutoff)
+    ).scalar_one()
+
+
+def _archive_batch(cutoff: datetime, from_user: int, batch_size: int, report: ArchiveReport) -> int | None:
+    """
+    Arquiva um lote (uma transacção). Devolve o user_id onde continuar, ou None se acabou.
+    Continua em user_id >= último: não se voltam a percorrer os utilizadores já tratados.
+    """
+    rows = db.session.execute(
+        select(ChatMessage.id, ChatMessage.user_id, ChatMessage.role, ChatMessage.content, ChatMessage.created_at)
+        .where(ChatMessage.user_id >= from_user, ChatMessage.created_at < cutoff)
+        .order_by(ChatMessage.user_id, ChatMessage.created_at, ChatMessage.id)
+        .limit(batch_size)
+    ).all()
+    if not rows:
+        return None
+
+    chunks = []
+    for (user_id, month), group in groupby(rows, key=lambda r: (r.user_id, r.created_at.strftime("%Y-%m"))):
+        group = list(group)
+        messages = [
+            {"id": r.id, "role": r.role, "content": r.content, "created_at": r.created_at.isoformat()}
+            for r in group
+        ]
+        payload = encode_messages(messages)
+        report.raw_bytes += sum(len(r.content.encode("utf-8")) for r in group)
+        report.compressed_bytes += len(payload)
+        chunks.append({
+            "user_id": user_id,
+            "month": month,
+            "first_at": group[0].created_at,
+            "last_at": group[-1].created_at,
+            "message_count": len(group),
+            "payload": payload,
+            "created_at": datetime.utcnow(),
+        })
+
+    db.session.execute(insert(ChatArchive), chunks)
+    db.session.execute(delete(ChatMessage).where(ChatMessage.id.in_([r.id for r in rows])))
+    db.session.commit()
+
+    report.archived += len(rows)
+    report.chunks += len(chunks)
+    report.batches += 1
+    return rows[-1].user_id if len(rows) == batch_size else None
+
+
+def vacuum(mode: str, pages_per_step: int = 1000) -> int:
+    """
+    Devolve ao disco o espaço libertado (SQLite). Retorna as páginas libertadas.
+    incremental: em passos de pages_per_step páginas (transacções curtas).
+    """
+    if mode == "none" or db.engine.dialect.name != "sqlite":
+        return 0
+    with db.engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        before = conn.execute(text("PRAGMA page_count")).scalar_one()
+        if mode == "full":
+            conn.execute(text("PRAGMA auto_vacuum=INCREMENTAL"))
+            conn.execute(text("VACUUM"))
+        elif conn.execute(text("PRAGMA auto_vacuum")).scalar_one() == 2:
+            free = conn.execute(text("PRAGMA freelist_count")).scalar_one()
+            while free > 0:
+                # executescript (sqlite3_exec) corre o PRAGMA até ao fim; com execute()
+                # o módulo sqlite3 dá um só passo e liberta apenas uma página
+                conn.connection.driver_connection.executescript(
+                    f"PRAGMA incremental_vacuum({int(pages_per_step)});"
+                )
+                free, previous = conn.execute(text("PRAGMA freelist_count")).scalar_one(), free
+                if free >= previous:
+                    break
+        else:
+            raise ValueError("A BD não tem auto_vacuum=INCREMENTAL: corre uma vez com --vacuum full")
+        return before - conn.execute(text("PRAGMA page_count")).scalar_one()
+
+
+def archive_chats(days: int, batch_size: int = 500, pause: float = 0.0,
+                  vacuum_mode: str = "none") -> ArchiveReport:
+    """
+    Arquiva as mensagens com mais de `days` dias, em lotes de batch_size
+    (um commit por lote, `pause` segundos entre lotes).
+    """
+    if vacuum_mode not in VACUUM_MODES:
+        raise ValueError(f"Modo de VACUUM desconhecido: {vacuum_mode}")
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    report = ArchiveReport()
+    from_user = 0
+    while True:
+        next_user = _archive_batch(cutoff, from_user, batch_size, report)
+        if next_user is None:
+            break
+        from_user = next_user
+        if pause:
+            time.sleep(pause)
+    report.freed_pages = vacuum(vacuum_mode)
+    return report
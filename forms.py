@@ -6,10 +6,11 @@ Formulários WTForms:
 - Registo
 - Chat (pergunta)
 - Mudança de password
-- Admin (criar/editar QA)
+- Admin (criar/editar QA, importar em massa)
 """
 
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileRequired, FileAllowed
 from wtforms import StringField, PasswordField, TextAreaField, SubmitField, BooleanField, HiddenField
 from wtforms.validators import DataRequired, Email, Length
 
@@ -44,3 +45,10 @@ class QAForm(FlaskForm):
     question = TextAreaField("Pergunta", validators=[DataRequired(), Length(min=3)])
     answer = TextAreaField("Resposta", validators=[DataRequired(), Length(min=3)])
     submit = SubmitField("Guardar")
+
+
+class QAImportForm(FlaskForm):
+    file = FileField("Ficheiro (CSV ou JSONL)", validators=[
+        FileRequired(), FileAllowed(["csv", "jsonl", "json"], "Usa um ficheiro .csv ou .jsonl"),
+    ])
+    submit = SubmitField("Importar")
@@ -0,0 +1,244 @@
+"""
+http_cache.py
+-------------
+Cache HTTP: menos bytes e menos trabalho no servidor por página vista.
+
+1. Ficheiros estáticos (StaticAssets)
+   - url_for('static', filename=...) acrescenta ?v=<hash do conteúdo>
+   - pedido com o v actual: Cache-Control "public, max-age=1 ano, immutable";
+     o browser não volta a pedir o ficheiro até ele mudar (e o URL com ele)
+   - v antigo ou sem v: resposta normal, revalidada com ETag (304)
+   - variantes pré-comprimidas (app.css.br / app.css.gz ao lado do original,
+     criadas no build por `flask --app app compress-static`): enviadas se o
+     browser as aceita (Accept-Encoding), sem comprimir nada durante os pedidos
+   - brotli (.br) só se o pacote `brotli` estiver instalado; gzip sempre
+
+2. Páginas que só mudam com o deploy ou com a base de conhecimento: ETag + If-None-Match
+   - PageCache: página igual para todos (landing para visitantes) renderizada uma vez por worker
+   - VersionedCache: valor calculado uma vez por versão (sugestões por KBVersion)
+   - not_modified(): 304 sem corpo quando o browser já tem esta versão
+
+Medir com: python -m benchmarks.http_cache
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from typing import Callable
+
+from flask import Response, request, send_from_directory
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # opcional: sem ele só há .gz
+    brotli = None
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Extensões que vale a pena comprimir (imagens/fontes já vêm comprimidas)
+COMPRESSIBLE = {".css", ".js", ".html", ".json", ".svg", ".txt", ".map", ".xml"}
+# Preferência do servidor quando o browser aceita várias
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def file_digest(path: str, size: int = 12) -> str:
+    """Primeiros `size` caracteres hexadecimais do SHA-256 do ficheiro."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            h.update(block)
+    return h.hexdigest()[:size]
+
+
+def compress_bytes(data: bytes) -> dict[str, bytes]:
+    """
+    Variantes comprimidas de `data` (nível máximo: só corre no build).
+    gzip com mtime=0: o mesmo ficheiro dá sempre os mesmos bytes.
+    """
+    variants = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(data, quality=11)
+    return variants
+
+
+def compress_static(folder: str, min_size: int = 512) -> list[dict]:
+    """
+    Cria .gz (e .br) ao lado de cada ficheiro comprimível de `folder`.
+    Ficheiros pequenos (< min_size) ou que não ficam mais pequenos são ignorados
+    (e variantes antigas deles removidas).
+    Devolve, por ficheiro: nome, tamanho original e tamanho de cada variante.
+    """
+    suffixes = {suffix for _, suffix in ENCODINGS}
+    report = []
+    for root, _, files in os.walk(folder):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            ext = os.path.splitext(name)[1].lower()
+            if ext in suffixes or ext not in COMPRESSIBLE:
+                continue
+            with open(path, "rb") as f:
+                data = f.read()
+            entry = {"file": os.path.relpath(path, folder).replace(os.sep, "/"), "size": len(data)}
+            variants = compress_bytes(data) if len(data) >= min_size else {}
+            for encoding, suffix in ENCODINGS:
+                body = variants.get(encoding)
+                if body is None or len(body) >= len(data):
+                    if os.path.exists(path + suffix):
+                        os.remove(path + suffix)
+                    continue
+                tmp = f"{path}{suffix}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(body)
+                os.replace(tmp, path + suffix)
+                entry[encoding] = len(body)
+            report.append(entry)
+    return report
+
+
+class StaticAssets:
+    """
+    Substitui a rota "static" do Flask: URLs com hash do conteúdo, cache longa
+    e variantes pré-comprimidas.
+
+    Por ficheiro, guarda (mtime, hash, codificações disponíveis); só volta a ler
+    o ficheiro se o mtime mudar. As variantes são procuradas nessa altura
+    (criadas no build, antes do arranque dos workers).
+    """
+
+    def __init__(self, app=None):
+        self.folder: str | None = None
+        self._info: dict[str, tuple[int, str, tuple[str, ...]]] = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self.folder = app.static_folder
+        app.url_defaults(self._add_version)
+        app.view_functions["static"] = self.serve
+        app.extensions["static_assets"] = self
+
+    def _lookup(self, filename: str) -> tuple[str, tuple[str, ...]] | None:
+        """(hash, codificações pré-comprimidas) do ficheiro, ou None se não existe."""
+        path = safe_join(self.folder, filename) if self.folder else None
+        if path is None:
+            return None
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        info = self._info.get(filename)
+        if info is not None and info[0] == mtime:
+            return info[1], info[2]
+
+        encodings = []
+        if os.path.splitext(filename)[1].lower() in COMPRESSIBLE:
+            for encoding, suffix in ENCODINGS:
+                try:
+                    # Variante mais antiga que o original: desactualizada, ignora
+                    if os.stat(path + suffix).st_mtime_ns >= mtime:
+                        encodings.append(encoding)
+                except OSError:
+                    pass
+        info = (mtime, file_digest(path), tuple(encodings))
+        with self._lock:
+            self._info[filename] = info
+        return info[1], info[2]
+
+    def version(self, filename: str) -> str | None:
+        """Hash do conteúdo (o valor de ?v=), ou None se o ficheiro não existe."""
+        found = self._lookup(filename)
+        return found[0] if found else None
+
+    def _add_version(self, endpoint: str, values: dict) -> None:
+        if endpoint == "static" and "v" not in values and "filename" in values:
+            version = self.version(values["filename"])
+            if version:
+                values["v"] = version
+
+    def serve(self, filename: str) -> Response:
+        found = self._lookup(filename)
+        encodings = found[1] if found else ()
+        fresh = found is not None and request.args.get("v") == found[0]
+
+        target, encoding = filename, None
+        for candidate, suffix in ENCODINGS:
+            if candidate in encodings and request.accept_encodings[candidate]:
+                target, encoding = filename + suffix, candidate
+                break
+
+        response = send_from_directory(
+            self.folder, target,
+            mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+            max_age=IMMUTABLE_MAX_AGE if fresh else None,
+        )
+        if encoding:
+            response.content_encoding = encoding
+        if encodings:
+            response.vary.add("Accept-Encoding")
+        if fresh:
+            response.cache_control.immutable = True
+        return response
+
+
+def not_modified(etag: str) -> Response | None:
+    """
+    304 se o browser já tem esta versão (If-None-Match), senão None.
+    Verificado antes de calcular a página: uma resposta 304 não faz consultas nem render.
+    """
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response
+    return None
+
+
+def revalidated(body: str, etag: str) -> Response:
+    """Resposta com ETag que o browser guarda mas revalida sempre (Cache-Control: no-cache)."""
+    response = Response(body, mimetype="text/html")
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+
+class PageCache:
+    """
+    Corpo + ETag de páginas iguais para todos os pedidos (por worker).
+    O ETag é o hash do corpo: muda com o template e com os URLs dos estáticos.
+    """
+
+    def __init__(self):
+        self._pages: dict[str, tuple[str, str]] = {}
+
+    def get(self, key: str, render: Callable[[], str]) -> tuple[str, str]:
+        page = self._pages.get(key)
+        if page is None:
+            body = render()
+            page = self._pages[key] = (body, hashlib.sha256(body.encode("utf-8")).hexdigest()[:16])
+        return page
+
+
+class VersionedCache:
+    """
+    Um valor calculado uma vez por versão (ex.: sugestões do chat por KBVersion).
+    A troca é de um tuplo inteiro: leitores concorrentes nunca vêem versão e valor misturados.
+    """
+
+    def __init__(self, compute: Callable[[], object]):
+        self._compute = compute
+        self._entry: tuple[int, object] | None = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, version: int):
+        entry = self._entry
+        if entry is not None and entry[0] == version:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        value = self._compute()
+        self._entry = (version, value)
+        return value
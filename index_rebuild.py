@@ -0,0 +1,182 @@
+"""
+index_rebuild.py
+----------------
+Reconstrução do índice TF-IDF (KBIndex) numa thread em segundo plano.
+
+Antes, o índice era actualizado dentro do pedido:
+- nas rotas de admin (add/update/remove + idf/backend na consulta seguinte)
+- no /chat, quando outro worker tinha mudado a base (build completo)
+Com bases grandes, isto tornava lentas as gravações do admin ou o pedido
+do aluno que apanhava a mudança.
+
+Agora os pedidos só pedem uma versão (request) e continuam:
+- a thread constrói um índice novo, separado, a partir da BD (ou do snapshot)
+- enquanto isso, as consultas usam o índice antigo, que não é alterado
+- no fim, o índice novo é publicado com uma troca de referências
+  (KBIndex.adopt): quem já está a pontuar termina com o estado antigo
+
+Pedidos em rajada (ex.: vários saves seguidos, ou muitos /chat a ver a
+mesma versão nova) são agrupados:
+- depois do primeiro pedido, a thread espera `debounce` segundos
+- pedidos durante uma reconstrução deixam só uma reconstrução pendente,
+  para a versão mais recente
+
+Uma thread por processo (criada no primeiro uso: os workers do gunicorn
+nascem por fork e não herdam threads). Estado em /admin/index/status.
+"""
+
+import atexit
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable
+
+
+class IndexRebuilder:
+    """
+    Executa rebuild(version) em segundo plano, uma reconstrução de cada vez.
+    Com background=False, request() reconstrói logo, no próprio pedido.
+    """
+
+    def __init__(self, app, rebuild: Callable[[int], None], debounce: float = 0.25,
+                 background: bool = True):
+        self.app = app
+        self.rebuild = rebuild
+        self.debounce = debounce
+        self.background = background
+
+        # Estatísticas (lidas pelo /admin/index/status e pelo /metrics)
+        self.requests = 0
+        self.coalesced = 0
+        self.builds = 0
+        self.failures = 0
+        self.last_version: int | None = None
+        self.last_duration: float | None = None
+        self.last_finished_at: datetime | None = None
+        self.last_error: str | None = None
+
+        self._wanted: int | None = None      # versão pendente (a mais recente pedida)
+        self._requested_at = 0.0             # início da janela de agrupamento
+        self._building: int | None = None    # versão em construção
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._pid = None
+        self._closed = False
+        atexit.register(self.close)
+
+    def request(self, version: int) -> None:
+        """
+        Pede o índice na versão `version` (não bloqueia em modo background).
+        """
+        if not self.background:
+            self.requests += 1
+            self._run_rebuild(version)
+            return
+
+        self._ensure_thread()
+        with self._cond:
+            self.requests += 1
+            if (self._building is not None and version <= self._building) or (
+                self._wanted is not None and version <= self._wanted
+            ):
+                self.coalesced += 1
+                return
+            if self._wanted is None:
+                self._requested_at = time.monotonic()
+            else:
+                self.coalesced += 1
+            self._wanted = version
+            self._cond.notify()
+
+    def wait_idle(self, timeout: float | None = None) -> bool:
+        """
+        Espera que não haja reconstruções pendentes nem em curso
+        (CLI, benchmarks). Devolve False se o tempo acabar.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._wanted is not None or self._building is not None:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def status(self) -> dict:
+        with self._cond:
+            return {
+                "background": self.background,
+                "pending_version": self._wanted,
+                "building_version": self._building,
+                "requests": self.requests,
+                "coalesced": self.coalesced,
+                "builds": self.builds,
+                "failures": self.failures,
+                "last_version": self.last_version,
+                "last_duration_s": self.last_duration,
+                "last_finished_at": self.last_finished_at.isoformat(timespec="seconds") + "Z"
+                if self.last_finished_at else None,
+                "last_error": self.last_error,
+            }
+
+    def _ensure_thread(self) -> None:
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._cond:
+            if self._pid != os.getpid() or self._thread is None or not self._thread.is_alive():
+                if self._pid != os.getpid():
+                    # Estado herdado do master (fork) não tem thread a tratar dele
+                    self._wanted = self._building = None
+                self._thread = threading.Thread(target=self._run, name="kb-index-rebuild", daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while self._wanted is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                # Janela fixa a partir do primeiro pedido: uma rajada contínua
+                # de pedidos não adia a reconstrução indefinidamente
+                while not self._closed:
+                    remaining = self._requested_at + self.debounce - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                version, self._wanted = self._wanted, None
+                self._building = version
+
+            try:
+                self._run_rebuild(version)
+            finally:
+                with self._cond:
+                    self._building = None
+                    self._cond.notify_all()
+
+    def _run_rebuild(self, version: int) -> None:
+        t0 = time.perf_counter()
+        with self.app.app_context():
+            try:
+                self.rebuild(version)
+            except Exception as exc:  # o índice antigo continua a responder
+                self.failures += 1
+                self.last_error = f"{type(exc).__name__}: {exc}"
+                self.app.logger.exception("Falha a reconstruir o índice (versão %s)", version)
+                return
+        self.builds += 1
+        self.last_version = version
+        self.last_duration = time.perf_counter() - t0
+        self.last_finished_at = datetime.utcnow()
+        self.last_error = None
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Pára a thread (à saída do processo); uma reconstrução em curso não é interrompida."""
+        thread = self._thread
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if thread is not None and thread.is_alive() and self._pid == os.getpid():
+            thread.join(timeout)
@@ -0,0 +1,264 @@
+"""
+kb_dedup.py
+-----------
+Detecção de perguntas quase duplicadas na base de conhecimento (QAItem),
+com MinHash + LSH (locality-sensitive hashing) sobre os lemas de nlp_utils.normalize.
+
+Porquê:
+- com o admin e as importações em massa acumulam-se perguntas equivalentes
+  ("O que é feedback?" / "Explica-me o que é o feedback")
+- cada uma pesa no scoring e o score divide-se entre itens que dizem o mesmo
+- comparar todos os pares (cosine_similarity) é O(N²): inviável acima de uns milhares
+
+Como:
+- cada pergunta = conjunto dos seus lemas; semelhança = Jaccard entre conjuntos
+- MinHash: assinatura de num_perm inteiros; a fracção de posições iguais entre
+  duas assinaturas estima o Jaccard
+- LSH: a assinatura é cortada em `bands` bandas de `rows` valores; duas perguntas
+  são candidatas se coincidirem numa banda inteira (um lookup num dict por banda)
+- os candidatos são confirmados com o Jaccard exacto (>= threshold)
+
+Com bands=16, rows=4, pares com Jaccard 0.7 são candidatos com probabilidade ~0.98
+e pares com 0.3 só ~0.12: cada consulta olha para poucos itens, não para a base toda.
+
+Usado em app.py (aviso ao gravar no admin, relatório /admin/qa/duplicates)
+e no comando `flask --app app find-duplicates`. Ver benchmarks/dedup.py.
+"""
+
+import random
+import threading
+import zlib
+from typing import Iterable
+
+from nlp_utils import normalize_many
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Primo de Mersenne 2^31 - 1: a * x + b cabe em 64 bits (também no NumPy)
+_PRIME = (1 << 31) - 1
+
+# Semelhança (Jaccard entre conjuntos de lemas) a partir da qual se avisa
+DEFAULT_THRESHOLD = 0.7
+
+
+def shingles(terms: Iterable[str]) -> list[int]:
+    """
+    Lemas -> hashes estáveis de 31 bits (iguais entre processos e execuções,
+    ao contrário de hash() com PYTHONHASHSEED).
+    """
+    return sorted({zlib.crc32(t.encode("utf-8")) & _PRIME for t in terms})
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """
+    num_perm funções de hash h(x) = (a * x + b) mod p, com a, b fixos pelo seed.
+    """
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.a = [rng.randrange(1, _PRIME) for _ in range(num_perm)]
+        self.b = [rng.randrange(0, _PRIME) for _ in range(num_perm)]
+        if np is not None:
+            self._a = np.array(self.a, dtype=np.uint64)[:, None]
+            self._b = np.array(self.b, dtype=np.uint64)[:, None]
+
+    def signature(self, hashes: list[int]) -> tuple[int, ...]:
+        """
+        Assinatura MinHash de um conjunto (hashes de shingles(); não vazio).
+        """
+        if np is not None and len(hashes) > 4:
+            x = np.array(hashes, dtype=np.uint64)[None, :]
+            return tuple(((self._a * x + self._b) % _PRIME).min(axis=1).tolist())
+        return tuple(min((a * x + b) % _PRIME for x in hashes) for a, b in zip(self.a, self.b))
+
+    def signatures(self, hash_lists: list[list[int]], chunk: int = 4096) -> list[tuple[int, ...]]:
+        """
+        Assinaturas de muitos conjuntos (não vazios) de uma vez: com NumPy, um bloco de
+        documentos = uma matriz num_perm x (nº total de shingles) + mínimo por documento.
+        """
+        if np is None:
+            return [self.signature(hashes) for hashes in hash_lists]
+        result = []
+        for start in range(0, len(hash_lists), chunk):
+            block = hash_lists[start:start + chunk]
+            lengths = np.array([len(h) for h in block], dtype=np.int64)
+            x = np.fromiter((v for h in block for v in h), dtype=np.uint64, count=int(lengths.sum()))
+            hashed = (self._a * x[None, :] + self._b) % _PRIME
+            offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+            result.extend(map(tuple, np.minimum.reduceat(hashed, offsets, axis=1).T.tolist()))
+        return result
+
+
+class DuplicateIndex:
+    """
+    Índice LSH incremental: qa_id -> (lemas, assinatura).
+
+    - similar(): itens parecidos com um texto/conjunto de lemas (sublinear: só candidatos LSH)
+    - clusters(): grupos de duplicados em toda a base (union-find sobre pares confirmados)
+
+    stamp: versão da base de conhecimento (KBVersion) a que corresponde (definida pela app).
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, bands: int = 16, rows: int = 4, seed: int = 1):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = rows
+        self.hasher = MinHasher(bands * rows, seed=seed)
+        self.stamp = None
+
+        self._lock = threading.RLock()
+        self._terms: dict[int, frozenset] = {}
+        self._signatures: dict[int, tuple[int, ...]] = {}
+        # Uma tabela por banda: valores da banda -> qa_ids
+        self._buckets: list[dict[tuple[int, ...], set[int]]] = [{} for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def __contains__(self, qa_id: int) -> bool:
+        return qa_id in self._terms
+
+    def _band_keys(self, signature: tuple[int, ...]) -> list[tuple[int, ...]]:
+        r = self.rows
+        return [signature[i * r:(i + 1) * r] for i in range(self.bands)]
+
+    # -------------------------
+    # Manutenção
+    # -------------------------
+    def build(self, items: Iterable[tuple[int, str]]) -> None:
+        """
+        (Re)constrói a partir de pares (qa_id, pergunta); normalização em lote (com cache).
+        """
+        items = list(items)
+        docs = [
+            (qa_id, frozenset(doc_terms))
+            for (qa_id, _), doc_terms in zip(items, normalize_many([q for _, q in items]))
+        ]
+        docs = [(qa_id, term_set) for qa_id, term_set in docs if term_set]
+        signatures = self.hasher.signatures([shingles(term_set) for _, term_set in docs])
+        with self._lock:
+            self._terms, self._signatures = {}, {}
+            self._buckets = [{} for _ in range(self.bands)]
+            for (qa_id, term_set), signature in zip(docs, signatures):
+                self._insert(qa_id, term_set, signature)
+
+    def add(self, qa_id: int, terms: Iterable[str]) -> None:
+        """
+        Adiciona (ou substitui) um item, com os lemas já normalizados.
+        """
+        with self._lock:
+            self._discard(qa_id)
+            self._add(qa_id, terms)
+
+    def remove(self, qa_id: int) -> None:
+        with self._lock:
+            self._discard(qa_id)
+
+    def _add(self, qa_id: int, terms: Iterable[str]) -> None:
+        term_set = frozenset(terms)
+        if not term_set:
+            return  # sem lemas (ex.: só stopwords): não se compara
+        self._insert(qa_id, term_set, self.hasher.signature(shingles(term_set)))
+
+    def _insert(self, qa_id: int, term_set: frozenset, signature: tuple[int, ...]) -> None:
+        self._terms[qa_id] = term_set
+        self._signatures[qa_id] = signature
+        for table, key in zip(self._buckets, self._band_keys(signature)):
+            table.setdefault(key, set()).add(qa_id)
+
+    def _discard(self, qa_id: int) -> None:
+        signature = self._signatures.pop(qa_id, None)
+        if signature is None:
+            return
+        del self._terms[qa_id]
+        for table, key in zip(self._buckets, self._band_keys(signature)):
+            bucket = table[key]
+            bucket.discard(qa_id)
+            if not bucket:
+                del table[key]
+
+    # -------------------------
+    # Consulta
+    # -------------------------
+    def candidates(self, signature: tuple[int, ...]) -> set[int]:
+        found = set()
+        for table, key in zip(self._buckets, self._band_keys(signature)):
+            found |= table.get(key, set())
+        return found
+
+    def similar(self, terms: Iterable[str], exclude: int | None = None,
+                threshold: float | None = None) -> list[tuple[int, float]]:
+        """
+        Itens com Jaccard >= threshold em relação a estes lemas,
+        por semelhança desc (empates por qa_id asc).
+        """
+        threshold = self.threshold if threshold is None else threshold
+        term_set = frozenset(terms)
+        if not term_set:
+            return []
+        signature = self.hasher.signature(shingles(term_set))
+        with self._lock:
+            scored = [
+                (qa_id, jaccard(term_set, self._terms[qa_id]))
+                for qa_id in self.candidates(signature) if qa_id != exclude
+            ]
+        return sorted(((i, s) for i, s in scored if s >= threshold), key=lambda x: (-x[1], x[0]))
+
+    def clusters(self, threshold: float | None = None) -> list[list[int]]:
+        """
+        Grupos (>= 2 itens) de duplicados em toda a base, maiores primeiro.
+        Só os pares que partilham um balde LSH são comparados; os grupos são
+        transitivos (A~B e B~C juntam A, B e C).
+        """
+        threshold = self.threshold if threshold is None else threshold
+        parent: dict[int, int] = {}
+
+        def find(x: int) -> int:
+            root = x
+            while parent.get(root, root) != root:
+                root = parent[root]
+            while x != root:  # compressão de caminho
+                parent[x], x = root, parent[x]
+            return root
+
+        with self._lock:
+            for table in self._buckets:
+                for bucket in table.values():
+                    if len(bucket) < 2:
+                        continue
+                    # Cada item é comparado com um representante de cada grupo já
+                    # visto neste balde (não com todos os itens): baldes grandes
+                    # (muitas perguntas parecidas) ficam lineares no nº de grupos
+                    reps: list[int] = []
+                    for a in sorted(bucket):
+                        joined = False
+                        for b in reps:
+                            root_a, root_b = find(a), find(b)
+                            if root_a == root_b:
+                                joined = True
+                                break
+                            if jaccard(self._terms[a], self._terms[b]) >= threshold:
+                                low, high = min(root_a, root_b), max(root_a, root_b)
+                                parent[high] = low
+                                parent.setdefault(low, low)
+                                joined = True
+                        if not joined:
+                            reps.append(a)
+
+        groups: dict[int, list[int]] = {}
+        for qa_id in parent:
+            groups.setdefault(find(qa_id), []).append(qa_id)
+        return sorted(
+            (sorted(g) for g in groups.values() if len(g) > 1),
+            key=lambda g: (-len(g), g[0]),
+        )
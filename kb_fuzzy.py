@@ -0,0 +1,166 @@
+"""
+kb_fuzzy.py
+-----------
+Correcção de termos da pergunta que não existem no vocabulário da base de
+conhecimento (erros de escrita, acentos em falta): "comunicacao", "emisor", "fedback".
+
+Sem isto, normalize() produz lemas que não batem com nada, a pergunta fica
+abaixo do MATCH_THRESHOLD e o aluno recebe "reformula" (e volta a perguntar).
+
+Índice pré-calculado sobre o vocabulário do KBIndex (não sobre os textos):
+1. forma "dobrada" (minúsculas, sem acentos) -> termos: "comunicacao" -> "comunicação"
+2. índice invertido de trigramas de caracteres ("$em", "emi", "mis", ...) da forma dobrada
+   - os candidatos são os termos que partilham trigramas com o termo desconhecido
+     (contagem nas listas de postings), ordenados por semelhança de Jaccard
+   - listas de postings separadas pelo tamanho do termo: só se lêem as dos tamanhos
+     alcançáveis com os erros tolerados (ex.: 7 letras e 1 erro -> 6, 7 e 8)
+   - só os melhores candidatos são confirmados com distância de edição (Damerau, limitada)
+Não se percorre o vocabulário inteiro com distância de edição.
+
+Termos curtos (< 4 letras) não são corrigidos: há demasiados vizinhos possíveis.
+Usado por KBIndex.query_terms (ver kb_index.py); medir com benchmarks/typos.py.
+"""
+
+import heapq
+import unicodedata
+from array import array
+from collections import Counter
+from typing import Iterable
+
+
+def fold(term: str) -> str:
+    """Minúsculas e sem acentos/cedilha ("Comunicação" -> "comunicacao")."""
+    decomposed = unicodedata.normalize("NFKD", term.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def trigrams(folded: str) -> set[str]:
+    padded = f"${folded}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Distância de Damerau-Levenshtein (com transposições adjacentes), parando
+    assim que passa de `limit` (devolve limit + 1).
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+def max_edits(folded: str) -> int:
+    """Erros tolerados pelo tamanho do termo."""
+    if len(folded) < 4:
+        return 0
+    return 1 if len(folded) < 8 else 2
+
+
+class TermCorrector:
+    """
+    Termos conhecidos (id, termo) -> correcção de termos desconhecidos para ids.
+    Imutável depois de construído (partilhável entre threads); só a cache
+    de correcções cresce, limitada a cache_size entradas.
+    """
+
+    def __init__(self, terms: Iterable[tuple[int, str]], candidates: int = 20,
+                 min_similarity: float = 0.2, cache_size: int = 4096):
+        self.candidates = candidates
+        self.min_similarity = min_similarity
+        self.cache_size = cache_size
+
+        by_form: dict[str, list[int]] = {}
+        for term_id, term in terms:
+            by_form.setdefault(fold(term), []).append(term_id)
+        self._by_form = by_form
+
+        # Formas dobradas (uma entrada por forma) e trigramas de cada uma,
+        # com postings por tamanho da forma: tamanho -> trigrama -> formas
+        self._forms: list[str] = list(by_form)
+        self._gram_counts = array("H")
+        postings: dict[int, dict[str, array]] = {}
+        for key, form in enumerate(self._forms):
+            grams = trigrams(form)
+            self._gram_counts.append(min(len(grams), 65535))
+            by_gram = postings.setdefault(len(form), {})
+            for gram in grams:
+                plist = by_gram.get(gram)
+                if plist is None:
+                    plist = by_gram[gram] = array("I")
+                plist.append(key)
+        self._postings = postings
+        self._cache: dict[str, tuple[int, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self._forms)
+
+    def correct(self, term: str) -> tuple[int, ...]:
+        """
+        Ids dos termos conhecidos mais próximos (vazio se nenhum está perto o suficiente).
+        """
+        hit = self._cache.get(term)
+        if hit is not None:
+            return hit
+
+        form = fold(term)
+        result = tuple(self._by_form.get(form, ()))
+        if not result:
+            limit = max_edits(form)
+            if limit:
+                result = self._nearest(form, limit)
+
+        if len(self._cache) >= self.cache_size:
+            self._cache.clear()
+        self._cache[term] = result
+        return result
+
+    def _nearest(self, form: str, limit: int) -> tuple[int, ...]:
+        grams = trigrams(form)
+        shared: Counter = Counter()
+        for length in range(len(form) - limit, len(form) + limit + 1):
+            by_gram = self._postings.get(length)
+            if by_gram is None:
+                continue
+            for gram in grams:
+                plist = by_gram.get(gram)
+                if plist is not None:
+                    shared.update(plist)
+        if not shared:
+            return ()
+
+        # Cada erro muda no máximo 4 trigramas (transposição): abaixo disto
+        # nenhum candidato está a `limit` erros de distância
+        n, counts = len(grams), self._gram_counts
+        need = n - 4 * limit
+        # Jaccard entre conjuntos de trigramas; os melhores são confirmados com distância de edição
+        # (empates: menor id primeiro)
+        scored = heapq.nlargest(self.candidates, (
+            (similarity, -key)
+            for key, common in shared.items()
+            if common >= need and (similarity := common / (n + counts[key] - common)) >= self.min_similarity
+        ))
+        forms = self._forms
+
+        best_key, best_distance = None, limit + 1
+        for _, neg_key in scored:
+            key = -neg_key
+            distance = edit_distance(form, forms[key], limit)
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+                if distance == 1:
+                    break
+        if best_key is None:
+            return ()
+        return tuple(self._by_form[forms[best_key]])
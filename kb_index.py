@@ -0,0 +1,499 @@
+"""
+kb_index.py
+-----------
+Índice TF-IDF da base de conhecimento (QAItem), mantido em memória.
+
+Porquê:
+- Antes, cada pergunta ao /chat re-normalizava (spaCy) TODAS as perguntas guardadas.
+- Agora cada pergunta guardada é normalizada uma única vez, quando entra no índice.
+- df/idf, vetores e normas ficam pré-calculados.
+- Depois de alterações (admin, importação, outro worker), um índice novo é construído
+  em segundo plano e publicado de uma vez (adopt; ver index_rebuild.py).
+
+Por pedido ao /chat só é normalizada a pergunta do aluno.
+
+Backends de scoring (escolhidos com KB_INDEX_BACKEND = auto | python | numpy):
+- "python": índice invertido termo -> [(qa_id, peso normalizado)]
+    - só visita itens que partilham pelo menos um lema com a pergunta
+    - top-k com heap limitado (heapq.nlargest)
+    - poda "max-score": quando nem o melhor caso dos termos que faltam chega
+      ao k-ésimo score actual, deixam de entrar candidatos novos
+- "numpy": vocabulário -> coluna + matriz CSR (documentos x termos) normalizada (L2)
+    - uma pergunta = um produto matriz-vetor esparso + argpartition para o top-k
+    - usa scipy.sparse se estiver instalado; senão, np.bincount sobre os arrays CSR
+- "auto": numpy se estiver disponível, senão python
+
+Os dois backends devolvem o mesmo ranking (ver benchmarks/backends.py).
+
+Memória (bases grandes):
+- os lemas são internados num Vocabulary (nlp_utils): cada termo é guardado
+  uma vez e os documentos guardam só ids inteiros em array('I')
+- as listas de postings do backend python são arrays paralelos (ids, pesos)
+  em vez de listas de tuplos
+
+Termos desconhecidos (erros de escrita, acentos em falta): com fuzzy=True, os
+termos da pergunta que não estão no vocabulário são trocados pelos termos
+conhecidos mais próximos (índice de trigramas, ver kb_fuzzy.py) antes do scoring.
+
+Nota:
+- O idf é calculado sobre a base de conhecimento (N = nº de perguntas);
+  a pergunta do aluno já não conta como documento extra.
+"""
+
+import heapq
+import math
+import threading
+from array import array
+from collections import Counter
+from typing import Iterable
+
+from kb_fuzzy import TermCorrector
+from nlp_utils import Vocabulary, normalize, normalize_many, compute_idf, tfidf_vector
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from scipy import sparse
+except ImportError:
+    sparse = None
+
+
+# Score mínimo para aceitar a melhor correspondência (abaixo disto o /chat pede
+# para reformular). Ver benchmarks/quality.py antes de mudar.
+MATCH_THRESHOLD = 0.12
+
+# Vetor esparso já normalizado (L2): id do termo (Vocabulary) -> peso
+UnitVector = dict[int, float]
+
+
+def unit_vector(terms: Iterable[int], idf: dict[int, float],
+                unknown: Iterable[str] = (), unknown_idf: float = 0.0) -> UnitVector:
+    """
+    Vetor TF-IDF com norma 1 (termos com peso 0 são descartados).
+
+    unknown (só na pergunta): termos fora do vocabulário da base. Não pontuam,
+    mas entram na norma com unknown_idf (o de um termo com df=0): uma pergunta
+    longa fora do tema com uma só palavra da base continua com score baixo.
+    """
+    terms = list(terms)
+    vec = tfidf_vector(terms, idf)
+    # Mesma escala de TF que os termos conhecidos (a contagem total inclui os desconhecidos
+    # só através da norma: o factor 1/total é comum e desaparece ao normalizar)
+    scale = 1.0 / max(1, len(terms))
+    extra = sum((c * scale * unknown_idf) ** 2 for c in Counter(unknown).values())
+    norm = math.sqrt(sum(w * w for w in vec.values()) + extra)
+    if norm == 0.0:
+        return {}
+    return {term: w / norm for term, w in vec.items() if w > 0.0}
+
+
+class PythonBackend:
+    """
+    Índice invertido em dicts/listas (sem dependências extra).
+    """
+    name = "python"
+
+    def __init__(self, docs: list[tuple[int, UnitVector]]):
+        # termo -> (qa_ids, pesos) em arrays paralelos (sem um tuplo por entrada)
+        postings: dict[int, tuple[array, array]] = {}
+        for qa_id, vec in docs:
+            for term, w in vec.items():
+                plist = postings.get(term)
+                if plist is None:
+                    plist = postings[term] = (array("I"), array("d"))
+                plist[0].append(qa_id)
+                plist[1].append(w)
+        self._postings = postings
+        self._max_weight = {term: max(weights) for term, (_, weights) in postings.items()}
+
+    def score(self, query_vec: UnitVector, top_k: int) -> list[tuple[int, float]]:
+        postings, max_weight = self._postings, self._max_weight
+
+        # Termos da pergunta presentes no índice, pelo maior contributo possível
+        query = [(term, qw) for term, qw in query_vec.items() if term in postings]
+        query.sort(key=lambda x: x[1] * max_weight[x[0]], reverse=True)
+
+        # remaining[i] = melhor score possível só com os termos i..fim
+        remaining = [0.0] * (len(query) + 1)
+        for i in range(len(query) - 1, -1, -1):
+            term, qw = query[i]
+            remaining[i] = remaining[i + 1] + qw * max_weight[term]
+
+        acc: dict[int, float] = {}
+        for i, (term, qw) in enumerate(query):
+            accept_new = True
+            if len(acc) >= top_k:
+                kth = heapq.nlargest(top_k, acc.values())[-1]
+                accept_new = remaining[i] >= kth
+            for qa_id, dw in zip(*postings[term]):
+                if qa_id in acc:
+                    acc[qa_id] += qw * dw
+                elif accept_new:
+                    acc[qa_id] = qw * dw
+
+        return heapq.nlargest(top_k, acc.items(), key=lambda x: (x[1], -x[0]))
+
+    def score_many(self, query_vecs: list[UnitVector], top_k: int) -> list[list[tuple[int, float]]]:
+        return [self.score(vec, top_k) for vec in query_vecs]
+
+    @classmethod
+    def from_csr(cls, qa_ids, indptr, indices, data) -> "PythonBackend":
+        """
+        A partir dos arrays CSR de um snapshot (colunas = ids de termo).
+        """
+        qa_ids, indptr, indices, data = qa_ids.tolist(), indptr.tolist(), indices.tolist(), data.tolist()
+        docs = [
+            (qa_id, dict(zip(indices[indptr[row]:indptr[row + 1]], data[indptr[row]:indptr[row + 1]])))
+            for row, qa_id in enumerate(qa_ids)
+        ]
+        return cls([d for d in docs if d[1]])
+
+
+class NumpyBackend:
+    """
+    Matriz CSR documentos x termos (linhas com norma 1).
+    Uma linha por qa_id, por ordem crescente de qa_id.
+    """
+    name = "numpy"
+
+    # Nº de perguntas por produto matriz-matriz em score_many (limita a memória)
+    batch_chunk = 256
+
+    def __init__(self, docs: list[tuple[int, UnitVector]]):
+        vocab: dict[str, int] = {}
+        indptr = [0]
+        indices: list[int] = []
+        data: list[float] = []
+        for _, vec in docs:
+            for term, w in vec.items():
+                indices.append(vocab.setdefault(term, len(vocab)))
+                data.append(w)
+            indptr.append(len(indices))
+
+        self.vocab = vocab
+        self.qa_ids = np.array([qa_id for qa_id, _ in docs], dtype=np.int64)
+        self.indptr = np.array(indptr, dtype=np.int64)
+        self.indices = np.array(indices, dtype=np.int32)
+        self.data = np.array(data, dtype=np.float64)
+        self._setup()
+
+    @classmethod
+    def from_csr(cls, qa_ids, indptr, indices, data) -> "NumpyBackend":
+        """
+        A partir dos arrays CSR de um snapshot (colunas = ids de termo).
+        Os arrays são usados tal como estão (sem cópia, ex.: mapeados com mmap).
+        """
+        self = cls.__new__(cls)
+        n_terms = int(indices.max()) + 1 if len(indices) else 0
+        self.vocab = {term: term for term in range(n_terms)}
+        self.qa_ids, self.indptr, self.indices, self.data = qa_ids, indptr, indices, data
+        self._setup()
+        return self
+
+    def _setup(self) -> None:
+        vocab = self.vocab
+        n_docs = len(self.qa_ids)
+        if sparse is not None:
+            self._matrix = sparse.csr_matrix(
+                (self.data, self.indices, self.indptr), shape=(n_docs, max(1, len(vocab)))
+            )
+        else:
+            self._matrix = None
+            # linha de cada elemento não-nulo (para o produto via bincount)
+            self._rows = np.repeat(np.arange(n_docs), np.diff(self.indptr))
+
+    def _query_columns(self, query_vec: UnitVector) -> tuple[list[int], list[float]]:
+        cols, weights = [], []
+        for term, qw in query_vec.items():
+            col = self.vocab.get(term)
+            if col is not None:
+                cols.append(col)
+                weights.append(qw)
+        return cols, weights
+
+    def _top_k(self, scores, top_k: int) -> list[tuple[int, float]]:
+        cand = np.flatnonzero(scores > 0.0)
+        if cand.size > top_k:
+            part = np.argpartition(-scores[cand], top_k - 1)[:top_k]
+            kth = scores[cand[part]].min()
+            # mantém todos os empatados com o k-ésimo, para desempatar por qa_id
+            cand = cand[scores[cand] >= kth]
+        order = np.lexsort((self.qa_ids[cand], -scores[cand]))[:top_k]
+        return [(int(self.qa_ids[cand[i]]), float(scores[cand[i]])) for i in order]
+
+    def score(self, query_vec: UnitVector, top_k: int) -> list[tuple[int, float]]:
+        cols, weights = self._query_columns(query_vec)
+        if not cols:
+            return []
+
+        q = np.zeros(len(self.vocab), dtype=np.float64)
+        q[cols] = weights
+        if self._matrix is not None:
+            scores = self._matrix @ q
+        else:
+            scores = np.bincount(self._rows, weights=self.data * q[self.indices], minlength=len(self.qa_ids))
+        return self._top_k(scores, top_k)
+
+    def score_many(self, query_vecs: list[UnitVector], top_k: int) -> list[list[tuple[int, float]]]:
+        if self._matrix is None:
+            return [self.score(vec, top_k) for vec in query_vecs]
+
+        results = []
+        for start in range(0, len(query_vecs), self.batch_chunk):
+            chunk = query_vecs[start:start + self.batch_chunk]
+            indptr, indices, data = [0], [], []
+            for vec in chunk:
+                cols, weights = self._query_columns(vec)
+                indices.extend(cols)
+                data.extend(weights)
+                indptr.append(len(indices))
+            queries = sparse.csr_matrix((data, indices, indptr), shape=(len(chunk), self._matrix.shape[1]))
+            scores = (queries @ self._matrix.T).toarray()
+            results.extend(self._top_k(row, top_k) for row in scores)
+        return results
+
+
+BACKENDS = {"python": PythonBackend, "numpy": NumpyBackend}
+
+
+def resolve_backend(name: str) -> type:
+    """
+    "auto" -> numpy se disponível, senão python.
+    Pedir "numpy" sem NumPy instalado cai para python.
+    """
+    name = (name or "auto").lower()
+    if name not in ("auto", *BACKENDS):
+        raise ValueError(f"Backend de índice desconhecido: {name}")
+    if name in ("auto", "numpy") and np is not None:
+        return NumpyBackend
+    return PythonBackend
+
+
+class KBIndex:
+    """
+    Índice qa_id -> termos normalizados, construído de uma vez (build) ou
+    carregado de um snapshot (restore); nunca alterado item a item: depois de
+    uma mudança na base, um índice novo substitui-o (adopt).
+
+    - Os termos (parte cara: spaCy) são guardados por documento.
+    - idf e a estrutura de scoring (backend) são calculados (sem spaCy)
+      na primeira consulta depois de build (ou antes, com refresh()).
+    """
+
+    def __init__(self, backend: str = "auto", fuzzy: bool = True):
+        self.backend_cls = resolve_backend(backend)
+        self.fuzzy = fuzzy
+
+        # Versão da base de conhecimento (KBVersion) a que o índice corresponde (definida pela app)
+        self.stamp = None
+
+        self._lock = threading.RLock()
+        # Termos de cada documento como ids do vocabulário (array('I'))
+        self._vocab = Vocabulary()
+        self._terms: dict[int, array] = {}
+        self._df: Counter = Counter()
+
+        # Dados derivados (vocabulário, idf, backend), recalculados quando _dirty
+        # e publicados num único tuplo
+        self._dirty = True
+        self._view: tuple[Vocabulary, dict[int, float], object] = (self._vocab, {}, self.backend_cls([]))
+
+        # Índice restaurado de um snapshot: arrays CSR (qa_ids, indptr, indices, data)
+        # em vez de termos por documento
+        self._snapshot_docs = None
+
+        # (idf, TermCorrector) do vocabulário publicado; construído no primeiro uso
+        self._fuzzy: tuple[dict[int, float], TermCorrector] | None = None
+
+    def __len__(self) -> int:
+        if self._snapshot_docs is not None:
+            return len(self._snapshot_docs[0])
+        return len(self._terms)
+
+    @property
+    def backend(self) -> str:
+        return self.backend_cls.name
+
+    # -------------------------
+    # Manutenção
+    # -------------------------
+    def build(self, items: Iterable[tuple[int, str]]) -> None:
+        """
+        (Re)constrói o índice completo a partir de pares (qa_id, pergunta).
+        As perguntas são normalizadas em lote (nlp.pipe).
+        """
+        items = list(items)
+        vocab = Vocabulary()
+        terms = {
+            qa_id: vocab.encode(doc_terms)
+            for qa_id, doc_terms in zip((qa_id for qa_id, _ in items), normalize_many([q for _, q in items]))
+        }
+        df = Counter()
+        for doc_terms in terms.values():
+            df.update(set(doc_terms))
+
+        with self._lock:
+            self._vocab = vocab
+            self._terms = terms
+            self._df = df
+            self._snapshot_docs = None
+            self._dirty = True
+
+    def refresh(self) -> tuple[Vocabulary, dict[int, float], object]:
+        """
+        Calcula idf e o backend (sem spaCy), se ainda não estão calculados.
+        Chamado na primeira consulta depois de build(), ou antecipadamente
+        (ex.: no master do gunicorn, antes do fork dos workers).
+        O novo estado só é publicado no fim (troca de um único tuplo),
+        para que consultas em curso continuem a ver um estado consistente.
+        """
+        with self._lock:
+            if self._dirty:
+                idf = compute_idf(self._df, len(self._terms))
+                docs = [(qa_id, unit_vector(self._terms[qa_id], idf)) for qa_id in sorted(self._terms)]
+                self._view = (self._vocab, idf, self.backend_cls([d for d in docs if d[1]]))
+                self._dirty = False
+            return self._view
+
+    # -------------------------
+    # Snapshot (ver kb_snapshot.py)
+    # -------------------------
+    def to_arrays(self) -> dict:
+        """
+        Estado do índice em arrays NumPy, CSR com colunas = ids de termo:
+        qa_ids, indptr, indices, data (pesos normalizados),
+        idf por id de termo e a lista de termos do vocabulário.
+        """
+        with self._lock:
+            vocab, idf, _ = self.refresh()
+            if self._snapshot_docs is not None:
+                qa_ids, indptr, indices, data = self._snapshot_docs
+            else:
+                ids_, indptr, indices, data = [], [0], [], []
+                for qa_id in sorted(self._terms):
+                    vec = unit_vector(self._terms[qa_id], idf)
+                    for term in sorted(vec):
+                        indices.append(term)
+                        data.append(vec[term])
+                    ids_.append(qa_id)
+                    indptr.append(len(indices))
+                qa_ids = np.array(ids_, dtype=np.int64)
+                indptr = np.array(indptr, dtype=np.int64)
+                indices = np.array(indices, dtype=np.int32)
+                data = np.array(data, dtype=np.float64)
+            return {
+                "terms": list(vocab.terms),
+                "idf": np.array([idf.get(t, 0.0) for t in range(len(vocab))], dtype=np.float64),
+                "qa_ids": qa_ids, "indptr": indptr, "indices": indices, "data": data,
+            }
+
+    def restore(self, arrays: dict, stamp: int) -> None:
+        """
+        Substitui o índice pelo de um snapshot (arrays de to_arrays(), possivelmente
+        mapeados com mmap). Pronto a responder sem spaCy e sem ler os QAItem.
+        """
+        vocab = Vocabulary(arrays["terms"])
+        idf = {t: w for t, w in enumerate(arrays["idf"].tolist()) if w > 0.0}
+        docs = (arrays["qa_ids"], arrays["indptr"], arrays["indices"], arrays["data"])
+        backend = self.backend_cls.from_csr(*docs)
+        with self._lock:
+            self._vocab = vocab
+            self._terms = {}
+            self._df = Counter()
+            self._snapshot_docs = docs
+            self._view = (vocab, idf, backend)
+            self._dirty = False
+            self.stamp = stamp
+
+    def adopt(self, other: "KBIndex") -> None:
+        """
+        Passa a servir o estado de other (construído à parte, ex.: noutro thread;
+        ver index_rebuild.py). O trabalho caro (build/refresh) é feito em other;
+        aqui só se trocam referências, e consultas em curso terminam com o tuplo antigo.
+        """
+        view = other.refresh()
+        with other._lock:
+            state = (other._vocab, other._terms, other._df, other._snapshot_docs, other._fuzzy, other.stamp)
+        with self._lock:
+            self._vocab, self._terms, self._df, self._snapshot_docs, self._fuzzy, stamp = state
+            self._view = view
+            self._dirty = False
+            self.stamp = stamp
+
+    # -------------------------
+    # Consulta
+    # -------------------------
+    def query(self, user_question: str, top_k: int = 3) -> list[tuple[int, float]]:
+        """
+        Faz matching da pergunta do aluno contra o índice.
+        Retorna:
+          - lista de tuplos (qa_id, score) ordenada por score desc
+            (só itens com score > 0; empates por qa_id asc)
+        """
+        return self.query_terms(normalize(user_question), top_k=top_k)
+
+    def corrector(self) -> TermCorrector | None:
+        """
+        Índice de trigramas dos termos do índice publicado (com idf), para corrigir
+        termos desconhecidos. Construído no primeiro uso após cada mudança; pode
+        ser pedido antecipadamente (reconstrução em segundo plano, master do gunicorn).
+        """
+        if not self.fuzzy:
+            return None
+        vocab, idf, _ = self.refresh() if self._dirty else self._view
+        return self._corrector_for(vocab, idf)
+
+    def _corrector_for(self, vocab: Vocabulary, idf: dict[int, float]) -> TermCorrector:
+        # Chave = o dict idf da vista (novo a cada refresh/restore/adopt): os ids
+        # devolvidos são sempre do mesmo vocabulário que a consulta está a usar
+        fuzzy = self._fuzzy
+        if fuzzy is None or fuzzy[0] is not idf:
+            with self._lock:
+                fuzzy = self._fuzzy
+                if fuzzy is None or fuzzy[0] is not idf:
+                    fuzzy = self._fuzzy = (idf, TermCorrector((t, vocab.term(t)) for t in idf))
+        return fuzzy[1]
+
+    def _query_vector(self, vocab: Vocabulary, idf: dict[int, float], terms: list[str]) -> UnitVector:
+        """
+        Vetor da pergunta: termos -> ids; os desconhecidos passam pelo corrector (se fuzzy)
+        e os que continuam sem correspondência contam só para a norma (ver unit_vector).
+        """
+        ids, unknown = [], []
+        corrector = None
+        for term in terms:
+            term_id = vocab.get(term)
+            if term_id is not None and term_id in idf:
+                ids.append(term_id)
+                continue
+            if self.fuzzy:
+                corrector = corrector or self._corrector_for(vocab, idf)
+                corrected = corrector.correct(term)
+                if corrected:
+                    ids.extend(corrected)
+                    continue
+            unknown.append(term)
+        # idf suavizado de um termo que nenhuma pergunta da base tem: log((N + 1) / 1) + 1
+        return unit_vector(ids, idf, unknown, math.log(len(self) + 1) + 1.0)
+
+    def query_terms(self, terms: list[str], top_k: int = 3) -> list[tuple[int, float]]:
+        """
+        Igual a query(), mas recebe os termos já normalizados.
+        """
+        vocab, idf, backend = self.refresh() if self._dirty else self._view
+        query_vec = self._query_vector(vocab, idf, terms)
+        if not query_vec:
+            return []
+        return backend.score(query_vec, max(1, top_k))
+
+    def query_many(self, user_questions: list[str], top_k: int = 3) -> list[list[tuple[int, float]]]:
+        """
+        Versão em lote de query(): uma lista de resultados por pergunta.
+        No backend numpy as perguntas são pontuadas em bloco (matriz x matriz).
+        """
+        vocab, idf, backend = self.refresh() if self._dirty else self._view
+        query_vecs = [self._query_vector(vocab, idf, terms) for terms in normalize_many(user_questions)]
+        return backend.score_many(query_vecs, max(1, top_k))
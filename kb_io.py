@@ -0,0 +1,178 @@
+"""
+kb_io.py
+--------
+Importação/exportação em massa da base de conhecimento (QAItem).
+
+Formatos:
+- CSV com cabeçalho: question,answer (ou pergunta,resposta)
+- JSONL: um objecto por linha {"question": "...", "answer": "..."}
+
+Importação:
+- leitura em streaming (linha a linha, sem carregar o ficheiro todo)
+- inserção em lotes (executemany) com um commit por lote
+- ignora perguntas repetidas (já existentes na BD ou repetidas no ficheiro)
+- ficheiro que não está em UTF-8 ou CSV ilegível: a leitura pára, os lotes anteriores
+  ficam gravados e o erro (com a linha) vai para o relatório
+- o índice é reconstruído uma única vez, no fim (pela app)
+
+Usado pela rota /admin/qa/import e pelos comandos:
+  flask --app app import-qa perguntas.csv
+  flask --app app export-qa perguntas.jsonl
+"""
+
+import csv
+import io
+import json
+from dataclasses import dataclass, field
+from typing import IO, Iterator
+
+from sqlalchemy import insert, select
+
+from models import db, QAItem, KBVersion
+
+FORMATS = ("csv", "jsonl")
+
+# Mesmo mínimo do QAForm
+MIN_LENGTH = 3
+
+QUESTION_KEYS = ("question", "pergunta")
+ANSWER_KEYS = ("answer", "resposta")
+
+
+@dataclass
+class ImportReport:
+    inserted: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    errors: list[str] = field(default_factory=list)
+
+    def summary(self) -> str:
+        return (
+            f"{self.inserted} inseridos, {self.duplicates} repetidos ignorados, "
+            f"{self.invalid} inválidos"
+        )
+
+
+def detect_format(filename: str) -> str:
+    ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    if ext == "json":
+        ext = "jsonl"
+    if ext not in FORMATS:
+        raise ValueError(f"Formato não suportado: '{filename}' (usa .csv ou .jsonl)")
+    return ext
+
+
+def question_key(question: str) -> str:
+    """
+    Chave de deduplicação: minúsculas e espaços colapsados.
+    """
+    return " ".join(question.lower().split())
+
+
+def _pick(record: dict, keys: tuple[str, ...]) -> str:
+    for key in keys:
+        value = record.get(key)
+        if value is not None:
+            return str(value).strip()
+    return ""
+
+
+def iter_records(stream: IO[str], fmt: str) -> Iterator[tuple[int, dict]]:
+    """
+    Lê o ficheiro em streaming. Devolve (nº da linha, registo).
+    Linhas JSON mal formadas devolvem um registo vazio (contado como inválido).
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, {(k or "").strip().lower(): v for k, v in record.items()}
+    elif fmt == "jsonl":
+        for line_no, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield line_no, record if isinstance(record, dict) else {}
+    else:
+        raise ValueError(f"Formato não suportado: {fmt}")
+
+
+def import_qa(stream: IO[str], fmt: str, chunk_size: int = 500) -> ImportReport:
+    """
+    Importa pares pergunta/resposta em lotes de chunk_size (um commit por lote).
+    Erros de leitura (codificação, CSV mal formado) interrompem a importação e
+    ficam no relatório; as linhas lidas até aí são gravadas.
+    """
+    report = ImportReport()
+
+    seen = {question_key(q) for q in db.session.execute(select(QAItem.question)).scalars()}
+
+    chunk: list[dict] = []
+    line_no = 0
+    try:
+        for line_no, record in iter_records(stream, fmt):
+            question = _pick(record, QUESTION_KEYS)
+            answer = _pick(record, ANSWER_KEYS)
+            if len(question) < MIN_LENGTH or len(answer) < MIN_LENGTH:
+                report.invalid += 1
+                if len(report.errors) < 20:
+                    report.errors.append(f"linha {line_no}: pergunta/resposta em falta ou demasiado curta")
+                continue
+
+            key = question_key(question)
+            if key in seen:
+                report.duplicates += 1
+                continue
+            seen.add(key)
+
+            chunk.append({"question": question, "answer": answer})
+            if len(chunk) >= chunk_size:
+                _insert_chunk(chunk, report)
+    # Em primeiro lugar no relatório (a rota só mostra os primeiros erros)
+    except UnicodeDecodeError:
+        # O texto é descodificado em blocos: só se sabe que as linhas até line_no estavam bem
+        where = f"depois da linha {line_no}: " if line_no else ""
+        report.errors.insert(0, f"{where}o ficheiro não está em UTF-8 (grava-o como UTF-8); importação interrompida")
+    except csv.Error as exc:
+        report.errors.insert(0, f"linha {line_no + 1}: CSV mal formado ({exc}); importação interrompida")
+
+    if chunk:
+        _insert_chunk(chunk, report)
+    return report
+
+
+def _insert_chunk(chunk: list[dict], report: ImportReport) -> None:
+    db.session.execute(insert(QAItem), chunk)
+    KBVersion.bump()
+    db.session.commit()
+    report.inserted += len(chunk)
+    chunk.clear()
+
+
+def export_qa(fmt: str, chunk_size: int = 500) -> Iterator[str]:
+    """
+    Exporta a base de conhecimento em streaming (para Response ou ficheiro).
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato não suportado: {fmt}")
+
+    rows = db.session.execute(
+        select(QAItem.question, QAItem.answer).order_by(QAItem.id).execution_options(yield_per=chunk_size)
+    )
+
+    if fmt == "csv":
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(["question", "answer"])
+        for question, answer in rows:
+            writer.writerow([question, answer])
+            if buf.tell() > 64 * 1024:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        yield buf.getvalue()
+    else:
+        for question, answer in rows:
+            yield json.dumps({"question": question, "answer": answer}, ensure_ascii=False) + "\n"
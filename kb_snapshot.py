@@ -0,0 +1,146 @@
+"""
+kb_snapshot.py
+--------------
+Snapshot binário do índice TF-IDF (KBIndex) em disco, junto de instance/app.db.
+
+Sem snapshot, cada worker que arranca (ou reinicia) tem de ler todos os QAItem
+e normalizá-los (spaCy ou cache de lemas) antes de responder.
+Com snapshot, o índice é carregado com mmap:
+- os arrays grandes (CSR, ids, idf) não são copiados: o NumPy lê directamente
+  do ficheiro mapeado, e as páginas ficam na page cache, partilhadas entre processos
+- só o vocabulário (strings) é descodificado
+
+Validade:
+- kb_version: versão da base de conhecimento (KBVersion) do índice guardado;
+  se não for a da BD, o snapshot é ignorado e o índice reconstruído
+- db: token da BD que o produziu (KBVersion.identity); outra BD na mesma versão
+  (DATABASE_URL diferente, BD recriada pelo seed) não usa este snapshot
+- model: modelo/pipeline spaCy (model_fingerprint) que produziu os lemas
+
+Escrita atómica: ficheiro temporário + os.replace (quem lê vê o snapshot
+antigo ou o novo, nunca um ficheiro a meio).
+
+Formato (little-endian):
+  MAGIC (8 bytes) | tamanho do cabeçalho (uint32) | cabeçalho JSON | secções alinhadas a 8 bytes
+"""
+
+import json
+import mmap
+import os
+import struct
+
+from kb_index import KBIndex, np
+from nlp_utils import model_fingerprint
+
+MAGIC = b"CPEKBIX1"
+# 2: sem a secção "counts" (TF bruto, só servia para alterações incrementais ao índice)
+FORMAT_VERSION = 2
+
+# Secções numéricas: nome -> dtype
+SECTIONS = {
+    "qa_ids": "<i8",
+    "indptr": "<i8",
+    "indices": "<i4",
+    "data": "<f8",
+    "idf": "<f8",
+    "vocab_offsets": "<i8",
+    "vocab_blob": "u1",
+}
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def write_snapshot(kb: KBIndex, path: str, kb_version: int, db_token: str | None = None) -> None:
+    """
+    Grava o estado actual do índice (escrita atómica).
+    """
+    if np is None:
+        return
+    arrays = kb.to_arrays()
+    encoded = [t.encode("utf-8") for t in arrays.pop("terms")]
+    arrays["vocab_offsets"] = np.cumsum([0] + [len(b) for b in encoded], dtype=np.int64)
+    arrays["vocab_blob"] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+    # Offsets relativos ao início da zona de dados
+    sections, offset = {}, 0
+    for name, dtype in SECTIONS.items():
+        arr = np.ascontiguousarray(arrays[name], dtype=dtype)
+        arrays[name] = arr
+        sections[name] = [offset, len(arr)]
+        offset = _align(offset + arr.nbytes)
+
+    header = json.dumps({
+        "format": FORMAT_VERSION,
+        "kb_version": kb_version,
+        "db": db_token,
+        "model": model_fingerprint(),
+        "sections": sections,
+    }).encode("utf-8")
+    data_start = _align(len(MAGIC) + 4 + len(header))
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(MAGIC + struct.pack("<I", len(header)) + header)
+            for name in SECTIONS:
+                f.seek(data_start + sections[name][0])
+                f.write(arrays[name].tobytes())
+            f.truncate(data_start + offset)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _read_header(f) -> dict | None:
+    try:
+        if f.read(len(MAGIC)) != MAGIC:
+            return None
+        (size,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(size))
+    except (ValueError, struct.error):
+        return None
+    header["data_start"] = _align(len(MAGIC) + 4 + size)
+    return header
+
+
+def load_snapshot(kb: KBIndex, path: str, kb_version: int, db_token: str | None = None) -> bool:
+    """
+    Carrega o snapshot para kb se for da versão kb_version, da BD db_token e do modelo actual.
+    Devolve False (e não mexe no índice) se não existir ou não servir.
+    """
+    if np is None:
+        return False
+    try:
+        with open(path, "rb") as f:
+            header = _read_header(f)
+            if (
+                header is None
+                or header.get("format") != FORMAT_VERSION
+                or header.get("kb_version") != kb_version
+                or header.get("db") != db_token
+                or header.get("model") != model_fingerprint()
+            ):
+                return False
+            # Mesmo descritor do cabeçalho: um os.replace concorrente não mistura ficheiros.
+            # O mapeamento continua válido depois de fechar o ficheiro.
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return False
+
+    start = header["data_start"]
+    arrays = {
+        name: np.frombuffer(mapped, dtype=dtype, count=header["sections"][name][1],
+                            offset=start + header["sections"][name][0])
+        for name, dtype in SECTIONS.items()
+    }
+    blob = arrays.pop("vocab_blob").tobytes()
+    offsets = arrays.pop("vocab_offsets").tolist()
+    arrays["terms"] = [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+    kb.restore(arrays, stamp=kb_version)
+    return True
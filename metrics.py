@@ -0,0 +1,182 @@
+"""
+metrics.py
+----------
+Métricas de desempenho em memória (por processo), sem dependências externas:
+- tempos por etapa (normalize, match, db, render, ...): amostra de reservatório
+  com quantis p50/p95/p99, mais contagem e soma
+- contadores e gauges (tamanho da base, tempo de construção do índice, caches)
+
+Exposição:
+- /metrics em formato de texto do Prometheus (ver app.py)
+- cabeçalho Server-Timing opcional por pedido (SERVER_TIMING=1), visível
+  no separador "Network" do browser
+
+Nota: com vários workers do gunicorn, cada processo tem as suas métricas
+(o /metrics responde com as do worker que atendeu o pedido).
+"""
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+from flask import g, has_request_context
+from sqlalchemy import event
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Reservoir:
+    """
+    Amostra uniforme de tamanho fixo (algoritmo R) de todas as observações:
+    memória constante, quantis aproximados.
+    """
+
+    def __init__(self, size: int = 1024):
+        self.size = size
+        self.count = 0
+        self.total = 0.0
+        self.samples: list[float] = []
+        self._rng = random.Random()
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        if len(self.samples) < self.size:
+            self.samples.append(value)
+        else:
+            i = self._rng.randrange(self.count)
+            if i < self.size:
+                self.samples[i] = value
+
+    def quantiles(self, qs=QUANTILES) -> dict[float, float]:
+        if not self.samples:
+            return {q: 0.0 for q in qs}
+        ordered = sorted(self.samples)
+        last = len(ordered) - 1
+        return {q: ordered[min(last, int(q * len(ordered)))] for q in qs}
+
+
+class Metrics:
+    """
+    Registo de métricas de um processo (thread-safe).
+    """
+
+    def __init__(self, prefix: str = "cpe", reservoir_size: int = 1024):
+        self.prefix = prefix
+        self.reservoir_size = reservoir_size
+        self._timings: dict[str, Reservoir] = {}
+        self._counters: dict[str, float] = {}
+        self._gauges: dict[str, float] = {}
+        self._callbacks: dict[str, tuple[str, str, Callable[[], float]]] = {}
+        self._lock = threading.Lock()
+
+    # ---- tempos ----
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            reservoir = self._timings.get(stage)
+            if reservoir is None:
+                reservoir = self._timings[stage] = Reservoir(self.reservoir_size)
+            reservoir.add(seconds)
+        # Acumula também para o Server-Timing do pedido actual
+        if has_request_context():
+            timings = g.setdefault("server_timing", {})
+            timings[stage] = timings.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def timer(self, stage: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - t0)
+
+    # ---- contadores / gauges ----
+    def inc(self, name: str, value: float = 1.0) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0.0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        with self._lock:
+            self._gauges[name] = value
+
+    def register(self, name: str, kind: str, help_text: str, fn: Callable[[], float]) -> None:
+        """
+        Valor lido só no momento do /metrics (ex.: hits de uma cache).
+        kind: "counter" ou "gauge".
+        """
+        self._callbacks[name] = (kind, help_text, fn)
+
+    # ---- exposição ----
+    def snapshot(self) -> dict:
+        with self._lock:
+            timings = {
+                stage: {"count": r.count, "sum": r.total, **{f"p{int(q * 100)}": v for q, v in r.quantiles().items()}}
+                for stage, r in self._timings.items()
+            }
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+        for name, (kind, _, fn) in self._callbacks.items():
+            try:
+                value = float(fn())
+            except Exception:
+                continue
+            (counters if kind == "counter" else gauges)[name] = value
+        return {"timings": timings, "counters": counters, "gauges": gauges}
+
+    def render_prometheus(self) -> str:
+        """
+        Formato de texto do Prometheus (versão 0.0.4).
+        """
+        snap = self.snapshot()
+        p = self.prefix
+        lines = [
+            f"# HELP {p}_stage_seconds Duração por etapa (quantis de uma amostra de reservatório)",
+            f"# TYPE {p}_stage_seconds summary",
+        ]
+        for stage, t in sorted(snap["timings"].items()):
+            for q in QUANTILES:
+                lines.append(f'{p}_stage_seconds{{stage="{stage}",quantile="{q}"}} {t[f"p{int(q * 100)}"]:.6f}')
+            lines.append(f'{p}_stage_seconds_sum{{stage="{stage}"}} {t["sum"]:.6f}')
+            lines.append(f'{p}_stage_seconds_count{{stage="{stage}"}} {t["count"]}')
+
+        helps = {name: help_text for name, (_, help_text, _) in self._callbacks.items()}
+        for kind, values in (("counter", snap["counters"]), ("gauge", snap["gauges"])):
+            for name, value in sorted(values.items()):
+                metric = f"{p}_{name}"
+                if name in helps:
+                    lines.append(f"# HELP {metric} {helps[name]}")
+                lines.append(f"# TYPE {metric} {kind}")
+                lines.append(f"{metric} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+def server_timing_header() -> str | None:
+    """
+    Valor do cabeçalho Server-Timing com as etapas medidas neste pedido (ms).
+    """
+    timings = g.get("server_timing")
+    if not timings:
+        return None
+    return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in timings.items())
+
+
+def install_db_timing(engine, metrics: Metrics) -> None:
+    """
+    Mede todas as instruções SQL do engine (etapa "db") via eventos do SQLAlchemy.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        metrics.observe("db", time.perf_counter() - conn.info["query_start"].pop())
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        conn = context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
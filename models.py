@@ -4,13 +4,17 @@ models.py
 Modelos de base de dados (SQLAlchemy) para:
 - Utilizadores (User)
 - Perguntas/Respostas (QAItem)
-- Histórico de conversas (ChatMessage)
+- Histórico de conversas (ChatMessage) e arquivo comprimido (ChatArchive)
+- Versão da base de conhecimento (KBVersion)
 
 SQLite é usado via SQLAlchemy (embutido).
 """
 
+import secrets
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import and_, event, inspect, or_, select, text, update
+from sqlalchemy.exc import DBAPIError, IntegrityError
 from flask_login import UserMixin
 
 db = SQLAlchemy()
@@ -42,12 +46,84 @@ class QAItem(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
 
+class KBVersion(db.Model):
+    """
+    Contador de versão da base de conhecimento (uma única linha, id=1).
+    Incrementado na MESMA transacção de cada criação/edição/eliminação de QA,
+    para invalidar o índice dos workers (também noutros nós com a mesma BD)
+    e a cache de respostas.
+
+    token: identificador aleatório desta BD (criado uma vez). Duas BD diferentes
+    podem estar na mesma versão; o token distingue-as (ex.: snapshot do índice).
+    """
+    __tablename__ = "kb_version"
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    token = db.Column(db.String(32), nullable=True)
+
+    @classmethod
+    def ensure(cls) -> None:
+        """Cria a linha do contador e o token da BD, se ainda não existirem."""
+        columns = {c["name"] for c in inspect(db.engine).get_columns(cls.__tablename__)}
+        if "token" not in columns:
+            # BD criada antes da coluna: db.create_all() não altera tabelas existentes
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {cls.__tablename__} ADD COLUMN token VARCHAR(32)"))
+            except DBAPIError:
+                pass  # outro worker acabou de a criar
+        if db.session.get(cls, 1) is None:
+            db.session.add(cls(id=1, version=0, token=secrets.token_hex(16)))
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # Outro nó/worker criou a linha entre o get e o commit (BD nova partilhada)
+                db.session.rollback()
+        # Só o primeiro UPDATE preenche o token (workers a arrancar ao mesmo tempo)
+        db.session.execute(
+            update(cls).where(cls.id == 1, cls.token.is_(None)).values(token=secrets.token_hex(16))
+        )
+        db.session.commit()
+
+    @classmethod
+    def identity(cls) -> str | None:
+        """Token desta BD."""
+        return db.session.execute(select(cls.token).where(cls.id == 1)).scalar_one_or_none()
+
+    @classmethod
+    def state(cls) -> tuple[int, str | None]:
+        """(versão, token) numa só consulta (chave da cache de respostas)."""
+        row = db.session.execute(select(cls.version, cls.token).where(cls.id == 1)).one_or_none()
+        return (row[0] or 0, row[1]) if row is not None else (0, None)
+
+    @classmethod
+    def current(cls) -> int:
+        return db.session.execute(select(cls.version).where(cls.id == 1)).scalar_one_or_none() or 0
+
+    @classmethod
+    def bump(cls) -> int:
+        """
+        Incrementa o contador (UPDATE atómico, sem ler-e-escrever) e devolve a nova versão.
+        Não faz commit: o chamador faz commit junto com a alteração aos QA.
+        """
+        db.session.execute(update(cls).where(cls.id == 1).values(version=cls.version + 1))
+        return cls.current()
+
+
 class ChatMessage(db.Model):
     """
     Mensagens do histórico.
     role: "user" ou "assistant"
+
+    Paginação por cursor (keyset) em (user_id, created_at, id):
+    cada página continua "antes" da última mensagem vista, sem OFFSET,
+    por isso o custo não cresce com o tamanho do histórico.
     """
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        db.Index("ix_chat_messages_user_created_id", "user_id", "created_at", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
@@ -58,3 +134,92 @@ class ChatMessage(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
     user = db.relationship("User", backref="messages")
+
+    def cursor(self) -> str:
+        """Cursor opaco desta mensagem (para pedir a página anterior)."""
+        return f"{self.created_at.isoformat()}_{self.id}"
+
+    @staticmethod
+    def parse_cursor(cursor: str) -> tuple[datetime, int]:
+        """Inverso de cursor(). ValueError se o cursor for inválido."""
+        created_at, _, msg_id = cursor.rpartition("_")
+        return datetime.fromisoformat(created_at), int(msg_id)
+
+    @classmethod
+    def page(cls, user_id: int, before: str | None = None, limit: int = 50) -> tuple[list["ChatMessage"], str | None]:
+        """
+        Página de mensagens do utilizador, da mais recente para a mais antiga,
+        estritamente anteriores ao cursor `before` (ou as últimas, se None).
+        Retorna (mensagens por ordem cronológica, cursor da página anterior ou None).
+        """
+        query = cls.query.filter(cls.user_id == user_id)
+        if before:
+            created_at, msg_id = cls.parse_cursor(before)
+            query = query.filter(or_(
+                cls.created_at < created_at,
+                and_(cls.created_at == created_at, cls.id < msg_id),
+            ))
+
+        rows = query.order_by(cls.created_at.desc(), cls.id.desc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        older = rows[-1].cursor() if has_more else None
+        rows.reverse()
+        return rows, older
+
+
+class ChatArchive(db.Model):
+    """
+    Mensagens antigas arquivadas (ver chat_archive.py): um bloco JSONL comprimido
+    com gzip por utilizador e mês. Cada execução do arquivo acrescenta blocos novos
+    (sem reescrever os anteriores); o mês lê-se juntando os blocos.
+    """
+    __tablename__ = "chat_archives"
+    __table_args__ = (
+        db.Index("ix_chat_archives_user_month", "user_id", "month"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    month = db.Column(db.String(7), nullable=False)  # "AAAA-MM" (UTC)
+
+    first_at = db.Column(db.DateTime, nullable=False)
+    last_at = db.Column(db.DateTime, nullable=False)
+    message_count = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.LargeBinary, nullable=False)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    @classmethod
+    def months(cls, user_id: int) -> list[str]:
+        """Meses arquivados do utilizador, do mais recente para o mais antigo (sem ler os blocos)."""
+        return list(db.session.execute(
+            select(cls.month).where(cls.user_id == user_id).distinct().order_by(cls.month.desc())
+        ).scalars())
+
+
+def ensure_indexes() -> None:
+    """
+    db.create_all() não cria índices novos em tabelas que já existem:
+    cria os que faltarem (ex.: BD criada antes do índice composto).
+    """
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+
+def install_sqlite_pragmas(engine, pragmas: dict[str, object]) -> None:
+    """
+    Aplica PRAGMAs a cada nova ligação SQLite (evento "connect" do engine).
+    Tem de ser chamado antes da primeira ligação (antes do create_all).
+    Noutros motores de BD não faz nada.
+    """
+    if engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
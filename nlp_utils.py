@@ -15,13 +15,258 @@ Nota:
 - Roda bem em computador fraco.
 """
 
+import hashlib
+import json
 import math
-from collections import Counter
-import spacy
+import os
+import sqlite3
+import threading
+from array import array
+from collections import Counter, OrderedDict
+from typing import Iterable
 
-# Carrega modelo português (pequeno e leve)
+# Modelo português (pequeno e leve), carregado só no primeiro uso (get_nlp)
 # Certifica-te que instalaste: python -m spacy download pt_core_news_sm
-NLP = spacy.load("pt_core_news_sm")
+SPACY_MODEL = os.environ.get("SPACY_MODEL", "pt_core_news_sm")
+
+# normalize() só precisa de tokens, lemas e stopwords:
+# parser e NER não são carregados (SPACY_EXCLUDE="" carrega o pipeline completo)
+SPACY_EXCLUDE = [c.strip() for c in os.environ.get("SPACY_EXCLUDE", "parser,ner").split(",") if c.strip()]
+
+# nlp.pipe em normalize_many(): textos por lote e nº de processos
+NLP_BATCH_SIZE = int(os.environ.get("NLP_BATCH_SIZE", "256"))
+NLP_N_PROCESS = int(os.environ.get("NLP_N_PROCESS", "1"))
+
+_NLP = None
+_NLP_LOCK = threading.Lock()
+_FINGERPRINT: str | None = None
+
+
+def get_nlp():
+    """
+    Devolve o pipeline spaCy, carregando-o (uma vez) no primeiro uso.
+    Importar este módulo (ou a app) já não paga o custo de carregar o modelo.
+    """
+    global _NLP
+    if _NLP is None:
+        with _NLP_LOCK:
+            if _NLP is None:
+                import spacy
+                _NLP = spacy.load(SPACY_MODEL, exclude=SPACY_EXCLUDE)
+    return _NLP
+
+
+def configure_nlp(model: str | None = None, exclude: list[str] | None = None) -> None:
+    """
+    Escolhe o modelo e os componentes excluídos.
+    Se o pipeline já estiver carregado com outra configuração, é recarregado no próximo uso.
+    """
+    global SPACY_MODEL, SPACY_EXCLUDE, _NLP, _FINGERPRINT
+    with _NLP_LOCK:
+        new_model = model or SPACY_MODEL
+        new_exclude = list(exclude) if exclude is not None else SPACY_EXCLUDE
+        if (new_model, new_exclude) != (SPACY_MODEL, SPACY_EXCLUDE):
+            SPACY_MODEL, SPACY_EXCLUDE = new_model, new_exclude
+            _NLP = None
+            _FINGERPRINT = None
+
+
+def model_fingerprint() -> str:
+    """
+    Identifica modelo + versão + componentes excluídos, sem carregar o modelo.
+    """
+    global _FINGERPRINT
+    if _FINGERPRINT is None:
+        try:
+            from spacy.util import get_package_version
+            version = get_package_version(SPACY_MODEL)
+        except ImportError:
+            version = None
+        _FINGERPRINT = f"{SPACY_MODEL}-{version}|exclude={','.join(sorted(SPACY_EXCLUDE))}"
+    return _FINGERPRINT
+
+
+class NormalizeCache:
+    """
+    Cache LRU (thread-safe) de normalize(): texto -> tuplo de lemas.
+    A chave é o texto já em minúsculas e sem espaços nas pontas.
+    maxsize = 0 desactiva a cache.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[str, tuple[str, ...]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> tuple[str, ...] | None:
+        with self._lock:
+            terms = self._data.get(key)
+            if terms is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return terms
+
+    def put(self, key: str, terms: tuple[str, ...]) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = terms
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def resize(self, maxsize: int) -> None:
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._data) > max(0, maxsize):
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
+
+
+class PersistentNormalizeCache:
+    """
+    Segundo nível da cache, em SQLite: hash do texto -> lista de lemas (JSON).
+    Sobrevive a reinícios dos workers (gunicorn) e é partilhada entre eles.
+
+    O hash inclui o nome/versão do modelo spaCy e os componentes excluídos,
+    para que uma mudança de modelo não devolva lemas antigos.
+
+    Limitada a maxsize entradas: a cada prune_every escritas saem as mais antigas (por rowid).
+    """
+
+    # Limpeza a cada N entradas gravadas (não em todas)
+    prune_every = 500
+
+    def __init__(self, path: str, maxsize: int = 100000):
+        self.path = path
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._conn = None
+        self._writes = 0
+        self._connection()
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Uma ligação por processo: depois de um fork (gunicorn --preload),
+        o worker abre a sua em vez de usar a herdada do master.
+        """
+        if self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            # É só uma cache: perder as últimas escritas num crash não faz mal
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=OFF")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS lemma_cache ("
+                "text_hash TEXT PRIMARY KEY, lemmas TEXT NOT NULL)"
+            )
+            self._pid = os.getpid()
+        return self._conn
+
+    def _hash(self, key: str) -> str:
+        return hashlib.sha1(f"{model_fingerprint()}\0{key}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> tuple[str, ...] | None:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT lemmas FROM lemma_cache WHERE text_hash = ?", (self._hash(key),)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return tuple(json.loads(row[0]))
+
+    def put(self, key: str, terms: tuple[str, ...]) -> None:
+        self.put_many([(key, terms)])
+
+    def put_many(self, entries: list[tuple[str, tuple[str, ...]]]) -> None:
+        """
+        Grava várias entradas numa só transacção (usado por normalize_many).
+        """
+        rows = [(self._hash(key), json.dumps(list(terms), ensure_ascii=False)) for key, terms in entries]
+        with self._lock:
+            try:
+                conn = self._connection()
+                with conn:
+                    conn.execute("BEGIN")
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO lemma_cache (text_hash, lemmas) VALUES (?, ?)", rows
+                    )
+                self._writes += len(rows)
+                if self._writes >= self.prune_every:
+                    self._writes = 0
+                    self._prune(conn)
+            except sqlite3.OperationalError:
+                # BD ocupada por outro worker: as entradas ficam só em memória
+                pass
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        conn.execute(
+            "DELETE FROM lemma_cache WHERE rowid IN ("
+            "SELECT rowid FROM lemma_cache ORDER BY rowid DESC LIMIT -1 OFFSET ?)",
+            (self.maxsize,),
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "path": self.path,
+            }
+
+
+_CACHE = NormalizeCache(int(os.environ.get("NLP_CACHE_SIZE", "4096")))
+_PERSISTENT_CACHE: PersistentNormalizeCache | None = None
+
+
+def configure_cache(maxsize: int | None = None, persistent_path: str | None = None,
+                    persistent_maxsize: int = 100000) -> None:
+    """
+    Ajusta a cache de normalize():
+    - maxsize: nº máximo de textos em memória (0 = desligada)
+    - persistent_path: ficheiro SQLite da cache persistente (None = sem alteração)
+    - persistent_maxsize: nº máximo de textos na cache persistente
+    """
+    global _PERSISTENT_CACHE
+    if maxsize is not None:
+        _CACHE.resize(maxsize)
+    if persistent_path:
+        _PERSISTENT_CACHE = PersistentNormalizeCache(persistent_path, persistent_maxsize)
+
+
+def cache_stats() -> dict:
+    """
+    Contadores da cache de normalize() (memória e, se activa, SQLite).
+    """
+    stats = {"memory": _CACHE.stats()}
+    if _PERSISTENT_CACHE is not None:
+        stats["persistent"] = _PERSISTENT_CACHE.stats()
+    return stats
 
 
 def normalize(text: str) -> list[str]:
@@ -29,8 +274,67 @@ def normalize(text: str) -> list[str]:
     Converte texto em lista de termos normalizados.
     - usa lemma quando possível
     - remove pontuação, stopwords e tokens muito curtos
+
+    Resultados em cache (LRU em memória e, opcionalmente, SQLite).
+    A SQLite só é lida aqui: é preenchida por normalize_many (perguntas da base),
+    não por cada pergunta diferente que chega ao chat.
+    """
+    key = text.lower().strip()
+
+    terms = _cached(key)
+    if terms is None:
+        terms = tuple(_normalize_doc(get_nlp()(key)))
+        _CACHE.put(key, terms)
+    return list(terms)
+
+
+def normalize_many(texts: list[str], batch_size: int | None = None, n_process: int | None = None) -> list[list[str]]:
     """
-    doc = NLP(text.lower().strip())
+    Versão em lote de normalize(), com nlp.pipe (construção do índice, importações).
+    - textos repetidos ou já em cache não passam pelo spaCy
+    - batch_size / n_process: por omissão NLP_BATCH_SIZE / NLP_N_PROCESS
+    - n_process > 1 usa vários processos; só compensa em lotes grandes, por isso
+      abaixo de batch_size * n_process textos corre num único processo
+    """
+    batch_size = batch_size or NLP_BATCH_SIZE
+    n_process = n_process or NLP_N_PROCESS
+
+    keys = [t.lower().strip() for t in texts]
+    found: dict[str, tuple[str, ...]] = {}
+    missing = []
+    for key in dict.fromkeys(keys):
+        terms = _cached(key)
+        if terms is None:
+            missing.append(key)
+        else:
+            found[key] = terms
+
+    if missing:
+        if len(missing) < batch_size * n_process:
+            n_process = 1
+        docs = get_nlp().pipe(missing, batch_size=batch_size, n_process=n_process)
+        new_entries = []
+        for key, doc in zip(missing, docs):
+            terms = tuple(_normalize_doc(doc))
+            found[key] = terms
+            _CACHE.put(key, terms)
+            new_entries.append((key, terms))
+        if _PERSISTENT_CACHE is not None:
+            _PERSISTENT_CACHE.put_many(new_entries)
+
+    return [list(found[key]) for key in keys]
+
+
+def _cached(key: str) -> tuple[str, ...] | None:
+    terms = _CACHE.get(key)
+    if terms is None and _PERSISTENT_CACHE is not None:
+        terms = _PERSISTENT_CACHE.get(key)
+        if terms is not None:
+            _CACHE.put(key, terms)
+    return terms
+
+
+def _normalize_doc(doc) -> list[str]:
     terms = []
     for t in doc:
         if t.is_space or t.is_punct or t.is_stop:
@@ -44,19 +348,180 @@ def normalize(text: str) -> list[str]:
     return terms
 
 
-def build_tfidf_vectors(texts: list[str]) -> tuple[list[dict[str, float]], dict[str, float]]:
+def compute_idf(df: Counter, n_docs: int) -> dict[str, float]:
+    """
+    IDF suavizado: log((N + 1) / (df + 1)) + 1
+    """
+    N = max(1, n_docs)
+    return {term: (math.log((N + 1) / (d + 1)) + 1.0) for term, d in df.items()}
+
+
+def tfidf_vector(terms: list[str], idf: dict[str, float]) -> dict[str, float]:
+    """
+    Vetor TF-IDF esparso (dict termo->peso) de uma lista de termos.
+    TF = contagem / total; termos sem idf ficam com peso 0.
+    """
+    tf = Counter(terms)
+    total = max(1, sum(tf.values()))
+    vec = {}
+    for term, c in tf.items():
+        vec[term] = (c / total) * idf.get(term, 0.0)
+    return vec
+
+
+class Vocabulary:
+    """
+    Termos "internados": cada lema é guardado uma só vez e os vetores/índices
+    referem-no por um id inteiro (0, 1, 2, ...), em vez de uma string por documento.
+    """
+    __slots__ = ("_ids", "_terms")
+
+    def __init__(self, terms: Iterable[str] = ()):
+        self._ids: dict[str, int] = {}
+        self._terms: list[str] = []
+        for term in terms:
+            self.intern(term)
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self._ids
+
+    def intern(self, term: str) -> int:
+        term_id = self._ids.get(term)
+        if term_id is None:
+            term_id = self._ids[term] = len(self._terms)
+            self._terms.append(term)
+        return term_id
+
+    def get(self, term: str) -> int | None:
+        return self._ids.get(term)
+
+    def term(self, term_id: int) -> str:
+        return self._terms[term_id]
+
+    @property
+    def terms(self) -> list[str]:
+        """Termos por ordem de id."""
+        return self._terms
+
+    def encode(self, terms: Iterable[str]) -> array:
+        """Termos -> ids (array('I')), internando os novos."""
+        return array("I", (self.intern(t) for t in terms))
+
+
+class CompactVectors:
+    """
+    Conjunto de vetores TF-IDF compactos, guardados em arrays partilhados (tipo CSR):
+    - ids: ids de termo (array('I')), ordenados dentro de cada vetor
+    - weights: pesos em float32 (array('f'))
+    - offsets: início de cada vetor em ids/weights
+    - norms: norma pré-calculada de cada vetor
+
+    Arrays por documento teriam mais cabeçalho do que dados (uma pergunta tem
+    poucos lemas); aqui cada vetor custa ~8 bytes por termo + uma vista CompactVector.
+    """
+    __slots__ = ("vocab", "ids", "weights", "offsets", "norms")
+
+    def __init__(self, vocab: Vocabulary | None = None):
+        self.vocab = vocab if vocab is not None else Vocabulary()
+        self.ids = array("I")
+        self.weights = array("f")
+        self.offsets = array("I", [0])
+        self.norms = array("f")
+
+    def __len__(self) -> int:
+        return len(self.norms)
+
+    def __getitem__(self, row: int | slice) -> "CompactVector | list[CompactVector]":
+        if isinstance(row, slice):
+            return [CompactVector(self, r) for r in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        return CompactVector(self, row)
+
+    def __iter__(self):
+        return (CompactVector(self, row) for row in range(len(self)))
+
+    def append(self, vec: dict[str, float]) -> "CompactVector":
+        items = sorted((self.vocab.intern(term), w) for term, w in vec.items() if w != 0.0)
+        self.ids.extend(i for i, _ in items)
+        self.weights.extend(w for _, w in items)
+        self.offsets.append(len(self.ids))
+        start = self.offsets[-2]
+        self.norms.append(math.sqrt(sum(w * w for w in self.weights[start:])))
+        return CompactVector(self, len(self.norms) - 1)
+
+
+class CompactVector:
+    """
+    Vista (sem cópia) de um vetor de CompactVectors.
+    """
+    __slots__ = ("store", "row")
+
+    def __init__(self, store: CompactVectors, row: int):
+        self.store = store
+        self.row = row
+
+    @property
+    def vocab(self) -> Vocabulary:
+        return self.store.vocab
+
+    @property
+    def norm(self) -> float:
+        return self.store.norms[self.row]
+
+    def __len__(self) -> int:
+        offsets = self.store.offsets
+        return offsets[self.row + 1] - offsets[self.row]
+
+    def to_dict(self) -> dict[str, float]:
+        store = self.store
+        start, end = store.offsets[self.row], store.offsets[self.row + 1]
+        return {store.vocab.term(i): w for i, w in zip(store.ids[start:end], store.weights[start:end])}
+
+    def dot(self, other: "CompactVector") -> float:
+        """
+        Produto escalar por fusão dos ids ordenados (mesmo vocabulário).
+        """
+        a, b = self.store, other.store
+        i, n = a.offsets[self.row], a.offsets[self.row + 1]
+        j, m = b.offsets[other.row], b.offsets[other.row + 1]
+        a_ids, a_w, b_ids, b_w = a.ids, a.weights, b.ids, b.weights
+        dot = 0.0
+        while i < n and j < m:
+            x, y = a_ids[i], b_ids[j]
+            if x == y:
+                dot += a_w[i] * b_w[j]
+                i += 1
+                j += 1
+            elif x < y:
+                i += 1
+            else:
+                j += 1
+        return dot
+
+
+def build_tfidf_vectors(
+    texts: list[str], compact: bool = False, vocab: Vocabulary | None = None
+) -> tuple[list[dict[str, float]] | CompactVectors, dict[str, float]]:
     """
     Constrói vetores TF-IDF esparsos (dict termo->peso).
     Retorna:
       - lista de vetores (um por texto)
       - idf por termo
 
+    compact=True devolve CompactVectors (ids internados em vocab + float32,
+    indexável como uma lista de CompactVector): muito menos memória por documento.
+
     Estratégia:
       TF = contagem / total
       IDF = log((N + 1) / (df + 1)) + 1  (suavizado)
     """
-    tokenized = [normalize(t) for t in texts]
-    N = max(1, len(tokenized))
+    tokenized = normalize_many(texts)
 
     # df: em quantos documentos o termo aparece
     df = Counter()
@@ -64,27 +529,35 @@ def build_tfidf_vectors(texts: list[str]) -> tuple[list[dict[str, float]], dict[
         for term in set(terms):
             df[term] += 1
 
-    idf = {term: (math.log((N + 1) / (d + 1)) + 1.0) for term, d in df.items()}
-
-    vectors = []
-    for terms in tokenized:
-        tf = Counter(terms)
-        total = max(1, sum(tf.values()))
-        vec = {}
-        for term, c in tf.items():
-            vec[term] = (c / total) * idf.get(term, 0.0)
-        vectors.append(vec)
-
+    idf = compute_idf(df, len(tokenized))
+    vectors = [tfidf_vector(terms, idf) for terms in tokenized]
+    if compact:
+        store = CompactVectors(vocab)
+        for vec in vectors:
+            store.append(vec)
+        vectors = store
     return vectors, idf
 
 
-def cosine_similarity(vec_a: dict[str, float], vec_b: dict[str, float]) -> float:
+def cosine_similarity(
+    vec_a: dict[str, float] | CompactVector, vec_b: dict[str, float] | CompactVector
+) -> float:
     """
-    Similaridade cosseno entre dois vetores esparsos.
+    Similaridade cosseno entre dois vetores esparsos (dict ou CompactVector).
     """
     if not vec_a or not vec_b:
         return 0.0
 
+    if isinstance(vec_a, CompactVector) and isinstance(vec_b, CompactVector) and vec_a.vocab is vec_b.vocab:
+        # norma pré-calculada: só o produto escalar é percorrido
+        if vec_a.norm == 0.0 or vec_b.norm == 0.0:
+            return 0.0
+        return vec_a.dot(vec_b) / (vec_a.norm * vec_b.norm)
+    if isinstance(vec_a, CompactVector):
+        vec_a = vec_a.to_dict()
+    if isinstance(vec_b, CompactVector):
+        vec_b = vec_b.to_dict()
+
     # Produto escalar
     dot = 0.0
     # iterar pelo menor para ser mais rápido
@@ -101,16 +574,17 @@ def cosine_similarity(vec_a: dict[str, float], vec_b: dict[str, float]) -> float
     return dot / (norm_a * norm_b)
 
 
-def match_question(user_question: str, stored_questions: list[str], top_k: int = 3):
+def match_question(user_question: str, stored_questions: list[str], top_k: int = 3, compact: bool = False):
     """
     Faz matching da pergunta do aluno contra a lista de perguntas da BD.
+    compact=True usa CompactVector (menos memória; pesos em float32).
     Retorna:
       - lista de tuplos (index, score) ordenada por score desc
     """
     if not stored_questions:
         return []
 
-    vectors, _ = build_tfidf_vectors(stored_questions + [user_question])
+    vectors, _ = build_tfidf_vectors(stored_questions + [user_question], compact=compact)
     qa_vecs = vectors[:-1]
     user_vec = vectors[-1]
 
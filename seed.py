@@ -14,10 +14,8 @@ Depois entra com:
 """
 
 from werkzeug.security import generate_password_hash
-from app import create_app
-from models import db, User, QAItem
-
-app = create_app()
+from models import db, User, QAItem, KBVersion
+from nlp_utils import normalize_many
 
 SEED_QA = [
     (
@@ -149,30 +147,47 @@ SEED_QA = [
 ADMIN_EMAIL = "admin@uni.ao"
 ADMIN_PASSWORD = "admin123"
 
-with app.app_context():
-    db.create_all()
-
-    # ✅ Criar ou actualizar admin (sempre consistente para defesa)
-    admin = User.query.filter_by(email=ADMIN_EMAIL).first()
-
-    if not admin:
-        admin = User(
-            full_name="Administrador",
-            email=ADMIN_EMAIL,
-            password_hash=generate_password_hash(ADMIN_PASSWORD),
-            is_admin=True
-        )
-        db.session.add(admin)
-    else:
-        admin.password_hash = generate_password_hash(ADMIN_PASSWORD)
-        admin.is_admin = True
-
-    # Inserir Q/A se BD estiver vazia
-    if QAItem.query.count() == 0:
-        for q, a in SEED_QA:
-            db.session.add(QAItem(question=q, answer=a))
-
-    db.session.commit()
-
-print("Seed concluído.")
-print(f"Admin: {ADMIN_EMAIL} | Password: {ADMIN_PASSWORD}")
+
+def main():
+    # Import aqui: importar app cria a aplicação (BD + índice), e este
+    # módulo também é importado só para ler SEED_QA (ex.: benchmarks).
+    from app import create_app
+
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+
+        # ✅ Criar ou actualizar admin (sempre consistente para defesa)
+        admin = User.query.filter_by(email=ADMIN_EMAIL).first()
+
+        if not admin:
+            admin = User(
+                full_name="Administrador",
+                email=ADMIN_EMAIL,
+                password_hash=generate_password_hash(ADMIN_PASSWORD),
+                is_admin=True
+            )
+            db.session.add(admin)
+        else:
+            admin.password_hash = generate_password_hash(ADMIN_PASSWORD)
+            admin.is_admin = True
+
+        # Inserir Q/A se BD estiver vazia
+        if QAItem.query.count() == 0:
+            for q, a in SEED_QA:
+                db.session.add(QAItem(question=q, answer=a))
+            KBVersion.bump()
+
+        db.session.commit()
+
+        # Aquece a cache persistente de lemas em lote (nlp.pipe): os workers
+        # arrancam e constroem o índice sem voltar a passar estes textos pelo spaCy
+        normalize_many([qa.question for qa in QAItem.query.all()])
+
+    print("Seed concluído.")
+    print(f"Admin: {ADMIN_EMAIL} | Password: {ADMIN_PASSWORD}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,9 @@ app.js
 ------
 JS mínimo e útil:
 - Tema claro/escuro com persistência (localStorage)
-- Preencher caixa de pergunta ao clicar numa sugestão
+- Preencher caixa de pergunta ao clicar numa sugestão (lista actualizada ao voltar ao separador)
+- Carregar mensagens antigas do chat ao fazer scroll (paginação por cursor)
+- Enviar perguntas pela API JSON (/api/chat) sem recarregar a página
 */
 
 (function initTheme() {
@@ -30,13 +32,155 @@ function fillQuestion(text) {
 }
 
 // Sugestões: clicar e preencher a pergunta (sem inline JS / sem JSON)
+// Um só listener no contentor: continua a funcionar depois de a lista ser substituída
 document.addEventListener("DOMContentLoaded", () => {
   const input = document.querySelector('input[name="question"]');
-  document.querySelectorAll(".suggestion-btn").forEach(btn => {
-    btn.addEventListener("click", () => {
-      if (!input) return;
-      input.value = btn.getAttribute("data-question") || "";
+  const list = document.getElementById("suggestions");
+  if (!list) return;
+
+  list.addEventListener("click", (event) => {
+    const btn = event.target.closest(".suggestion-btn");
+    if (!btn || !input) return;
+    input.value = btn.getAttribute("data-question") || "";
+    input.focus();
+  });
+
+  // Ao voltar ao separador: pede de novo o fragmento (/chat/suggestions).
+  // O browser revalida com If-None-Match; sem alterações na base a resposta é 304 (sem corpo)
+  if (!list.dataset.url || !window.fetch) return;
+  let shown = null;
+  document.addEventListener("visibilitychange", async () => {
+    if (document.visibilityState !== "visible") return;
+    try {
+      const res = await fetch(list.dataset.url, { headers: { "Accept": "text/html" } });
+      if (!res.ok) return;
+      const html = await res.text();
+      if (html !== shown) {
+        list.innerHTML = html;
+        shown = html;
+      }
+    } catch (err) {
+      // Sem rede: fica a lista actual
+    }
+  });
+});
+
+// Cria uma bolha de mensagem (mesma estrutura que o template index.html)
+function renderMessage(role, content) {
+  const wrap = document.createElement("div");
+  wrap.className = "chat-msg " + (role === "user" ? "chat-user" : "chat-assistant");
+
+  const bubble = document.createElement("div");
+  bubble.className = "chat-bubble";
+
+  const who = document.createElement("div");
+  who.className = "small opacity-75 mb-1";
+  who.textContent = role === "user" ? "Tu" : "Assistente";
+
+  const text = document.createElement("div");
+  text.textContent = content;
+
+  bubble.appendChild(who);
+  bubble.appendChild(text);
+  wrap.appendChild(bubble);
+  return wrap;
+}
+
+// Chat: carregar mensagens anteriores (paginação por cursor) ao chegar ao topo
+document.addEventListener("DOMContentLoaded", () => {
+  const box = document.getElementById("chatBox");
+  if (!box || !box.dataset.olderUrl) return;
+
+  let cursor = box.dataset.olderCursor || "";
+  let loading = false;
+
+  async function loadOlder() {
+    if (!cursor || loading) return;
+    loading = true;
+    try {
+      const url = box.dataset.olderUrl + "?before=" + encodeURIComponent(cursor);
+      const res = await fetch(url, { headers: { "Accept": "application/json" } });
+      if (!res.ok) return;
+      const data = await res.json();
+
+      // Mantém a posição visível depois de inserir mensagens por cima
+      const previousHeight = box.scrollHeight;
+      const frag = document.createDocumentFragment();
+      data.messages.forEach(m => frag.appendChild(renderMessage(m.role, m.content)));
+      box.insertBefore(frag, box.firstChild);
+      box.scrollTop += box.scrollHeight - previousHeight;
+
+      cursor = data.older_cursor || "";
+    } finally {
+      loading = false;
+    }
+  }
+
+  box.addEventListener("scroll", () => {
+    if (box.scrollTop < 80) loadOlder();
+  });
+
+  // Poucas mensagens (sem barra de scroll): carrega já a página anterior
+  if (box.scrollHeight <= box.clientHeight) loadOlder();
+});
+
+// Chat: pergunta enviada por fetch (/api/chat); as mensagens entram no sítio.
+// Sem JS, sem rede ou com o pedido recusado (4xx) o formulário é enviado normalmente.
+// Erro do servidor (5xx): a pergunta pode já estar gravada, não se reenvia.
+document.addEventListener("DOMContentLoaded", () => {
+  const form = document.getElementById("chatForm");
+  const box = document.getElementById("chatBox");
+  if (!form || !box || !window.fetch) return;
+
+  const input = form.querySelector('input[name="question"]');
+  const csrf = form.querySelector('input[name="csrf_token"]');
+  const button = form.querySelector('[type="submit"]');
+
+  function append(role, content) {
+    // Remove a mensagem "Começa com uma pergunta..." do chat vazio
+    box.querySelectorAll(":scope > :not(.chat-msg)").forEach(el => el.remove());
+    const el = renderMessage(role, content);
+    box.appendChild(el);
+    box.scrollTop = box.scrollHeight;
+    return el;
+  }
+
+  form.addEventListener("submit", async (event) => {
+    const question = (input.value || "").trim();
+    if (question.length < 2) return;  // deixa a validação normal actuar
+    event.preventDefault();
+
+    button.disabled = true;
+    let res;
+    try {
+      res = await fetch(form.dataset.apiUrl, {
+        method: "POST",
+        headers: { "Content-Type": "application/json", "Accept": "application/json" },
+        body: JSON.stringify({ question: question, csrf_token: csrf ? csrf.value : "" }),
+      });
+    } catch (err) {
+      form.submit();  // sem rede: o pedido não chegou ao servidor
+      return;
+    }
+    if (res.redirected || (res.status >= 400 && res.status < 500)) {
+      // Pedido recusado (ex.: sessão/CSRF expirados, redirect para o login): o /chat trata e mostra os erros
+      form.submit();
+      return;
+    }
+
+    try {
+      if (!res.ok) throw new Error("HTTP " + res.status);
+      const data = await res.json();
+
+      append("user", question);
+      append("assistant", data.answer);
+      input.value = "";
       input.focus();
-    });
+    } catch (err) {
+      // Erro do servidor: a pergunta pode já estar gravada, não se reenvia
+      append("assistant", "Não foi possível responder agora. Tenta novamente dentro de momentos.");
+    } finally {
+      button.disabled = false;
+    }
   });
 });
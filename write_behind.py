@@ -0,0 +1,133 @@
+"""
+write_behind.py
+---------------
+Fila de escrita (write-behind) para as mensagens do chat.
+
+Em vez de cada pedido fazer o seu commit (um fsync + lock de escrita do SQLite),
+uma thread por processo junta as inserções de vários pedidos e grava-as
+num só commit ("group commit").
+
+- wait=True: o pedido espera pelo commit do lote (durável, como antes),
+  mas vários pedidos partilham o mesmo commit
+- wait=False: o pedido não espera (as mensagens aparecem uns ms depois)
+
+Só ajuda com pedidos concorrentes no mesmo processo (ex.: gunicorn com
+--threads / gthread), ou com wait=False.
+
+Activar com CHAT_WRITE_BEHIND=1 (ver app.py).
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+
+from sqlalchemy import insert
+
+
+class WriteTicket:
+    """Resultado de submit(): permite esperar pelo commit do lote."""
+
+    def __init__(self):
+        self._done = threading.Event()
+        self.error: BaseException | None = None
+
+    def _finish(self, error: BaseException | None = None) -> None:
+        self.error = error
+        self._done.set()
+
+    def wait(self, timeout: float | None = None) -> None:
+        if not self._done.wait(timeout):
+            raise TimeoutError("Escrita das mensagens não confirmada a tempo")
+        if self.error is not None:
+            raise self.error
+
+
+class WriteBehindQueue:
+    """
+    Agrupa inserções de uma tabela (lista de dicts) em commits partilhados.
+    """
+
+    def __init__(self, app, db, model, max_batch: int = 200, max_wait: float = 0.005):
+        self.app = app
+        self.db = db
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+
+        self.batches = 0
+        self.rows_written = 0
+
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._pid = None
+        atexit.register(self.close)
+
+    def submit(self, rows: list[dict]) -> WriteTicket:
+        ticket = WriteTicket()
+        self._ensure_thread()
+        self._queue.put((rows, ticket))
+        return ticket
+
+    def _ensure_thread(self) -> None:
+        # Thread criada no primeiro uso em cada processo (os workers do
+        # gunicorn nascem por fork e não herdam threads do master)
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid() or self._thread is None or not self._thread.is_alive():
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue()
+                self._thread = threading.Thread(target=self._run, name="chat-write-behind", daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            stop = False
+            while sum(len(rows) for rows, _ in batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch: list[tuple[list[dict], WriteTicket]]) -> None:
+        rows = [row for rows, _ in batch for row in rows]
+        error = None
+        with self.app.app_context():
+            try:
+                self.db.session.execute(insert(self.model), rows)
+                self.db.session.commit()
+                self.batches += 1
+                self.rows_written += len(rows)
+            except Exception as exc:  # o erro é entregue a quem espera
+                self.db.session.rollback()
+                error = exc
+                self.app.logger.exception("Falha a gravar %d mensagens em lote", len(rows))
+        for _, ticket in batch:
+            ticket._finish(error)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Grava o que falta na fila e pára a thread (chamado à saída do processo)."""
+        thread = self._thread
+        if thread is not None and thread.is_alive() and self._pid == os.getpid():
+            self._queue.put(None)
+            thread.join(timeout)